@@ -0,0 +1,239 @@
+"""Benchmarks for dsclient
+
+Each ``bench_*`` module in this package defines a ``run(runner, target)``
+function that measures a group of cases with a :py:class:`Runner`. Results
+can be saved as JSON files and compared against each other to catch
+regressions.
+
+Usage (from the top level directory)::
+
+    python -m benchmarks --save results/new.json
+    python -m benchmarks --compare results/old.json results/new.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+
+from dsclient import DebugServer
+from dsclient.version import version_string
+from tests.utils.fakeserver import launch_process
+
+# Use highest resolution clock available (Python 3.3+)
+timer = getattr(time, "perf_counter", time.time)
+
+DEFAULT_MIN_TIME = 0.5
+DEFAULT_ROUNDS = 5
+
+
+class Runner(object):
+    """Measures and collects benchmark results"""
+
+    def __init__(self, min_time=DEFAULT_MIN_TIME, rounds=DEFAULT_ROUNDS, names=None):
+        """
+        Args:
+            min_time (float, optional): min seconds to spend measuring each case
+            rounds (int, optional): number of rounds to measure each case
+            names (list, optional): substrings of case names to run (default all)
+        """
+        self.min_time = min_time
+        self.rounds = rounds
+        self.names = names
+        self.results = dict()
+
+    def selected(self, name):
+        """Returns whether case name should be run"""
+        return self.names is None or any(n in name for n in self.names)
+
+    def measure(self, name, func, size=None, setup=None):
+        """Measures how many times per second func can be called
+
+        The number of calls per round is calibrated so that all rounds take
+        about min_time seconds; the median round is recorded.
+
+        Args:
+            name (str): name of case
+            func (callable): function to measure (called without arguments)
+            size (int, optional): bytes transferred per call (records MB/s)
+            setup (callable, optional): called once before measuring
+
+        Returns:
+            dict: result recorded for case (None if case not selected)
+        """
+        if not self.selected(name):
+            return None
+        if setup is not None:
+            setup()
+
+        # Calibrate number of calls per round
+        number = 1
+        while True:
+            elapsed = self._time(func, number)
+            if elapsed >= self.min_time / self.rounds / 4 or number >= 1 << 20:
+                break
+            number *= 2
+        per_round = self.min_time / self.rounds
+        number = max(1, int(number * per_round / max(elapsed, 1e-9)))
+
+        times = sorted(self._time(func, number) / number for _ in range(self.rounds))
+        median = times[len(times) // 2]
+
+        result = {
+            "seconds_per_call": median,
+            "best_seconds_per_call": times[0],
+            "calls_per_second": 1.0 / median,
+            "calls_per_round": number,
+            "rounds": self.rounds,
+        }
+        if size is not None:
+            result["bytes_per_call"] = size
+            result["mb_per_second"] = size / median / 1e6
+        self.results[name] = result
+
+        print(format_result(name, result))
+        sys.stdout.flush()
+        return result
+
+    def _time(self, func, number):
+        start = timer()
+        for _ in range(number):
+            func()
+        return timer() - start
+
+    def save(self, path):
+        """Saves results (and environment info) to a JSON file
+
+        Args:
+            path (str): full path to file to create
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "python": platform.python_version(),
+                        "implementation": platform.python_implementation(),
+                        "platform": platform.platform(),
+                        "dsclient": version_string,
+                    },
+                    "results": self.results,
+                },
+                f,
+                indent=4,
+                sort_keys=True,
+            )
+
+
+def format_result(name, result):
+    """Returns one line summary of a result"""
+    line = "%-48s %12.1f calls/s %10.1f us/call" % (
+        name,
+        result["calls_per_second"],
+        result["seconds_per_call"] * 1e6,
+    )
+    if "mb_per_second" in result:
+        line += " %10.2f MB/s" % result["mb_per_second"]
+    return line
+
+
+def compare(old_path, new_path, threshold=0.1):
+    """Prints comparison of two saved result files
+
+    Args:
+        old_path (str): full path to baseline results file
+        new_path (str): full path to new results file
+        threshold (float, optional): relative slow down reported as a
+            regression (default=0.1)
+
+    Returns:
+        list: names of cases that regressed
+    """
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    regressions = list()
+    print("%-48s %14s %14s %8s" % ("case", "old us/call", "new us/call", "change"))
+    for name in sorted(set(old) & set(new)):
+        old_time = old[name]["seconds_per_call"]
+        new_time = new[name]["seconds_per_call"]
+        change = new_time / old_time - 1.0
+        flag = ""
+        if change > threshold:
+            flag = " REGRESSION"
+            regressions.append(name)
+        print(
+            "%-48s %14.1f %14.1f %+7.1f%%%s"
+            % (name, old_time * 1e6, new_time * 1e6, change * 100, flag)
+        )
+    for name in sorted(set(old) ^ set(new)):
+        print("%-48s (only in %s)" % (name, "old" if name in old else "new"))
+
+    return regressions
+
+
+class Target(object):
+    """Server to run benchmarks against
+
+    By default a FakeDebugServer is launched in a separate process (so it does
+    not compete with the benchmark for the GIL). An existing DebugServer-js
+    can be used instead by providing its port, a ccxml file and session names.
+    """
+
+    def __init__(self, port=None, ccxml=None, sessions=None, latency=0.0, cpus=8):
+        """
+        Args:
+            port (int, optional): port of existing DebugServer (default
+                launches a FakeDebugServer)
+            ccxml (str, optional): ccxml file to set as config
+            sessions (list, optional): session names to use (default all CPUs)
+            latency (float, optional): seconds of simulated latency per request
+                (FakeDebugServer only)
+            cpus (int, optional): number of CPUs to simulate (FakeDebugServer only)
+        """
+        self._process = None
+        self._tmp_ccxml = None
+        if port is None:
+            self._process, port = launch_process(cpus=cpus, latency=latency)
+        if ccxml is None:
+            ccxml = self._tmp_ccxml = os.path.abspath("benchmark.ccxml")
+            with open(ccxml, "w") as f:
+                f.write("<configurations/>\n")
+
+        self.port = port
+        self.ccxml = ccxml
+        self.server = DebugServer(port=port)
+        self.server.set_config(ccxml)
+        self.session_names = sessions or self.server.get_list_of_cpus()
+
+    def session(self, index=0):
+        """Returns a connected session (opened on first use)
+
+        Args:
+            index (int, optional): index of session name to use (default=0)
+
+        Returns:
+            DebugSession: DebugSession object
+        """
+        name = self.session_names[index]
+        if name not in self.server.get_list_of_sessions():
+            self.server.open_session(name).connect()
+
+        return self.server.get_session(name)
+
+    def close(self):
+        """Terminates open sessions (and FakeDebugServer process)"""
+        for name in list(self.server.get_list_of_sessions().keys()):
+            self.server.terminate_session(name)
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+        if self._tmp_ccxml is not None and os.path.exists(self._tmp_ccxml):
+            os.remove(self._tmp_ccxml)
+
@@ -0,0 +1,61 @@
+"""Runs the benchmark suite (see benchmarks/__init__.py)"""
+import argparse
+import importlib
+
+from benchmarks import DEFAULT_MIN_TIME, DEFAULT_ROUNDS, Runner, Target, compare
+
+SUITES = ["codec", "protocol", "memory", "sessions"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs dsclient benchmarks")
+    parser.add_argument(
+        "--suites", nargs="+", choices=SUITES, default=SUITES, help="suites to run"
+    )
+    parser.add_argument(
+        "-k", dest="names", nargs="+", default=None, help="only run matching cases"
+    )
+    parser.add_argument("--save", help="save results to JSON file")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="compare two saved result files (does not run benchmarks)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=None, help="use existing DebugServer on port"
+    )
+    parser.add_argument("--ccxml", help="ccxml file to use with existing DebugServer")
+    parser.add_argument(
+        "--session", dest="sessions", nargs="+", help="session names to use"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds of simulated latency per request (fake server only)",
+    )
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare)
+        raise SystemExit(1 if len(regressions) > 0 else 0)
+
+    runner = Runner(min_time=args.min_time, rounds=args.rounds, names=args.names)
+    target = Target(
+        port=args.port, ccxml=args.ccxml, sessions=args.sessions, latency=args.latency
+    )
+    try:
+        for suite in args.suites:
+            importlib.import_module("benchmarks.bench_%s" % suite).run(runner, target)
+    finally:
+        target.close()
+
+    if args.save:
+        runner.save(args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmarks JSON codecs on typical dsclient messages"""
+import os
+import json
+
+from dsclient import codec as codecs
+from dsclient.utils import create_request, decode_byte_response
+
+SIZES = [16, 4096, 65536]
+
+
+def run(runner, target=None):
+    """Measures encode/decode speed of each installed codec
+
+    Args:
+        runner (Runner): runner to measure cases with
+        target (Target, optional): not used (codecs are measured client side)
+    """
+    small_req = create_request("readRegister", name="PC")
+    small_resp = b'{"status": "OK", "data": 4660}'
+
+    for name in codecs.available_codecs():
+        codec = codecs.get_codec(name)
+
+        runner.measure(
+            "codec.%s.encode_read_register" % name,
+            lambda: codec.encode_request(small_req),
+        )
+        runner.measure(
+            "codec.%s.decode_read_register" % name,
+            lambda: codec.decode_response(small_resp),
+        )
+
+        for size in SIZES:
+            data = list(bytearray(os.urandom(size)))
+            req = create_request("writeData", data=data, address=0x20000000, page=0)
+            resp = json.dumps({"status": "OK", "data": data}).encode()
+
+            runner.measure(
+                "codec.%s.encode_write_data_%d" % (name, size),
+                lambda: codec.encode_request(req),
+                size=size,
+            )
+            runner.measure(
+                "codec.%s.decode_read_data_%d" % (name, size),
+                lambda: codec.decode_response(resp),
+                size=size,
+            )
+            runner.measure(
+                "codec.%s.decode_read_data_bytes_%d" % (name, size),
+                lambda: decode_byte_response(resp, codec=codec),
+                size=size,
+            )
@@ -0,0 +1,69 @@
+"""Benchmarks memory read/write throughput"""
+import os
+
+SIZES = [256, 4096, 65536, 262144]
+REGION_SIZE = 1 << 20
+ADDRESS = 0x20000000
+ENCODINGS = ["list", "base64"]
+
+
+def run(runner, target):
+    """Measures MB/s of read_data/write_data at several sizes (with each
+    encoding of memory bytes)
+
+    Args:
+        runner (Runner): runner to measure cases with
+        target (Target): server to run against
+    """
+    session = target.session()
+    default_encoding = session.get_data_encoding()
+
+    for encoding in ENCODINGS:
+        session.set_data_encoding(encoding)
+        try:
+            session.write_data(b"\x00", ADDRESS)
+        except Exception:
+            # Not supported by server
+            continue
+        _run_encoding(runner, session, "memory.%s" % encoding)
+
+    session.set_data_encoding(default_encoding)
+
+
+def _run_encoding(runner, session, prefix):
+    for size in SIZES:
+        data = bytearray(os.urandom(size))
+        as_list = list(data)
+
+        runner.measure(
+            "%s.write_data_list_%d" % (prefix, size),
+            lambda: session.write_data(as_list, ADDRESS),
+            size=size,
+        )
+        runner.measure(
+            "%s.write_data_bytes_%d" % (prefix, size),
+            lambda: session.write_data(data, ADDRESS),
+            size=size,
+        )
+        runner.measure(
+            "%s.read_data_list_%d" % (prefix, size),
+            lambda: session.read_data(ADDRESS, num_bytes=size),
+            size=size,
+        )
+        runner.measure(
+            "%s.read_data_bytes_%d" % (prefix, size),
+            lambda: session.read_data(ADDRESS, num_bytes=size, output="bytearray"),
+            size=size,
+        )
+
+    buf = bytearray(REGION_SIZE)
+    runner.measure(
+        "%s.write_memory_region_%d" % (prefix, REGION_SIZE),
+        lambda: session.write_memory_region(buf, ADDRESS),
+        size=REGION_SIZE,
+    )
+    runner.measure(
+        "%s.read_memory_region_%d" % (prefix, REGION_SIZE),
+        lambda: session.read_memory_region(ADDRESS, REGION_SIZE, into=buf),
+        size=REGION_SIZE,
+    )
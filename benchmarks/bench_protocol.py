@@ -0,0 +1,36 @@
+"""Benchmarks request/response overhead of small commands"""
+from dsclient.utils import create_request, decode_response, encode_request
+
+PIPELINE_BATCH = 100
+
+
+def run(runner, target):
+    """Measures requests per second for small commands
+
+    Args:
+        runner (Runner): runner to measure cases with
+        target (Target): server to run against
+    """
+    req = create_request("readRegister", name="PC")
+    msg = encode_request(req)
+    resp = b'{"status": "OK", "data": 4660}'
+
+    runner.measure(
+        "protocol.create_request",
+        lambda: create_request("readRegister", name="PC"),
+    )
+    runner.measure("protocol.encode_request", lambda: encode_request(req))
+    runner.measure("protocol.decode_response", lambda: decode_response(resp))
+
+    session = target.session()
+    runner.measure("protocol.read_register", lambda: session.read_register("PC"))
+    runner.measure(
+        "protocol.write_register", lambda: session.write_register("R0", 0x1234)
+    )
+
+    def pipelined():
+        with session.pipeline() as p:
+            for _ in range(PIPELINE_BATCH):
+                p.send_msg("readRegister", msg)
+
+    runner.measure("protocol.read_register_pipelined_x%d" % PIPELINE_BATCH, pipelined)
@@ -0,0 +1,106 @@
+"""Benchmarks reply throughput of :py:func:`dsclient.send`
+
+Runs a minimal fake DebugServer-js socket (in a background thread) that replies
+to every request with a ``readData`` style response of the requested size, and
+compares the original 1 KiB ``recv`` loop against :py:class:`dsclient.StreamReader`.
+
+Usage:
+    python -m benchmarks.bench_send [--sizes 1024 65536 262144] [--repeat 20]
+"""
+import json
+import time
+import socket
+import argparse
+import threading
+from dsclient.utils import StreamReader, create_request, create_socket, send
+
+
+DEFAULT_SIZES = [1024, 16384, 65536, 262144]
+DEFAULT_REPEAT = 20
+
+
+def legacy_send(s, req):
+    """Original implementation of send (used as baseline)"""
+    msg = json.dumps(req)
+    s.sendall(b"%s\n" % msg.encode())
+
+    r = bytearray()
+    while b"\n" not in r:
+        r.extend(s.recv(1024))
+
+    return json.loads(r.decode())
+
+
+def serve(listener):
+    """Replies to each readData request with numBytes of data"""
+    conn, _ = listener.accept()
+    reader = StreamReader(conn)
+    cache = dict()
+    try:
+        while True:
+            req = json.loads(reader.readline().decode())
+            num_bytes = req["args"]["numBytes"]
+            if num_bytes not in cache:
+                resp = {"status": "OK", "data": [0xA5] * num_bytes}
+                cache[num_bytes] = b"%s\n" % json.dumps(resp).encode()
+            conn.sendall(cache[num_bytes])
+    except Exception:
+        pass
+    finally:
+        conn.close()
+
+
+def start_server():
+    """Starts fake server thread and returns the port number it listens on"""
+    listener = create_socket(0, connect=False)
+    listener.bind(("localhost", 0))
+    listener.listen(1)
+    t = threading.Thread(target=serve, args=(listener,))
+    t.daemon = True
+    t.start()
+
+    return listener.getsockname()[1]
+
+
+def run(sizes, repeat):
+    """Runs benchmark and prints results table"""
+    print("%10s %12s %12s %12s" % ("bytes", "impl", "replies/s", "MB/s"))
+    for name in ("legacy", "reader"):
+        s = create_socket(start_server())
+        reader = StreamReader(s)
+        for size in sizes:
+            req = create_request("readData", address=0, page=0, numBytes=size)
+            # JSON encoded reply size (what actually goes over the wire)
+            wire_size = len(json.dumps({"status": "OK", "data": [0xA5] * size})) + 1
+
+            start = time.time()
+            for _ in range(repeat):
+                if name == "legacy":
+                    legacy_send(s, req)
+                else:
+                    send(s, req, reader=reader)
+            elapsed = time.time() - start
+
+            print(
+                "%10d %12s %12.1f %12.2f"
+                % (
+                    size,
+                    name,
+                    repeat / elapsed,
+                    wire_size * repeat / elapsed / 1e6,
+                )
+            )
+        s.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Benchmarks session open/close latency and multi-session concurrency"""
+from multiprocessing.pool import ThreadPool
+
+CONCURRENCY = [1, 2, 4, 8]
+REQUESTS_PER_SESSION = 50
+
+
+def run(runner, target):
+    """Measures session open/close latency and concurrency scaling
+
+    Args:
+        runner (Runner): runner to measure cases with
+        target (Target): server to run against
+    """
+    server = target.server
+    name = target.session_names[-1]
+
+    def open_close():
+        server.open_session(name)
+        server.terminate_session(name)
+
+    runner.measure("sessions.open_terminate", open_close)
+
+    # Concurrency scaling: each worker sends requests on its own session
+    count = min(max(CONCURRENCY), len(target.session_names) - 1)
+    sessions = [target.session(i) for i in range(count)]
+
+    def work(session):
+        for _ in range(REQUESTS_PER_SESSION):
+            session.read_register("PC")
+
+    pool = ThreadPool(len(sessions))
+    try:
+        for n in CONCURRENCY:
+            if n > len(sessions):
+                break
+            runner.measure(
+                "sessions.concurrent_read_register_%dx%d" % (n, REQUESTS_PER_SESSION),
+                lambda: pool.map(work, sessions[:n]),
+            )
+    finally:
+        pool.close()
+        pool.join()
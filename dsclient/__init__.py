@@ -4,12 +4,31 @@ Licensed under the MIT license (see `LICENSE` file)
 
 Python client for interacting with DebugServer-js
 """
-from dsclient.core import DebugServer, DebugSession
+from dsclient.core import (
+    Batch,
+    DebugServer,
+    DebugSession,
+    FlashResult,
+    HaltFuture,
+    Pipeline,
+    ResponseFuture,
+    RetryPolicy,
+    wait_for_halt,
+    FIRST_HALTED,
+    ALL_HALTED,
+)
+from dsclient.exceptions import (
+    BatchException,
+    ConnectionException,
+    TimeoutException,
+)
 from dsclient.version import version_string as __version__
 
 __author__ = "Cameron Webb (webbjcam@gmail.com)"
 
 # Remove any imported modules we don't want exported
 del core
+del exceptions
+del metrics
 del utils
 del version
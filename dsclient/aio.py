@@ -0,0 +1,854 @@
+"""Contains asyncio versions of the core classes for dsclient
+
+Note:
+    This module requires Python 3.5+
+"""
+from dsclient import utils
+from dsclient import watch
+from dsclient import metrics
+from dsclient.core import (
+    BaseServer,
+    DebugServerRequests,
+    DebugSessionRequests,
+    Request,
+)
+from dsclient.exceptions import ConnectionException
+import time
+import asyncio
+
+# Max size of a single response (readData responses can be very large)
+READ_LIMIT = 2 ** 30
+
+
+class AsyncGenericServer(BaseServer):
+    """Generic asyncio Server class intended to be subclassed by
+    AsyncDebugServer and AsyncDebugSession classes
+
+    Requests are built and responses decoded by the same helpers as the
+    blocking client (see :py:class:`dsclient.core.BaseServer`). Timeouts and
+    the retry policy also work the same way.
+    """
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        codec=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        """Initializes Server object (not connected; the connection is opened
+        by the first request)
+
+        Arguments are the same as :py:class:`dsclient.core.BaseServer`.
+
+        Warning:
+            You should never instantiate this class directly. Instead use the
+            ``create`` coroutine which also connects to the server.
+        """
+        super(AsyncGenericServer, self).__init__(
+            host=host,
+            port=port,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    @classmethod
+    async def create(cls, host=None, port=None, **kwargs):
+        """Creates and connects a Server object
+
+        Args:
+            host (str, optional): hostname of existing Server to connect to (default="localhost")
+            port (int): port number of existing Server to connect to
+            **kwargs (dict, optional): other arguments of the class (codec,
+                timeout, timeouts, socket_options, retry)
+
+        Returns:
+            AsyncGenericServer: connected Server object
+        """
+        server = cls(host=host, port=port, **kwargs)
+        await server._connect()
+        return server
+
+    def is_connected(self):
+        """Returns whether the connection to the server has been opened
+
+        Returns:
+            bool: True if connection has been opened
+        """
+        return self._writer is not None
+
+    async def _connect(self):
+        """Opens the connection to the server
+
+        Raises:
+            TimeoutException: raised when connect_timeout expires
+            ConnectionException: raised when unable to connect to server
+        """
+        options = dict(self._socket_options)
+        connect_timeout = options.pop("connect_timeout", None)
+        try:
+            s = utils.create_socket(
+                self._port, host=self._hostname, connect=False, **options
+            )
+        except Exception:
+            raise self._connect_failed(False)
+
+        try:
+            s.setblocking(False)
+            await asyncio.wait_for(
+                asyncio.get_event_loop().sock_connect(s, (self._hostname, self._port)),
+                connect_timeout,
+            )
+            self._reader, self._writer = await asyncio.open_connection(
+                sock=s, limit=READ_LIMIT
+            )
+        except asyncio.TimeoutError:
+            s.close()
+            raise self._connect_failed(True)
+        except asyncio.CancelledError:
+            s.close()
+            raise
+        except Exception:
+            s.close()
+            raise self._connect_failed(False)
+
+    def _abort(self):
+        """Closes the connection without waiting (reopened on next request)"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def _close(self):
+        """Closes the connection to the server"""
+        writer = self._writer
+        self._abort()
+        if writer is not None and hasattr(writer, "wait_closed"):
+            await writer.wait_closed()
+
+    async def _send_req(self, command, **args):
+        """Sends request to server.
+
+        Request is constructed from name and **args. Requests sent concurrently
+        from multiple tasks are sent one at a time.
+
+        Args:
+            name (str): name of command
+            **args (dict): key word args to place in 'args' dict
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+        """
+        return await self._send(self._request(command, **args))
+
+    async def _send(self, request):
+        """Sends a request built by one of the request helpers
+
+        Args:
+            request (Request): request to send
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+        """
+        return await self._send_msg(request.command, request.msg, request.decode)
+
+    async def _send_msg(self, command, msg, decode=None):
+        """Sends an encoded request message to server.
+
+        Args:
+            command (str): name of command the message is for
+            msg (bytes): encoded request message
+            decode (callable, optional): function used to decode the response
+                message (default=codec.decode_response)
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+            ConnectionException: raised when connection is lost (and request
+                can not be retried)
+            TimeoutException: raised when request times out
+        """
+        return (await self._send_all([Request(command, msg, decode)]))[0]
+
+    async def _send_all(self, requests):
+        """Sends requests built by the request helpers in one exchange
+
+        All request messages are written before any response is read (like
+        :py:class:`dsclient.Pipeline`), so the requests take about one round
+        trip. Requests are retried (all of them) only if every command can be
+        retried.
+
+        Args:
+            requests (list): requests (Request) to send
+
+        Returns:
+            list: 'data' return value (or None) of each request
+
+        Raises:
+            Exception: raised when a response received is an error (after all
+                responses are received)
+            ConnectionException: raised when connection is lost (and requests
+                can not be retried)
+            TimeoutException: raised when a request times out
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        attempt = 0
+        while True:
+            sent = False
+            try:
+                async with self._lock:
+                    if self._writer is None:
+                        await self._connect()
+
+                    sent = True
+                    resps = await self._exchange(requests)
+                break
+            except (ConnectionException, OSError) as e:
+                error = e
+
+            error = self._connection_lost(error)
+            self._abort()
+            if self._retry is None or not all(
+                self._retry.can_retry(request.command, attempt, sent)
+                for request in requests
+            ):
+                raise error
+            await asyncio.sleep(self._retry.delay(attempt))
+            attempt += 1
+
+        return [
+            self._handle_resp(
+                request.command, (request.decode or self._codec.decode_response)(resp)
+            )
+            for request, resp in zip(requests, resps)
+        ]
+
+    async def _exchange(self, requests):
+        """Sends request messages and returns their response messages
+
+        The connection is closed if a request times out or the task is
+        cancelled before all responses are read (late responses would
+        otherwise be read as the responses of the next requests).
+        """
+        resps = list()
+        try:
+            self._writer.write(b"".join(request.msg for request in requests))
+            await self._writer.drain()
+            for request in requests:
+                timeout = self.get_timeout(request.command)
+                resp = await asyncio.wait_for(self._reader.readline(), timeout)
+                if not resp.endswith(b"\n"):
+                    raise ConnectionException(
+                        "Connection closed before response was received"
+                    )
+                resps.append(resp[:-1])
+        except asyncio.TimeoutError:
+            self._abort()
+            raise self._timeout_exception(request.command, timeout)
+        except asyncio.CancelledError:
+            self._abort()
+            raise
+
+        return resps
+
+
+class AsyncDebugServer(AsyncGenericServer, DebugServerRequests):
+    """asyncio version of :py:class:`dsclient.DebugServer`
+
+    Example::
+
+        server = await AsyncDebugServer.create(port=4444)
+        await server.set_config("/path/to/device.ccxml")
+        session = await server.open_session("Cortex_M3_0")
+        await session.connect()
+    """
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        codec=None,
+        data_encoding=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        self._init_sessions(data_encoding)
+        super(AsyncDebugServer, self).__init__(
+            host=host,
+            port=port,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
+
+    @classmethod
+    async def create(cls, host=None, port=None, list_sessions=True, **kwargs):
+        """Creates and connects an AsyncDebugServer object
+
+        Handles to sessions that are already open are created, but do not
+        connect to their session until first used.
+
+        Args:
+            host (str, optional): hostname of existing DebugServer to connect to (default="localhost")
+            port (int): port number of existing DebugServer to connect to
+            list_sessions (boolean, optional): get the list of already open
+                sessions now (default = True; see
+                :py:class:`dsclient.DebugServer`)
+            **kwargs (dict, optional): other arguments of
+                :py:class:`dsclient.DebugServer` (codec, data_encoding,
+                timeout, timeouts, socket_options, retry)
+
+        Returns:
+            AsyncDebugServer: connected AsyncDebugServer object
+        """
+        server = await super(AsyncDebugServer, cls).create(
+            host=host, port=port, **kwargs
+        )
+        if list_sessions:
+            await server.refresh_sessions()
+
+        return server
+
+    async def refresh_sessions(self):
+        """Adds a handle for each session open on the DebugServer that does
+        not have one yet. New handles connect to their session when first used.
+        """
+        existing_sessions = await self._send_req("getListOfSessions")
+        for session in existing_sessions:
+            if session["name"] not in self._sessions:
+                self.__add_session(session["name"], session["port"])
+        self._sessions_listed = True
+
+    def __add_session(self, session_name, port):
+        """Creates and stores handle to a session (not connected)
+
+        Args:
+            session_name (str): full session name
+            port (int): port number of session
+
+        Returns:
+            AsyncDebugSession: AsyncDebugSession object
+        """
+        session = AsyncDebugSession(
+            port=port, name=session_name, **self._session_options()
+        )
+        self._sessions[session_name] = session
+
+        return session
+
+    async def __resolve_session_name(self, session_name):
+        """Resolves the provided session_name (regex) to the full session name
+        to use.
+
+        Args:
+            session_name (str): session name to resolve (can be regex pattern)
+
+        Returns:
+            str: full session name string to use with :py:meth:`AsyncDebugServer.open_session`
+        """
+        full_name = self._cached_session_name(session_name)
+        if full_name is None:
+            # Get list of available (full) session names
+            potential_sessions = self._cpus
+            if potential_sessions is None:
+                potential_sessions = await self.get_list_of_cpus()
+            full_name = self._match_session_name(session_name, potential_sessions)
+
+        return full_name
+
+    async def set_config(self, ccxml_path):
+        """Set ccxml file for DebugServer
+
+        Args:
+            ccxml_path (str): full path to ccxml file to set
+        """
+        self.invalidate_session_name_cache()
+        return await self._send_req("setConfig", path=ccxml_path)
+
+    async def get_config(self):
+        """Get ccxml file in use by DebugServer
+
+        Returns:
+            str: ccxml file in use by DebugServer
+
+        """
+        return await self._send_req("getConfig")
+
+    async def create_config(
+        self, name, connection=None, device=None, board=None, directory=None
+    ):
+        """Creates a ccxml file using the provided parameters
+
+        Args:
+            name (str): name of ccxml file to create
+            connection (str): connection name to use (required if board is ommitted)
+            device (str): devicetype name to use (required if board is ommitted)
+            board (str): board name to use (required if connection + device ommitted)
+            directory (str): full path to directory location to place file
+
+        """
+        request = self._create_config_req(
+            name, connection=connection, device=device, board=board, directory=directory
+        )
+
+        self.invalidate_session_name_cache()
+        return await self._send(request)
+
+    async def get_list_of_cpus(self):
+        """Returns list of CPU names
+
+        Returns:
+            list: list of CPU names
+        """
+        self._set_cpus(await self._send_req("getListOfCPUs"))
+        return self._cpus
+
+    async def get_list_of_devices(self):
+        """Returns list of device names
+
+        Returns:
+            list: list of device names
+        """
+        return await self._send_req("getListOfDevices")
+
+    async def get_list_of_connections(self):
+        """Returns list of connection names
+
+        Returns:
+            list: list of connection names
+        """
+        return await self._send_req("getListOfConnections")
+
+    async def get_list_of_configurations(self):
+        """Returns list of configuration files
+
+        Returns:
+            list: list of configuration files
+        """
+        return await self._send_req("getListOfConfigurations")
+
+    async def open_session(self, name):
+        """Open a session for the provided session name
+
+        Args:
+            name (str): session name to open
+
+        Returns:
+            AsyncDebugSession: AsyncDebugSession object
+        """
+        session_name = await self.__resolve_session_name(name)
+
+        # The session may have been opened by another client
+        if session_name not in self._sessions and not self._sessions_listed:
+            await self.refresh_sessions()
+
+        if session_name in list(self._sessions.keys()):
+            raise Exception("Session: %s is already open." % session_name)
+
+        session_info = await self._send_req("openSession", name=session_name)
+        session = self.__add_session(session_name, session_info["port"])
+        await session._connect()
+
+        return session
+
+    async def get_session(self, name):
+        """Returns handle to the open session
+
+        Args:
+            name (str): name of open session to retrieve handle for
+
+        Returns:
+            AsyncDebugSession: AsyncDebugSession object
+        """
+        session_name = await self.__resolve_session_name(name)
+
+        if session_name not in self._sessions and not self._sessions_listed:
+            await self.refresh_sessions()
+
+        if session_name not in list(self._sessions.keys()):
+            raise Exception("Session: %s is not open." % session_name)
+
+        return self._sessions[session_name]
+
+    async def terminate_session(self, name):
+        """Terminates an open session
+
+        Args:
+            name (str): name of session to terminate
+
+        Raises:
+            Exception: raises exception if problem terminating session
+        """
+        if name not in list(self._sessions.keys()):
+            raise Exception("DebugSession: %s not open." % name)
+        await self._sessions[name].stop()
+
+        await self._send_req("terminateSession", name=name)
+        del self._sessions[name]
+
+    async def get_list_of_sessions(self):
+        """Returns list of open sessions
+
+        Returns:
+            list: list of open sessions
+        """
+        if not self._sessions_listed:
+            await self.refresh_sessions()
+
+        return self._sessions
+
+    async def attach_ccs(self):
+        """Opens a CCS GUI instance for the DebugServer
+
+        Raises:
+            Exception: raises exception if problem opening CCS
+        """
+        return await self._send_req("attachCCS")
+
+    async def kill(self):
+        """Kills Debug Server (including any open sessions) """
+        for session_name in list(self._sessions.keys()):
+            await self.terminate_session(session_name)
+
+        await self._send_req("killServer")
+        await self._close()
+
+
+class AsyncDebugSession(AsyncGenericServer, DebugSessionRequests):
+    """asyncio version of :py:class:`dsclient.DebugSession`
+
+    Warning:
+        You should never instantiate this class directly. Instead call the
+        :py:meth:`AsyncDebugServer.open_session` coroutine to create an
+        AsyncDebugSession object
+    """
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        name=None,
+        codec=None,
+        data_encoding=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        super(AsyncDebugSession, self).__init__(
+            host=host,
+            port=port,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
+        self._name = name
+        self._init_data_encoding(data_encoding)
+
+    async def connect(self):
+        """Connect to the device."""
+        await self._send_req("connect")
+
+    async def disconnect(self):
+        """Disconnect from the device."""
+        await self._send_req("disconnect")
+
+    async def erase(self):
+        """Erases device's flash memory.
+
+        """
+        await self._send_req("erase")
+
+    async def reset(self):
+        """Resets device.
+
+        """
+        await self._send_req("reset")
+
+    async def load(self, file, binary=False, address=None):
+        """Loads image into device's flash.
+
+        Args:
+            file (str): full path to file to load into flash
+            binary (boolean, optional): specify to load image as binary (default = False)
+            address (int, optional): specify to load binary image at specifc address (only to be used when 'binary' is True; default=0x0)
+
+
+        Raises:
+            Exception if image fails to load
+        """
+        await self._send(self._load_req("load", file, binary, address))
+
+    async def verify(self, file, binary=False, address=None):
+        """Verifies image in device's flash.
+
+        Args:
+            file (str): full path to file to verify in flash
+            binary (boolean, optional): specify to verify image as binary (default = False)
+            address (int, optional): specify to verify binary image at specifc address (only to be used when 'binary' is True; default=0x0)
+
+
+        Raises:
+            Exception if image fails verification process
+        """
+        await self._send(self._load_req("verify", file, binary, address))
+
+    async def evaluate(self, expression, file=None):
+        """Evaluates an expression (after loading optional symbols file)
+
+        Args:
+            expression (str): C/GEL expression to evaluate
+            file (str, optional): path to file containing symbols to load before evaluating
+
+        Returns:
+            int: result of evaluated expression
+
+
+        Raises:
+            Exception if expression is invalid.
+        """
+        return await self._send(self._evaluate_req(expression, file))
+
+    async def read_data(self, address, page=0, num_bytes=1, output=None):
+        """Read memory from device
+
+        Args:
+            address (int): address to read data from
+            page (int, optional): page in memory to get address from (default = 0)
+            num_bytes (int, optional): number of bytes to read
+            output (str, optional): return bytes read as one of "list",
+                "bytes", "bytearray", "memoryview" or "numpy" (default = "list")
+
+        Returns:
+            list: list of bytes(ints) read (or buffer type specified by output)
+
+
+        Raises:
+            Exception if address location is invalid.
+        """
+        return await self._send(self._read_data_req(address, page, num_bytes, output))
+
+    def watch(
+        self,
+        addresses,
+        interval=None,
+        size=None,
+        page=0,
+        signed=False,
+        byteorder="little",
+        count=None,
+        ring=None,
+    ):
+        """Samples memory at a fixed rate (see
+        :py:meth:`dsclient.DebugSession.watch`)::
+
+            async for sample in session.watch([0x20000000], interval=0.005):
+                print(sample.timestamp, sample.values)
+
+        Returns:
+            AsyncWatch: async iterator of :py:class:`dsclient.watch.WatchSample`
+        """
+        plan = watch.WatchPlan(
+            addresses,
+            size=size or watch.DEFAULT_SIZE,
+            signed=signed,
+            byteorder=byteorder,
+        )
+
+        return AsyncWatch(
+            self,
+            plan,
+            interval or watch.DEFAULT_INTERVAL,
+            page=page,
+            count=count,
+            ring=ring,
+        )
+
+    async def write_data(self, data, address, page=0):
+        """Write to memory on device
+
+        Args:
+            data (list): list of bytes (ints) to write to memory (can also be
+                bytes, bytearray, memoryview or numpy.uint8 array)
+            address (int): address to read data from
+            page (int, optional): page in memory to get address from (default = 0)
+
+
+        Raises:
+            Exception if address location is invalid.
+        """
+        return await self._send(self._write_data_req(data, address, page))
+
+    async def read_register(self, name):
+        """Read value from register
+
+        Args:
+            name (str): register name to read
+
+        Returns:
+            int: value of register read
+
+
+        Raises:
+            Exception if register name is invalid.
+        """
+        return await self._send(self._read_register_req(name))
+
+    async def write_register(self, name, value):
+        """Write value to register on device
+
+        Args:
+            name (str): register name to write to
+            value (int): value to write to register
+
+
+        Raises:
+            Exception if register name is invalid.
+        """
+        return await self._send(self._write_register_req(name, value))
+
+    async def get_option(self, option_id):
+        """Get the value of a device option
+
+        Args:
+            option_id (str): name of device option
+
+        Returns:
+            any: value of option
+
+
+        Raises:
+            Exception if option id is invalid.
+        """
+        return await self._send(self._get_option_req(option_id))
+
+    async def set_option(self, option_id, value):
+        """Set the value of a device option
+
+        Args:
+            option_id (str): name of device option
+            value (any): value to set option to
+
+
+        Raises:
+            Exception if option id is invalid.
+        """
+        return await self._send(self._set_option_req(option_id, value))
+
+    async def perform_operation(self, opcode):
+        """Performs flash operation
+
+        Args:
+            opcode (str): name of operation to perform (opcode)
+
+        Returns:
+            any: returns value of performing operation
+
+
+        Raises:
+            Exception if opcode is invalid.
+        """
+        return await self._send(self._perform_operation_req(opcode))
+
+    async def run(self, asynchronous=False):
+        """Issues the run command to the device
+
+        Args:
+            asynchronous (boolean, optional): run and return control immediately (default = False)
+        """
+        await self._send(self._run_req(asynchronous))
+
+    async def halt(self, wait=False):
+        """Halts the device
+
+        Args:
+            wait (boolean): wait until device is actually halted before returning
+        """
+        await self._send(self._halt_req(wait))
+
+    def run_nowait(self):
+        """Runs the device until it halts (e.g. at a breakpoint) in a
+        background task
+
+        Wait on many sessions at once with ``asyncio.wait``/``asyncio.gather``.
+
+        Returns:
+            asyncio.Task: completes when the target halts
+        """
+        return asyncio.ensure_future(self.run())
+
+    def halt_nowait(self):
+        """Halts the device in a background task
+
+        Returns:
+            asyncio.Task: completes when the target has halted
+        """
+        return asyncio.ensure_future(self.halt(wait=True))
+
+    async def stop(self):
+        """Stops the session thread but does not terminate the session."""
+        await self._send_req("stop")
+        await self._close()
+
+
+class AsyncWatch(watch.Watch):
+    """Async iterator of samples of watched addresses (see
+    :py:meth:`AsyncDebugSession.watch`)"""
+
+    def __iter__(self):
+        raise TypeError("AsyncWatch is an async iterator (use 'async for')")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._stopped or (
+            self.count is not None and self.stats.samples >= self.count
+        ):
+            raise StopAsyncIteration
+
+        delay, missed = self._schedule.delay(metrics.timer())
+        self.stats.missed += missed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        start = metrics.timer()
+        wall = time.time()
+        await self._poll()
+        latency = metrics.timer() - start
+        self.stats.add(start, latency, max(0.0, start - self._schedule.scheduled))
+        self._schedule.advance()
+
+        sample = watch.WatchSample(wall + latency / 2, latency, self.plan.decode())
+        if self.ring is not None:
+            self.ring.append(sample.timestamp, sample.values)
+
+        return sample
+
+    async def _poll(self):
+        """Reads all regions in one pipelined exchange"""
+        results = await self._session._send_all(self._read_requests())
+        for index, data in enumerate(results):
+            self.plan.fill(index, data)
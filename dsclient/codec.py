@@ -0,0 +1,171 @@
+"""Contains JSON codecs used to encode requests and decode responses
+
+The fastest installed JSON library is used by default (in order of
+preference: orjson, ujson, simdjson and finally the standard library json
+module). A codec can also be chosen per connection by passing its name (or a
+codec object) as the ``codec`` argument of :py:class:`dsclient.DebugServer`.
+"""
+import sys
+import json
+import collections
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# json.loads only accepts bytes in Python 3.6+ (str is bytes in Python 2)
+_JSON_LOADS_BYTES = sys.version_info[0] == 2 or sys.version_info >= (3, 6)
+
+
+class JSONCodec(object):
+    """Codec using the standard library json module"""
+
+    name = "json"
+
+    def dumps(self, obj):
+        """Encodes an object as JSON
+
+        Args:
+            obj (dict): object to encode
+
+        Returns:
+            bytes: JSON encoded object
+        """
+        return json.dumps(obj).encode()
+
+    def loads(self, msg):
+        """Decodes a JSON message
+
+        Args:
+            msg (bytes): JSON message to decode
+
+        Returns:
+            dict: decoded object
+        """
+        if _JSON_LOADS_BYTES:
+            return json.loads(msg)
+        return json.loads(msg.decode())
+
+    def encode_request(self, req):
+        """Encodes a request as a newline terminated JSON message
+
+        Args:
+            req (dict): request to encode
+
+        Returns:
+            bytes: encoded message ready to send over socket
+        """
+        return self.dumps(req) + b"\n"
+
+    def decode_response(self, msg):
+        """Decodes a JSON response message
+
+        Args:
+            msg (bytes): message received (without delimiter)
+
+        Returns:
+            dict: JSON formatted response
+        """
+        return self.loads(msg)
+
+    def __repr__(self):
+        return "<%s>" % type(self).__name__
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec using orjson (encodes and decodes bytes directly)"""
+
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, msg):
+        return orjson.loads(msg)
+
+    def encode_request(self, req):
+        return orjson.dumps(req, option=orjson.OPT_APPEND_NEWLINE)
+
+
+class UjsonCodec(JSONCodec):
+    """Codec using ujson"""
+
+    name = "ujson"
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, escape_forward_slashes=False).encode()
+
+    def loads(self, msg):
+        return ujson.loads(msg)
+
+
+class SimdjsonCodec(JSONCodec):
+    """Codec using pysimdjson for decoding (encoding uses json module)"""
+
+    name = "simdjson"
+
+    def loads(self, msg):
+        return simdjson.loads(msg)
+
+
+# Codecs in order of preference with the module each requires
+CODECS = collections.OrderedDict(
+    [
+        ("orjson", (OrjsonCodec, orjson)),
+        ("ujson", (UjsonCodec, ujson)),
+        ("simdjson", (SimdjsonCodec, simdjson)),
+        ("json", (JSONCodec, json)),
+    ]
+)
+
+
+def available_codecs():
+    """Returns names of codecs whose JSON library is installed
+
+    Returns:
+        list: codec names in order of preference
+    """
+    return [name for name, (_, module) in CODECS.items() if module is not None]
+
+
+def get_codec(codec=None):
+    """Returns a codec object
+
+    Args:
+        codec (str or JSONCodec, optional): name of codec (see
+            :py:data:`CODECS`) or codec object (default=fastest installed codec)
+
+    Returns:
+        JSONCodec: codec object
+
+    Raises:
+        Exception: raised when codec is unknown or its library is not installed
+    """
+    if codec is None:
+        return DEFAULT_CODEC
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec not in CODECS:
+        raise Exception(
+            "Invalid codec: %s (must be one of %s)" % (codec, str(list(CODECS.keys())))
+        )
+
+    cls, module = CODECS[codec]
+    if module is None:
+        raise Exception("%s codec requires %s to be installed" % (codec, codec))
+
+    return cls()
+
+
+DEFAULT_CODEC = get_codec(available_codecs()[0])
@@ -1,79 +1,1687 @@
 """Contains the core class for dsclient"""
 from dsclient import utils
-import re
+from dsclient import image
+from dsclient import metrics
+from dsclient import watch
+from dsclient.codec import get_codec
+from dsclient.exceptions import (
+    BatchException,
+    ConnectionException,
+    TimeoutException,
+)
+import os
+import mmap
+import time
+import select
+import socket
+import functools
+import itertools
+import collections
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_PIPELINE_WINDOW = 64
+DEFAULT_FLASH_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 16384
+DEFAULT_MEMORY_BLOCK_SIZE = 256
+DEFAULT_MEMORY_CACHE_BLOCKS = 1024
+DEFAULT_SECTOR_SIZE = 4096
+
+# Commands that do not change device state (all other commands clear the
+# register/memory caches)
+READ_ONLY_COMMANDS = frozenset(["readData", "readRegister", "getOption"])
+
+# Commands that may change the contents of flash (these commands remove the
+# device's image cache entry)
+FLASH_WRITE_COMMANDS = frozenset(
+    ["erase", "load", "writeData", "evaluate", "performOperation"]
+)
+
+# Types of file arguments treated as paths (not file objects)
+_PATH_TYPES = (str, bytes, type(u"")) + (
+    (os.PathLike,) if hasattr(os, "PathLike") else ()
+)
+
+# Values of return_when for wait_for_halt
+FIRST_HALTED = "FIRST_HALTED"
+ALL_HALTED = "ALL_HALTED"
+
+# Commands that are safe to send again after the connection is lost
+DEFAULT_IDEMPOTENT_COMMANDS = frozenset(
+    [
+        "readData",
+        "readRegister",
+        "getOption",
+        "evaluate",
+        "getConfig",
+        "getListOfCPUs",
+        "getListOfDevices",
+        "getListOfConnections",
+        "getListOfConfigurations",
+        "getListOfSessions",
+    ]
+)
+
+
+class Request(collections.namedtuple("Request", ["command", "msg", "decode"])):
+    """Encoded request message of a command
+
+    Attributes:
+        command (str): name of command
+        msg (bytes): encoded request message
+        decode (callable): function used to decode the response message (None
+            for the codec's decode_response)
+    """
+
+    __slots__ = ()
+
+
+def _is_failed(resp):
+    """Returns whether a response is an error"""
+    return resp.get("status") == "FAIL"
+
+
+def _join_sectors(sectors):
+    """Joins contiguous sectors so they can be read/written in one region
+
+    Args:
+        sectors (OrderedDict): sector address -> bytearray (sorted by address)
+
+    Returns:
+        list: [address, bytearray] of each run of contiguous sectors
+    """
+    runs = list()
+    for address, data in sectors.items():
+        if len(runs) > 0 and runs[-1][0] + len(runs[-1][1]) == address:
+            runs[-1][1] += data
+        else:
+            runs.append([address, bytearray(data)])
+    return runs
 
 
-class GenericServer(object):
-    """Generic Server class intended to be subclassed by DebugServer and DebugSession classes"""
+class RetryPolicy(object):
+    """Policy for reconnecting (with exponential backoff) and retrying a
+    request when the connection to the server is lost
 
-    def __init__(self, host=None, port=None):
-        """Initializes Server object
+    A request that was not sent yet (connecting failed) is always retried.
+    A request that was sent is only sent again if it is safe to repeat
+    (see ``commands``), since the server may have executed it already.
+    """
+
+    def __init__(
+        self, retries=3, backoff=0.1, max_backoff=5.0, commands=None, allow_unsafe=False
+    ):
+        """
+        Args:
+            retries (int, optional): max number of retries per request (default = 3)
+            backoff (float, optional): seconds to wait before the first retry;
+                doubled for each retry after (default = 0.1)
+            max_backoff (float, optional): max seconds to wait before a retry
+                (default = 5.0)
+            commands (iterable, optional): names of commands safe to send
+                again (default = read only commands such as readData,
+                readRegister, getOption and evaluate)
+            allow_unsafe (boolean, optional): also send other commands (e.g.
+                erase, load, writeData) again (default = False)
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.commands = frozenset(
+            DEFAULT_IDEMPOTENT_COMMANDS if commands is None else commands
+        )
+        self.allow_unsafe = allow_unsafe
+
+    def can_retry(self, command, attempt, sent=True):
+        """Returns whether a request should be retried
+
+        Args:
+            command (str): name of command
+            attempt (int): number of retries done so far
+            sent (boolean, optional): whether the request was sent before the
+                connection was lost (default = True)
+
+        Returns:
+            bool: True if request should be retried
+        """
+        if attempt >= self.retries:
+            return False
+        return not sent or self.allow_unsafe or command in self.commands
+
+    def delay(self, attempt):
+        """Returns seconds to wait before a retry
+
+        Args:
+            attempt (int): number of retries done so far
 
+        Returns:
+            float: seconds to wait
+        """
+        return min(self.backoff * (2 ** attempt), self.max_backoff)
+
+
+class BaseServer(object):
+    """Connection settings, request encoding and response handling shared by
+    the blocking (:py:class:`GenericServer`) and asyncio
+    (:py:class:`dsclient.aio.AsyncGenericServer`) clients"""
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        codec=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        """
         Args:
             host (str, optional): hostname of existing Server to connect to (default="localhost")
             port (int): port number of existing Server to connect to
+            codec (str or JSONCodec, optional): JSON codec used to encode
+                requests and decode responses (default = fastest installed
+                codec; see :py:mod:`dsclient.codec`)
+            timeout (float, optional): seconds to wait for a response before
+                raising :py:class:`TimeoutException` (default = None; wait forever)
+            timeouts (dict, optional): command name -> timeout overriding
+                timeout for that command (e.g. long for 'load', short for
+                'readRegister')
+            socket_options (dict, optional): keyword arguments passed to
+                :py:func:`dsclient.utils.create_socket` (connect_timeout,
+                nodelay, keepalive, send_buffer, recv_buffer)
+            retry (RetryPolicy, optional): reconnect and retry requests when
+                the connection is lost (default = None; raise
+                :py:class:`ConnectionException`)
         """
+        self._codec = get_codec(codec)
+        self._retry = retry
+        self._timeout = timeout
+        self._timeouts = dict(timeouts or dict())
+        self._socket_options = dict(socket_options or dict())
         self._port = port
         self._hostname = host or "localhost"
+
+    def _request(self, command, **args):
+        """Returns encoded request of a command
+
+        Args:
+            command (str): name of command
+            **args (dict): key word args to place in 'args' dict
+
+        Returns:
+            Request: request (response decoded by the codec)
+        """
+        return Request(
+            command,
+            self._codec.encode_request(utils.create_request(command, **args)),
+            None,
+        )
+
+    def _handle_resp(self, command, resp):
+        """Returns the 'data' value of a response
+
+        Args:
+            command (str): name of command the response is for
+            resp (dict): response received
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+        """
+        if resp["status"] == "FAIL":
+            raise Exception("Command %s failed: %s" % (command, resp["message"]))
+
+        return resp["data"] if "data" in list(resp.keys()) else None
+
+    def _connection_lost(self, error):
+        """Returns ConnectionException to raise for an error of the connection"""
+        if isinstance(error, ConnectionException):
+            return error
+        return ConnectionException(
+            "Connection to %s(%s,%s) lost: %s"
+            % (type(self).__name__, self._hostname, self._port, error)
+        )
+
+    def _connect_failed(self, timed_out):
+        """Returns exception to raise when the connection could not be opened"""
+        if timed_out:
+            return TimeoutException(
+                "Timed out connecting to %s(%s,%s)"
+                % (type(self).__name__, self._hostname, self._port),
+                timeout=self._socket_options.get("connect_timeout"),
+            )
+        return ConnectionException(
+            "Could not connect to %s(%s,%s)"
+            % (type(self).__name__, self._hostname, self._port)
+        )
+
+    def _timeout_exception(self, command, timeout):
+        """Returns TimeoutException to raise when a request timed out"""
+        return TimeoutException(
+            "Command %s timed out after %s seconds" % (command, timeout),
+            command=command,
+            timeout=timeout,
+        )
+
+    def get_timeout(self, command=None):
+        """Returns seconds to wait for a response
+
+        Args:
+            command (str, optional): name of command (default returns the
+                default timeout)
+
+        Returns:
+            float: timeout (None if no timeout)
+        """
+        if command is None:
+            return self._timeout
+        return self._timeouts.get(command, self._timeout)
+
+    def set_timeout(self, timeout, command=None):
+        """Sets seconds to wait for a response before raising
+        :py:class:`TimeoutException`
+
+        Args:
+            timeout (float): seconds to wait (None waits forever)
+            command (str, optional): name of command to set timeout of
+                (default sets default timeout of all commands)
+        """
+        if command is None:
+            self._timeout = timeout
+        else:
+            self._timeouts[command] = timeout
+
+    def get_retry_policy(self):
+        """Returns the reconnect/retry policy
+
+        Returns:
+            RetryPolicy: policy (None if requests are not retried)
+        """
+        return self._retry
+
+    def set_retry_policy(self, retry):
+        """Sets the reconnect/retry policy used when the connection is lost
+
+        Args:
+            retry (RetryPolicy): policy (None to not retry requests)
+        """
+        self._retry = retry
+
+    def get_codec(self):
+        """Returns the JSON codec used by this connection
+
+        Returns:
+            JSONCodec: codec object
+        """
+        return self._codec
+
+    def set_codec(self, codec):
+        """Sets the JSON codec used by this connection
+
+        Args:
+            codec (str or JSONCodec): name of codec ("orjson", "ujson",
+                "simdjson" or "json") or codec object
+
+        Raises:
+            Exception: raised when codec is unknown or not installed
+        """
+        self._codec = get_codec(codec)
+
+
+class GenericServer(BaseServer):
+    """Generic Server class intended to be subclassed by DebugServer and DebugSession classes"""
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        lazy=False,
+        codec=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        """Initializes Server object
+
+        Args:
+            lazy (boolean, optional): wait until the first request to connect
+                to the Server (default = False)
+
+        Other arguments are the same as :py:class:`BaseServer`.
+        """
+        super(GenericServer, self).__init__(
+            host=host,
+            port=port,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
+        self._socket_timeout = None
+        self._request_ids = itertools.count()
+        self._in_flight = collections.deque()
+        self._server_socket = None
+        self._reader = None
+        self._metrics = None
+        if not lazy:
+            self._connect()
+
+    def is_connected(self):
+        """Returns whether the socket to the server has been opened
+
+        Returns:
+            bool: True if socket has been opened
+        """
+        return self._server_socket is not None
+
+    def _connect(self):
+        """Opens the socket (and its response reader) to the server
+
+        Raises:
+            TimeoutException: raised when connect_timeout expires
+            ConnectionException: raised when unable to connect to server
+        """
         try:
-            self._server_socket = utils.create_socket(self._port, host=self._hostname)
+            self._server_socket = utils.create_socket(
+                self._port, host=self._hostname, **self._socket_options
+            )
+        except socket.timeout:
+            raise self._connect_failed(True)
         except:
+            raise self._connect_failed(False)
+        self._socket_timeout = None
+        self._reader = utils.StreamReader(self._server_socket)
+
+    def _close(self, exception=None):
+        """Closes the socket to the server (reopened on next request)
+
+        Args:
+            exception (Exception, optional): exception to fail in-flight
+                pipelined requests with
+        """
+        if self._server_socket is not None:
+            try:
+                self._server_socket.close()
+            except Exception:
+                pass
+        self._server_socket = None
+        self._reader = None
+        while len(self._in_flight) > 0:
+            self._in_flight.popleft()._set_exception(
+                exception or ConnectionException("Connection closed")
+            )
+
+    def _apply_timeout(self, command):
+        """Sets the socket timeout for command (if not already set)
+
+        Returns:
+            float: timeout set (None if no timeout)
+        """
+        timeout = self._timeouts.get(command, self._timeout)
+        if timeout != self._socket_timeout:
+            self._server_socket.settimeout(timeout)
+            self._socket_timeout = timeout
+        return timeout
+
+    def _timed_out(self, command, timeout):
+        """Closes the connection after a request timed out (a late response
+        would otherwise be read as the response of the next request)
+
+        Returns:
+            TimeoutException: exception to raise
+        """
+        exception = self._timeout_exception(command, timeout)
+        self._close(exception)
+        return exception
+
+    def _send_req(self, command, **args):
+        """Sends request to server socket.
+
+        Request is constructed from name and **args
+
+        Args:
+            name (str): name of command
+            **args (dict): key word args to place in 'args' dict
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+        """
+        self._before_send(command)
+        return self._send(self._request(command, **args))
+
+    def _before_send(self, command):
+        """Called before a request for any command is sent with _send_req or
+        queued on a Pipeline (subclasses update cached state here)
+
+        Args:
+            command (str): name of command
+        """
+        pass
+
+    def _send(self, request):
+        """Sends a request built by one of the request helpers
+
+        Args:
+            request (Request): request to send
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+        """
+        return self._send_msg(request.command, request.msg, request.decode)
+
+    def _send_msg(self, command, msg, decode=None):
+        """Sends an encoded request message to server socket.
+
+        Args:
+            command (str): name of command the message is for
+            msg (bytes): encoded request message
+            decode (callable, optional): function used to decode the response
+                message (default=codec.decode_response)
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+            ConnectionException: raised when connection is lost (and request
+                can not be retried)
+            TimeoutException: raised when request times out
+        """
+        decode = decode or self._codec.decode_response
+
+        attempt = 0
+        while True:
+            sent = False
+            try:
+                if self._server_socket is None:
+                    self._connect()
+
+                # Responses arrive in order, so collect any pipelined responses first
+                self._drain_in_flight()
+
+                sent = True
+                resp = self._exchange(command, msg, decode)
+                break
+            except (ConnectionException, socket.error) as e:
+                error = e
+
+            error = self._connection_lost(error)
+            self._close(error)
+            if self._retry is None or not self._retry.can_retry(command, attempt, sent):
+                raise error
+            time.sleep(self._retry.delay(attempt))
+            attempt += 1
+
+        return self._handle_resp(command, resp)
+
+    def _exchange(self, command, msg, decode):
+        """Sends a request message and returns the decoded response"""
+        timeout = self._apply_timeout(command)
+        try:
+            if self._metrics is None:
+                self._server_socket.sendall(msg)
+                resp = decode(self._reader.readline())
+            else:
+                start = metrics.timer()
+                raw = b""
+                try:
+                    self._server_socket.sendall(msg)
+                    raw = self._reader.readline()
+                    resp = decode(raw)
+                except Exception:
+                    self._record(command, start, len(msg), len(raw), True)
+                    raise
+                self._record(command, start, len(msg), len(raw) + 1, _is_failed(resp))
+        except socket.timeout:
+            raise self._timed_out(command, timeout)
+
+        return resp
+
+    def _record(self, command, start, request_bytes, response_bytes, error):
+        """Records a completed request in the metrics"""
+        self._metrics.record(
+            command, metrics.timer() - start, request_bytes, response_bytes, error
+        )
+
+    def _write_reqs(self, futures, msgs):
+        """Writes encoded requests in a single send and marks them in-flight
+
+        Args:
+            futures (list): ResponseFuture for each request
+            msgs (list): encoded request messages (same order as futures)
+        """
+        if self._server_socket is None:
+            self._connect()
+
+        if self._metrics is not None:
+            start = metrics.timer()
+            for future, msg in zip(futures, msgs):
+                future._sent_at = start
+                future._request_bytes = len(msg)
+
+        self._server_socket.sendall(b"".join(msgs))
+        self._in_flight.extend(futures)
+
+    def _read_next_resp(self):
+        """Reads the response of the oldest in-flight request and completes
+        its ResponseFuture
+        """
+        future = self._in_flight.popleft()
+        raw = b""
+        try:
+            timeout = self._apply_timeout(future.command)
+            raw = self._reader.readline()
+            resp = future._decode(raw)
+        except Exception as e:
+            if isinstance(e, socket.timeout):
+                e = self._timed_out(future.command, timeout)
+            elif isinstance(e, (ConnectionException, socket.error)):
+                # Remaining in-flight requests will not get a response either
+                self._close(e)
+            future._set_exception(e)
+            if self._metrics is not None and future._sent_at is not None:
+                self._record(
+                    future.command,
+                    future._sent_at,
+                    future._request_bytes,
+                    len(raw),
+                    True,
+                )
+            raise e
+        if self._metrics is not None and future._sent_at is not None:
+            self._record(
+                future.command,
+                future._sent_at,
+                future._request_bytes,
+                len(raw) + 1,
+                _is_failed(resp),
+            )
+        future._set_resp(resp)
+
+    def _drain_in_flight(self, count=None):
+        """Reads responses of in-flight requests
+
+        Args:
+            count (int, optional): max number of in-flight requests to leave
+                pending (default = 0; read all responses)
+        """
+        count = count or 0
+        while len(self._in_flight) > count:
+            self._read_next_resp()
+
+    def enable_metrics(self, callback=None, name=None):
+        """Starts recording latency, request/response sizes and errors of
+        every request (per command)
+
+        Args:
+            callback (callable, optional): called with an event dict (name,
+                command, latency, request_bytes, response_bytes, error) after
+                every request
+            name (str, optional): name to identify this connection with
+                (default="<host>:<port>")
+        """
+        self._metrics = metrics.Metrics(
+            name=name or "%s:%s" % (self._hostname, self._port), callback=callback
+        )
+
+    def disable_metrics(self):
+        """Stops recording metrics (and discards recorded metrics)"""
+        self._metrics = None
+
+    def get_metrics(self):
+        """Returns snapshot of recorded metrics
+
+        Returns:
+            dict: 'name' and 'commands' (command name -> count, errors,
+            request_bytes, response_bytes and latency histogram); None if
+            metrics are not enabled
+        """
+        if self._metrics is None:
+            return None
+
+        return self._metrics.snapshot()
+
+    def pipeline(self, window=None):
+        """Returns a Pipeline for queueing many requests and collecting their
+        responses without waiting for a full round trip per request.
+
+        Args:
+            window (int, optional): max number of requests to write per send
+                (default = 64)
+
+        Returns:
+            Pipeline: Pipeline object
+        """
+        return Pipeline(self, window=window)
+
+
+class ResponseFuture(object):
+    """Handle to the response of a pipelined request"""
+
+    def __init__(self, pipeline, request_id, command, decode=None):
+        """
+        Args:
+            pipeline (Pipeline): Pipeline the request was queued on
+            request_id (int): id of request (in send order for its connection)
+            command (str): name of command
+            decode (callable, optional): function used to decode the response
+                message (default=utils.decode_response)
+
+        Warning:
+            You should never instantiate this class directly. Instead call
+            :py:meth:`Pipeline.send_req`
+        """
+        self._pipeline = pipeline
+        self.request_id = request_id
+        self.command = command
+        self._decode = decode or utils.decode_response
+        self._sent_at = None
+        self._request_bytes = 0
+        self._done = False
+        self._data = None
+        self._exception = None
+
+    def _set_resp(self, resp):
+        try:
+            self._data = self._pipeline._server._handle_resp(self.command, resp)
+        except Exception as e:
+            self._exception = e
+        self._done = True
+
+    def _set_exception(self, exception):
+        self._exception = exception
+        self._done = True
+
+    def done(self):
+        """Returns whether the response has been received
+
+        Returns:
+            bool: True if response has been received
+        """
+        return self._done
+
+    def exception(self):
+        """Returns the exception raised by the request (waits for response)
+
+        Returns:
+            Exception or None: exception raised by request or None
+        """
+        self._wait()
+        return self._exception
+
+    def result(self):
+        """Returns the 'data' value of the response (waits for response)
+
+        Returns:
+            'data' return value or None: returns the 'data' return value if exists or None
+
+        Raises:
+            Exception: raised when response received is an error
+        """
+        self._wait()
+        if self._exception is not None:
+            raise self._exception
+        return self._data
+
+    def _wait(self):
+        if not self._done:
+            self._pipeline.flush()
+        server = self._pipeline._server
+        while not self._done:
+            server._read_next_resp()
+
+
+class Pipeline(object):
+    """Queues requests to a server and writes them in batches so that many
+    requests are in-flight at once. Responses are collected in order as
+    :py:class:`ResponseFuture` objects.
+
+    Can be used as a context manager, in which case all responses are
+    collected when leaving the context::
+
+        with session.pipeline() as p:
+            pcs = [p.send_req("readRegister", name="PC") for _ in range(100)]
+        values = [pc.result() for pc in pcs]
+    """
+
+    def __init__(self, server, window=None):
+        """
+        Args:
+            server (GenericServer): server to send requests to
+            window (int, optional): max number of requests to write per send
+                (default = 64)
+
+        Warning:
+            You should never instantiate this class directly. Instead call
+            :py:meth:`GenericServer.pipeline`
+        """
+        self._server = server
+        self._window = window or DEFAULT_PIPELINE_WINDOW
+        self._queued = list()
+        self._msgs = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.wait()
+
+    def send_req(self, command, **args):
+        """Queues request to server.
+
+        Request is constructed from name and **args
+
+        Args:
+            name (str): name of command
+            **args (dict): key word args to place in 'args' dict
+
+        Returns:
+            ResponseFuture: handle to the response of the request
+        """
+        return self.send(self._server._request(command, **args))
+
+    def send(self, request):
+        """Queues a request built by one of the request helpers
+
+        Args:
+            request (Request): request to queue
+
+        Returns:
+            ResponseFuture: handle to the response of the request
+        """
+        return self.send_msg(request.command, request.msg, request.decode)
+
+    def send_msg(self, command, msg, decode=None):
+        """Queues an encoded request message to server.
+
+        Args:
+            command (str): name of command the message is for
+            msg (bytes): encoded request message
+            decode (callable, optional): function used to decode the response
+                message (default=utils.decode_response)
+
+        Returns:
+            ResponseFuture: handle to the response of the request
+        """
+        self._server._before_send(command)
+        future = ResponseFuture(
+            self,
+            next(self._server._request_ids),
+            command,
+            decode=decode or self._server._codec.decode_response,
+        )
+        self._queued.append(future)
+        self._msgs.append(msg)
+
+        if len(self._queued) >= self._window:
+            self.flush()
+
+        return future
+
+    def flush(self):
+        """Writes all queued requests to the server in a single send"""
+        if len(self._queued) == 0:
+            return
+
+        # Bound the number of unread responses so neither side blocks forever
+        # on full socket buffers
+        self._server._drain_in_flight(self._window)
+        self._server._write_reqs(self._queued, self._msgs)
+        self._queued = list()
+        self._msgs = list()
+
+    def wait(self):
+        """Flushes queued requests and waits for all in-flight responses"""
+        self.flush()
+        self._server._drain_in_flight()
+
+
+class Batch(object):
+    """Collects DebugSession operations and sends them together, so a fixed
+    sequence of steps costs about one round trip instead of one per step::
+
+        batch = session.batch()
+        batch.connect()
+        batch.reset()
+        for i in range(13):
+            batch.write_register("R%d" % i, 0)
+        batch.run(asynchronous=True)
+        batch.halt(wait=True)
+        batch.read_data(0x20000000, num_bytes=64, output="bytes")
+        results = batch.execute()
+
+    Each builder method queues one operation; :py:meth:`Batch.execute` returns
+    the result of every operation (in order). If any operation fails a
+    :py:class:`dsclient.BatchException` naming the failing step(s) is raised.
+
+    Requests sent together are all run by the DebugSession, even those after
+    a failing one. With stop_on_error, the batch is split by checkpoints so
+    operations after one are only sent once all operations before it
+    succeeded. A checkpoint follows every step that changes the device's
+    state (connect, reset, erase, run and halt), and more can be added with
+    :py:meth:`Batch.checkpoint`; each costs one round trip. Without
+    stop_on_error all operations are sent in one round trip.
+    """
+
+    def __init__(self, session, stop_on_error=True, window=None):
+        """
+        Args:
+            session (DebugSession): session to send operations to
+            stop_on_error (boolean, optional): do not run operations after a
+                checkpoint following a failed operation (default = True)
+            window (int, optional): max number of requests to write per send
+                (default = 64)
+
+        Warning:
+            You should never instantiate this class directly. Instead call
+            :py:meth:`DebugSession.batch`
+        """
+        self._session = session
+        self._stop_on_error = stop_on_error
+        self._window = window
+        # Segments (split by checkpoints) of operations
+        self._segments = [list()]
+        self._commands = list()
+
+    def __len__(self):
+        return len(self._commands)
+
+    def _add(self, step, request, running=None, checkpoint=False):
+        """Queues an operation
+
+        Args:
+            step (str): description of operation used in errors
+            request (Request): request of operation (see
+                :py:class:`DebugSessionRequests`)
+            running (boolean, optional): whether device is running after the
+                operation succeeds (default = unchanged)
+            checkpoint (boolean, optional): add a checkpoint after the
+                operation when stop_on_error is set (default = False)
+
+        Returns:
+            Batch: this batch (so calls can be chained)
+        """
+        index = len(self._commands)
+        self._segments[-1].append((index, step, request, running))
+        self._commands.append(request.command)
+        if checkpoint and self._stop_on_error:
+            self.checkpoint()
+        return self
+
+    def send_req(self, command, **args):
+        """Queues a request for any command
+
+        Args:
+            command (str): name of command
+            **args (dict): key word args to place in 'args' dict
+
+        Returns:
+            Batch: this batch (so calls can be chained)
+        """
+        return self._add(command, self._session._request(command, **args))
+
+    def checkpoint(self):
+        """Only sends the following operations if all previous ones succeeded
+        (when stop_on_error is set); costs one round trip
+
+        Returns:
+            Batch: this batch (so calls can be chained)
+        """
+        if len(self._segments[-1]) > 0:
+            self._segments.append(list())
+        return self
+
+    def connect(self):
+        """Queues :py:meth:`DebugSession.connect`"""
+        return self._add("connect", self._session._request("connect"), checkpoint=True)
+
+    def disconnect(self):
+        """Queues :py:meth:`DebugSession.disconnect`"""
+        return self._add(
+            "disconnect", self._session._request("disconnect"), running=False
+        )
+
+    def reset(self):
+        """Queues :py:meth:`DebugSession.reset`"""
+        return self._add("reset", self._session._request("reset"), checkpoint=True)
+
+    def erase(self):
+        """Queues :py:meth:`DebugSession.erase`"""
+        return self._add("erase", self._session._request("erase"), checkpoint=True)
+
+    def run(self, asynchronous=False):
+        """Queues :py:meth:`DebugSession.run`"""
+        return self._add(
+            "run",
+            self._session._run_req(asynchronous),
+            running=bool(asynchronous),
+            checkpoint=True,
+        )
+
+    def halt(self, wait=False):
+        """Queues :py:meth:`DebugSession.halt`"""
+        return self._add(
+            "halt", self._session._halt_req(wait), running=False, checkpoint=True
+        )
+
+    def read_register(self, name):
+        """Queues :py:meth:`DebugSession.read_register`"""
+        return self._add(
+            "read_register(%s)" % name, self._session._read_register_req(name)
+        )
+
+    def write_register(self, name, value):
+        """Queues :py:meth:`DebugSession.write_register`"""
+        return self._add(
+            "write_register(%s, %s)" % (name, value),
+            self._session._write_register_req(name, value),
+        )
+
+    def read_data(self, address, page=0, num_bytes=1, output=None):
+        """Queues :py:meth:`DebugSession.read_data`"""
+        return self._add(
+            "read_data(0x%x, %d)" % (address, num_bytes),
+            self._session._read_data_req(address, page, num_bytes, output),
+        )
+
+    def write_data(self, data, address, page=0):
+        """Queues :py:meth:`DebugSession.write_data`"""
+        return self._add(
+            "write_data(0x%x, %d)" % (address, len(data)),
+            self._session._write_data_req(data, address, page),
+        )
+
+    def evaluate(self, expression, file=None):
+        """Queues :py:meth:`DebugSession.evaluate`"""
+        return self._add(
+            "evaluate(%s)" % expression, self._session._evaluate_req(expression, file)
+        )
+
+    def get_option(self, option_id):
+        """Queues :py:meth:`DebugSession.get_option`"""
+        return self._add(
+            "get_option(%s)" % option_id, self._session._get_option_req(option_id)
+        )
+
+    def set_option(self, option_id, value):
+        """Queues :py:meth:`DebugSession.set_option`"""
+        return self._add(
+            "set_option(%s, %s)" % (option_id, value),
+            self._session._set_option_req(option_id, value),
+        )
+
+    def perform_operation(self, opcode):
+        """Queues :py:meth:`DebugSession.perform_operation`"""
+        return self._add(
+            "perform_operation(%s)" % opcode,
+            self._session._perform_operation_req(opcode),
+        )
+
+    def execute(self):
+        """Sends all queued operations and collects their results
+
+        Returns:
+            list: result of each operation (in order)
+
+        Raises:
+            BatchException: raised when any operation fails (see its errors,
+                results and skipped attributes)
+            ConnectionException: raised when the connection is lost
+            TimeoutException: raised when a response takes longer than the
+                session's timeout
+        """
+        session = self._session
+        results = [None] * len(self._commands)
+        errors = list()
+        skipped = list()
+        for segment in self._segments:
+            if len(errors) > 0 and self._stop_on_error:
+                skipped.extend(op[0] for op in segment)
+                continue
+
+            futures = list()
+            with session.pipeline(window=self._window) as p:
+                for index, step, request, running in segment:
+                    futures.append((index, step, running, p.send(request)))
+
+            for index, step, running, future in futures:
+                error = future.exception()
+                if error is not None:
+                    errors.append((index, step, error))
+                    continue
+                results[index] = future.result()
+                if running is not None:
+                    session._running = running
+
+        if len(errors) > 0:
+            raise BatchException(errors, results, skipped)
+
+        return results
+
+
+class HaltFuture(object):
+    """Handle to a run or halt request that completes when the target halts
+
+    The request is sent without waiting for its response (which DebugServer-js
+    only sends once the target halts), so the caller can poll it, wait on it
+    with a timeout, or wait on many sessions at once with
+    :py:func:`wait_for_halt`::
+
+        futures = [s.run_nowait() for s in sessions]
+        done, pending = wait_for_halt(futures, timeout=30)
+
+    Warning:
+        Any other request on the session waits (blocks) until the target has
+        halted, since DebugServer-js answers requests in order.
+    """
+
+    def __init__(self, session, future):
+        """
+        Args:
+            session (DebugSession): session the request was sent to
+            future (ResponseFuture): future of the run/halt request
+
+        Warning:
+            You should never instantiate this class directly. Instead call
+            :py:meth:`DebugSession.run_nowait` or
+            :py:meth:`DebugSession.halt_nowait`
+        """
+        self.session = session
+        self._future = future
+
+    def fileno(self):
+        """Returns file descriptor of the session's socket (for select)"""
+        return self.session._server_socket.fileno()
+
+    def done(self):
+        """Returns whether the target has halted (does not block)
+
+        Returns:
+            bool: True if the target halted (or the request failed)
+        """
+        if not self._future.done():
+            reader = self.session._reader
+            if reader is not None and not reader.has_message():
+                if len(select.select([self], [], [], 0)[0]) == 0:
+                    return False
+            self._receive()
+
+        return self._future.done()
+
+    def _receive(self):
+        """Receives available bytes and reads any complete responses (called
+        when the session's socket is readable)"""
+        session = self.session
+        try:
+            if not session._reader.has_message():
+                session._reader.receive()
+            while not self._future.done() and session._reader.has_message():
+                session._read_next_resp()
+        except Exception as e:
+            # Exception is normally set on the future by _read_next_resp
+            if isinstance(e, (ConnectionException, socket.error)):
+                # In-flight requests will not get a response either
+                session._close(session._connection_lost(e))
+            if not self._future.done():
+                self._future._set_exception(e)
+        if self._future.done() and self._future._exception is None:
+            session._running = False
+
+    def wait(self, timeout=None):
+        """Waits until the target halts
+
+        Args:
+            timeout (float, optional): max seconds to wait (default = forever)
+
+        Returns:
+            bool: True if the target halted, False if timeout expired
+
+        Raises:
+            Exception: raised when request failed (e.g. ConnectionException
+                when the connection was lost before the target halted)
+        """
+        done, _ = wait_for_halt([self], timeout=timeout)
+        if len(done) == 0:
+            return False
+        if self._future._exception is not None:
+            raise self._future._exception
+        return True
+
+    def exception(self, timeout=None):
+        """Waits until the request completes and returns the exception it
+        raised
+
+        Args:
+            timeout (float, optional): max seconds to wait (default = forever)
+
+        Returns:
+            Exception or None: exception raised by request (None if the
+            target halted)
+
+        Raises:
+            TimeoutException: raised when timeout expires (the request is
+                still in-flight)
+        """
+        done, _ = wait_for_halt([self], timeout=timeout)
+        if len(done) == 0:
+            raise self._timeout_exception(timeout)
+        return self._future._exception
+
+    def result(self, timeout=None):
+        """Waits until the target halts and returns the 'data' value of the
+        response
+
+        Args:
+            timeout (float, optional): max seconds to wait (default = forever)
+
+        Raises:
+            TimeoutException: raised when timeout expires (the request is
+                still in-flight)
+            Exception: raised when request failed
+        """
+        if not self.wait(timeout):
+            raise self._timeout_exception(timeout)
+        return self._future.result()
+
+    def _timeout_exception(self, timeout):
+        """Returns TimeoutException to raise when the target did not halt in
+        time"""
+        return TimeoutException(
+            "Timed out waiting for target to halt (%s)" % self._future.command,
+            command=self._future.command,
+            timeout=timeout,
+        )
+
+    def __repr__(self):
+        return "HaltFuture(%s, done=%s)" % (self._future.command, self._future.done())
+
+
+def wait_for_halt(futures, timeout=None, return_when=ALL_HALTED):
+    """Waits until targets of many sessions halt (using select on their sockets)
+
+    Args:
+        futures (list): HaltFuture objects to wait on
+        timeout (float, optional): max seconds to wait (default = forever)
+        return_when (str, optional): FIRST_HALTED to return as soon as any
+            target halts, or ALL_HALTED (default)
+
+    Returns:
+        (set, set): futures that completed and futures still pending; a
+        future completes when its target halts or its request fails (check
+        with :py:meth:`HaltFuture.exception`)
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    done = set(f for f in futures if f.done())
+    pending = set(futures) - done
+
+    while len(pending) > 0 and not (return_when == FIRST_HALTED and len(done) > 0):
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+        readable, _, _ = select.select(list(pending), [], [], remaining)
+        for future in readable:
+            future._receive()
+            if future._future.done():
+                done.add(future)
+                pending.discard(future)
+
+    return (done, pending)
+
+
+class FlashResult(object):
+    """Result of flashing a single session with
+    :py:meth:`DebugServer.flash_sessions`
+
+    Attributes:
+        name (str): full session name
+        timings (OrderedDict): seconds taken by each step completed (in order)
+        elapsed (float): total seconds taken
+        error (Exception): exception raised by the failing step (None if
+            all steps succeeded)
+        sectors (int): number of flash sectors compared (delta flashing
+            only; None otherwise)
+        changed_sectors (list): addresses of sectors programmed (delta
+            flashing only; None otherwise)
+        skipped (bool): True if the erase, load and verify steps were skipped
+            because the image cache shows the device already holds the image
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.timings = collections.OrderedDict()
+        self.elapsed = 0.0
+        self.error = None
+        self.sectors = None
+        self.changed_sectors = None
+        self.skipped = False
+
+    @property
+    def ok(self):
+        """bool: True if all steps succeeded"""
+        return self.error is None
+
+    def __repr__(self):
+        return "FlashResult(%s, ok=%s, elapsed=%.3f)" % (
+            self.name,
+            self.ok,
+            self.elapsed,
+        )
+
+
+class DebugServerRequests(object):
+    """Requests and session name resolution shared by :py:class:`DebugServer`
+    and :py:class:`dsclient.aio.AsyncDebugServer`
+
+    Only builds requests and keeps state; sending them is left to the class
+    using it (so it works for both the blocking and asyncio clients).
+    """
+
+    def _init_sessions(self, data_encoding=None):
+        """Initializes session handle and session name cache state"""
+        self._sessions = dict()
+        self._sessions_listed = False
+        self._data_encoding = data_encoding
+        self._cpus = None
+        self._resolved_names = dict()
+        self._session_name_stats = {"hits": 0, "misses": 0, "cpu_list_fetches": 0}
+
+    def _session_options(self):
+        """Returns keyword arguments for creating handles to sessions"""
+        return {
+            "host": self._hostname,
+            "codec": self._codec,
+            "data_encoding": self._data_encoding,
+            "timeout": self._timeout,
+            "timeouts": self._timeouts,
+            "socket_options": self._socket_options,
+            "retry": self._retry,
+        }
+
+    def _cached_session_name(self, session_name):
+        """Returns full session name resolved without a server round trip
+
+        Exact names of open sessions and previously resolved names do not need
+        the list of CPUs.
+
+        Returns:
+            str: full session name (None if the list of CPUs is needed)
+        """
+        if session_name in self._sessions:
+            self._session_name_stats["hits"] += 1
+            return session_name
+        if session_name in self._resolved_names:
+            self._session_name_stats["hits"] += 1
+            return self._resolved_names[session_name]
+
+        return None
+
+    def _match_session_name(self, session_name, cpus):
+        """Resolves session name (regex) against the list of CPUs (and caches it)
+
+        Returns:
+            str: full session name
+        """
+        self._session_name_stats["misses"] += 1
+        if session_name in cpus:
+            full_name = session_name
+        else:
+            full_name = utils.match_session_name(session_name, cpus)
+        self._resolved_names[session_name] = full_name
+
+        return full_name
+
+    def _set_cpus(self, cpus):
+        """Stores the list of CPUs received from the server"""
+        self._cpus = cpus
+        self._session_name_stats["cpu_list_fetches"] += 1
+
+    def invalidate_session_name_cache(self):
+        """Clears the cached list of CPUs and resolved session names.
+
+        Called automatically by :py:meth:`DebugServer.set_config` and
+        :py:meth:`DebugServer.create_config`.
+        """
+        self._cpus = None
+        self._resolved_names.clear()
+
+    def get_session_name_cache_info(self):
+        """Returns session name resolution cache counters
+
+        Returns:
+            dict: number of 'hits' (resolved without a server round trip),
+            'misses' (resolved by matching against the list of CPUs) and
+            'cpu_list_fetches' (requests for the list of CPUs)
+        """
+        return dict(self._session_name_stats)
+
+    def _create_config_req(
+        self, name, connection=None, device=None, board=None, directory=None
+    ):
+        """Returns createConfig request (see :py:meth:`DebugServer.create_config`)"""
+        if board is None and (connection is None or device is None):
+            raise Exception(
+                "Need to provide either 'board' name or 'connection' and 'device' name"
+            )
+
+        args = dict()
+        args["name"] = name
+        if board is not None:
+            args["board"] = board
+        else:
+            args["connection"] = connection
+            args["device"] = device
+
+        if directory is not None:
+            args["directory"] = directory
+
+        return self._request("createConfig", **args)
+
+
+class DebugSessionRequests(object):
+    """Requests of session operations and decoding of their responses shared
+    by :py:class:`DebugSession`, :py:class:`Batch`,
+    :py:class:`dsclient.aio.AsyncDebugSession` and watches
+
+    Each helper returns a :py:class:`Request` (encoded message and response
+    decoder) without sending it.
+    """
+
+    def _init_data_encoding(self, data_encoding=None):
+        """Initializes encoding of memory bytes (default = "list")"""
+        self._data_encoding = utils.LIST
+        if data_encoding is not None:
+            self.set_data_encoding(data_encoding)
+
+    def get_data_encoding(self):
+        """Returns the encoding used for memory bytes in readData/writeData
+        requests
+
+        Returns:
+            str: "list" or "base64"
+        """
+        return self._data_encoding
+
+    def set_data_encoding(self, encoding):
+        """Sets the encoding used for memory bytes in readData/writeData
+        requests
+
+        Args:
+            encoding (str): "list" (supported by every DebugServer-js version)
+                or "base64" (requires a DebugServer-js that accepts the
+                'encoding' argument of readData/writeData)
+
+        Raises:
+            Exception: raised when encoding is invalid
+        """
+        if encoding not in utils.DATA_ENCODINGS:
             raise Exception(
-                "Could not connect to Server(%s,%s)" % (self._hostname, self._port)
+                "Invalid encoding: %s (must be one of %s)"
+                % (encoding, str(utils.DATA_ENCODINGS))
+            )
+        self._data_encoding = encoding
+
+    def _byte_decoder(self, output):
+        """Returns function decoding a response whose 'data' value is bytes
+
+        Args:
+            output (str): "list" or one of utils.BYTE_OUTPUTS
+
+        Returns:
+            callable: decode function (None if the codec decodes it as is)
+        """
+        codec = self._codec
+        if output != "list":
+            return functools.partial(
+                utils.decode_byte_response, output=output, codec=codec
             )
+        if self._data_encoding == utils.LIST:
+            return None
+
+        def decode(msg):
+            resp = utils.decode_byte_response(msg, codec=codec)
+            if isinstance(resp.get("data"), bytearray):
+                resp["data"] = list(resp["data"])
+            return resp
+
+        return decode
+
+    def _load_req(self, command, file, binary=False, address=None):
+        """Returns load or verify request (binary images default to address 0x0)"""
+        if address is None:
+            address = 0x0
+
+        return self._request(command, file=file, binary=binary, address=address)
+
+    def _evaluate_req(self, expression, file=None):
+        """Returns evaluate request"""
+        if file is not None:
+            return self._request("evaluate", expression=expression, file=file)
+
+        return self._request("evaluate", expression=expression)
+
+    def _read_data_req(self, address, page=0, num_bytes=1, output=None):
+        """Returns readData request whose response 'data' is decoded as output
+
+        Args:
+            output (str, optional): "list" (default) or one of "bytes",
+                "bytearray", "memoryview" or "numpy"
+        """
+        output = output or "list"
+        if output != "list":
+            utils.check_byte_output(output)
+
+        args = {"address": address, "page": page, "numBytes": num_bytes}
+        if self._data_encoding == utils.BASE64:
+            args["encoding"] = self._data_encoding
+        msg = self._codec.encode_request(utils.create_request("readData", **args))
+
+        return Request("readData", msg, self._byte_decoder(output))
+
+    def _write_data_req(self, data, address, page=0):
+        """Returns writeData request (data can be a list of ints or bytes-like)"""
+        if isinstance(data, (list, tuple)) and self._data_encoding == utils.LIST:
+            return self._request("writeData", data=data, address=address, page=page)
+
+        msg = utils.encode_byte_request(
+            "writeData",
+            "data",
+            data,
+            codec=self._codec,
+            encoding=self._data_encoding,
+            address=address,
+            page=page,
+        )
+        return Request("writeData", msg, None)
+
+    def _read_register_req(self, name):
+        """Returns readRegister request"""
+        return self._request("readRegister", name=name)
+
+    def _write_register_req(self, name, value):
+        """Returns writeRegister request"""
+        return self._request("writeRegister", name=name, value=value)
+
+    def _get_option_req(self, option_id):
+        """Returns getOption request"""
+        return self._request("getOption", id=option_id)
+
+    def _set_option_req(self, option_id, value):
+        """Returns setOption request"""
+        return self._request("setOption", id=option_id, value=value)
+
+    def _perform_operation_req(self, opcode):
+        """Returns performOperation request"""
+        return self._request("performOperation", opcode=opcode)
+
+    def _run_req(self, asynchronous=False):
+        """Returns run request"""
+        return self._request("run", asynchronous=asynchronous)
+
+    def _halt_req(self, wait=False):
+        """Returns halt request"""
+        return self._request("halt", wait=wait)
+
+
+class DebugServer(GenericServer, DebugServerRequests):
+    """DebugServer Class for creating and communicating with DebugServer-js"""
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        list_sessions=True,
+        codec=None,
+        data_encoding=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+    ):
+        """Initializes DebugServer object
+
+        Handles to sessions that are already open are created, but do not
+        connect to their session until first used.
+
+        Args:
+            host (str, optional): hostname of existing DebugServer to connect to (default="localhost")
+            port (int): port number of existing DebugServer to connect to
+            list_sessions (boolean, optional): get the list of already open
+                sessions now; if False, the list is requested the first time
+                :py:meth:`DebugServer.open_session` or
+                :py:meth:`DebugServer.get_session` can not find a session or
+                :py:meth:`DebugServer.get_list_of_sessions` is called (default = True)
+            codec (str or JSONCodec, optional): JSON codec used by the
+                DebugServer and its sessions (default = fastest installed
+                codec; see :py:mod:`dsclient.codec`)
+            data_encoding (str, optional): encoding of memory bytes used by
+                its sessions; "list" or "base64" (see
+                :py:meth:`DebugSession.set_data_encoding`; default = "list")
+            timeout (float, optional): seconds the DebugServer and its
+                sessions wait for a response before raising
+                :py:class:`TimeoutException` (default = None; wait forever)
+            timeouts (dict, optional): command name -> timeout overriding
+                timeout for that command, e.g. ``{"load": 120, "erase": 60,
+                "readRegister": 1}``
+            socket_options (dict, optional): keyword arguments passed to
+                :py:func:`dsclient.utils.create_socket` for the DebugServer
+                and its sessions (connect_timeout, nodelay, keepalive,
+                send_buffer, recv_buffer)
+            retry (RetryPolicy, optional): reconnect and retry requests of the
+                DebugServer and its sessions when the connection is lost
+                (default = None; raise :py:class:`ConnectionException`)
+        """
+        self._init_sessions(data_encoding)
+        self._session_metrics = False
+        self._metrics_callback = None
+        super(DebugServer, self).__init__(
+            host=host,
+            port=port,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
 
-    def _send_req(self, command, **args):
-        """Sends request to server socket.
+        if list_sessions:
+            self.refresh_sessions()
 
-        Request is constructed from name and **args
+    def refresh_sessions(self):
+        """Adds a handle for each session open on the DebugServer that does
+        not have one yet. New handles connect to their session when first used.
+        """
+        existing_sessions = self._send_req("getListOfSessions")
+        for session in existing_sessions:
+            if session["name"] not in self._sessions:
+                self.__add_session(session["name"], session["port"], lazy=True)
+        self._sessions_listed = True
+
+    def __add_session(self, session_name, port, lazy=False):
+        """Creates and stores handle to a session
 
         Args:
-            name (str): name of command
-            **args (dict): key word args to place in 'args' dict
+            session_name (str): full session name
+            port (int): port number of session
+            lazy (boolean, optional): wait until first request to connect
+                (default = False)
 
         Returns:
-            'data' return value or None: returns the 'data' return value if exists or None
-
-        Raises:
-            Exception: raised when response received is an error
+            DebugSession: DebugSession object
         """
+        session = DebugSession(
+            port=port, lazy=lazy, name=session_name, **self._session_options()
+        )
+        if self._session_metrics:
+            session.enable_metrics(callback=self._metrics_callback, name=session_name)
+        self._sessions[session_name] = session
 
-        req = utils.create_request(command, **args)
+        return session
 
-        resp = utils.send(self._server_socket, req)
+    def enable_metrics(self, callback=None, name=None, sessions=True):
+        """Starts recording latency, request/response sizes and errors of
+        every request (per command)
 
-        if resp["status"] == "FAIL":
-            raise Exception("Command %s failed: %s" % (command, resp["message"]))
+        Args:
+            callback (callable, optional): called with an event dict (name,
+                command, latency, request_bytes, response_bytes, error) after
+                every request
+            name (str, optional): name to identify this connection with
+                (default="<host>:<port>")
+            sessions (boolean, optional): also record metrics for all current
+                and future sessions (named by session name; default = True)
+        """
+        super(DebugServer, self).enable_metrics(callback=callback, name=name)
 
-        return resp["data"] if "data" in list(resp.keys()) else None
+        self._session_metrics = sessions
+        self._metrics_callback = callback
+        if sessions:
+            for session_name, session in self._sessions.items():
+                session.enable_metrics(callback=callback, name=session_name)
 
+    def disable_metrics(self):
+        """Stops recording metrics (and discards recorded metrics) of the
+        DebugServer and its sessions"""
+        super(DebugServer, self).disable_metrics()
 
-class DebugServer(GenericServer):
-    """DebugServer Class for creating and communicating with DebugServer-js"""
+        if self._session_metrics:
+            for session in self._sessions.values():
+                session.disable_metrics()
+        self._session_metrics = False
+        self._metrics_callback = None
 
-    def __init__(self, host=None, port=None):
-        """Initializes DebugServer object
+    def get_metrics(self, include_sessions=False):
+        """Returns snapshot of recorded metrics
 
         Args:
-            host (str, optional): hostname of existing DebugServer to connect to (default="localhost")
-            port (int): port number of existing DebugServer to connect to
+            include_sessions (boolean, optional): include snapshot of each
+                session under 'sessions' (session name -> snapshot; default = False)
+
+        Returns:
+            dict: 'name' and 'commands' (command name -> count, errors,
+            request_bytes, response_bytes and latency histogram); None if
+            metrics are not enabled
         """
-        self._port = port
-        self._hostname = host or "localhost"
-        self._sessions = dict()
-        try:
-            self._server_socket = utils.create_socket(self._port, host=self._hostname)
-        except:
-            raise Exception(
-                "Could not connect to DebugServer(%s,%s)" % (self._hostname, self._port)
-            )
+        snapshot = super(DebugServer, self).get_metrics()
 
-        existing_sessions = self._send_req("getListOfSessions")
-        for session in existing_sessions:
-            self._sessions[session["name"]] = DebugSession(
-                host=self._hostname, port=session["port"]
+        if snapshot is not None and include_sessions:
+            snapshot["sessions"] = dict(
+                (session_name, session.get_metrics())
+                for session_name, session in self._sessions.items()
             )
 
+        return snapshot
+
     def __resolve_session_name(self, session_name):
         """Resolves the provided session_name (regex) to the full session name
         to use.
@@ -84,21 +1692,15 @@ class DebugServer(GenericServer):
         Returns:
             str: full session name string to use with :py:meth:`DebugServer.open_session`
         """
-        # Get list of available (full) session names
-        potential_sessions = self.get_list_of_cpus()
-
-        matches = [
-            sess
-            for sess in potential_sessions
-            if re.search(session_name, sess) is not None
-        ]
+        full_name = self._cached_session_name(session_name)
+        if full_name is None:
+            # Get list of available (full) session names
+            potential_sessions = self._cpus
+            if potential_sessions is None:
+                potential_sessions = self.get_list_of_cpus()
+            full_name = self._match_session_name(session_name, potential_sessions)
 
-        if len(matches) == 0:
-            raise Exception("Could not resolve session name: %s" % session_name)
-        elif len(matches) > 1:
-            raise Exception("Found multiple potential session names: %s" % str(matches))
-
-        return matches[0]
+        return full_name
 
     def set_config(self, ccxml_path):
         """Set ccxml file for DebugServer
@@ -106,6 +1708,7 @@ class DebugServer(GenericServer):
         Args:
             ccxml_path (str): full path to ccxml file to set
         """
+        self.invalidate_session_name_cache()
         return self._send_req("setConfig", path=ccxml_path)
 
     def get_config(self):
@@ -130,23 +1733,12 @@ class DebugServer(GenericServer):
             directory (str): full path to directory location to place file
 
         """
-        if board is None and (connection is None or device is None):
-            raise Exception(
-                "Need to provide either 'board' name or 'connection' and 'device' name"
-            )
-
-        args = dict()
-        args["name"] = name
-        if board is not None:
-            args["board"] = board
-        else:
-            args["connection"] = connection
-            args["device"] = device
-
-        if directory is not None:
-            args["directory"] = directory
+        request = self._create_config_req(
+            name, connection=connection, device=device, board=board, directory=directory
+        )
 
-        return self._send_req("createConfig", **args)
+        self.invalidate_session_name_cache()
+        return self._send(request)
 
     def get_list_of_cpus(self):
         """Returns list of CPU names
@@ -154,7 +1746,8 @@ class DebugServer(GenericServer):
         Returns:
             list: list of CPU names
         """
-        return self._send_req("getListOfCPUs")
+        self._set_cpus(self._send_req("getListOfCPUs"))
+        return self._cpus
 
     def get_list_of_devices(self):
         """Returns list of device names
@@ -191,15 +1784,16 @@ class DebugServer(GenericServer):
         """
         session_name = self.__resolve_session_name(name)
 
+        # The session may have been opened by another client
+        if session_name not in self._sessions and not self._sessions_listed:
+            self.refresh_sessions()
+
         if session_name in list(self._sessions.keys()):
             raise Exception("Session: %s is already open." % session_name)
 
         session_info = self._send_req("openSession", name=session_name)
-        self._sessions[session_name] = DebugSession(
-            host=self._hostname, port=session_info["port"]
-        )
 
-        return self._sessions[session_name]
+        return self.__add_session(session_name, session_info["port"])
 
     def get_session(self, name):
         """Returns handle to the open session
@@ -212,6 +1806,9 @@ class DebugServer(GenericServer):
         """
         session_name = self.__resolve_session_name(name)
 
+        if session_name not in self._sessions and not self._sessions_listed:
+            self.refresh_sessions()
+
         if session_name not in list(self._sessions.keys()):
             raise Exception("Session: %s is not open." % session_name)
 
@@ -239,8 +1836,90 @@ class DebugServer(GenericServer):
         Returns:
             list: list of open sessions
         """
+        if not self._sessions_listed:
+            self.refresh_sessions()
+
         return self._sessions
 
+    def flash_sessions(
+        self,
+        names,
+        file,
+        binary=False,
+        address=None,
+        connect=True,
+        erase=True,
+        verify=True,
+        max_workers=None,
+        delta=False,
+        sector_size=None,
+    ):
+        """Flashes the same image onto multiple sessions in parallel
+
+        Each session name is resolved (can be regex pattern) and opened if it
+        is not already open. The connect/erase/load/verify steps then run on
+        all sessions at the same time using a bounded pool of worker threads.
+
+        Args:
+            names (list): session names to flash (can be regex patterns)
+            file (str): full path to file to load into flash
+            binary (boolean, optional): specify to load image as binary (default = False)
+            address (int, optional): specify to load binary image at specifc address (only to be used when 'binary' is True; default=0x0)
+            connect (boolean, optional): connect to device before flashing (default = True)
+            erase (boolean, optional): erase flash before loading (default = True)
+            verify (boolean, optional): verify image after loading (default = True)
+            max_workers (int, optional): max number of sessions to flash at
+                the same time (default = 8)
+            delta (boolean, optional): only program sectors that differ from
+                the image (see :py:meth:`DebugSession.flash_delta`; default = False)
+            sector_size (int, optional): flash sector size used when delta is
+                True (default = 4096)
+
+        Returns:
+            OrderedDict: FlashResult for each full session name (in order of names)
+
+        Raises:
+            Exception: raised when a session name can not be resolved
+        """
+        session_names = [self.__resolve_session_name(name) for name in names]
+        if len(set(session_names)) != len(session_names):
+            raise Exception("Session names resolve to duplicates: %s" % session_names)
+
+        results = collections.OrderedDict()
+        sessions = list()
+        for session_name in session_names:
+            results[session_name] = FlashResult(session_name)
+            try:
+                if session_name not in list(self._sessions.keys()):
+                    self.open_session(session_name)
+                sessions.append((self._sessions[session_name], results[session_name]))
+            except Exception as e:
+                results[session_name].error = e
+
+        def flash(job):
+            session, result = job
+            session.flash(
+                file,
+                binary=binary,
+                address=address,
+                connect=connect,
+                erase=erase,
+                verify=verify,
+                result=result,
+                delta=delta,
+                sector_size=sector_size,
+            )
+
+        if len(sessions) > 0:
+            pool = ThreadPool(min(max_workers or DEFAULT_FLASH_WORKERS, len(sessions)))
+            try:
+                pool.map(flash, sessions)
+            finally:
+                pool.close()
+                pool.join()
+
+        return results
+
     def attach_ccs(self):
         """Opens a CCS GUI instance for the DebugServer
 
@@ -258,28 +1937,368 @@ class DebugServer(GenericServer):
         self._server_socket.close()
 
 
-class DebugSession(GenericServer):
+class DebugSession(GenericServer, DebugSessionRequests):
     """DebugSession class for controlling session"""
 
-    def __init__(self, host=None, port=None):
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        lazy=False,
+        codec=None,
+        data_encoding=None,
+        timeout=None,
+        timeouts=None,
+        socket_options=None,
+        retry=None,
+        name=None,
+    ):
         """
         Args:
             host (str, optional): hostname of DebugSession to connect to (default="localhost")
             port (int): port number of DebugSession to connect to
+            lazy (boolean, optional): wait until the first request to connect
+                to the DebugSession (default = False)
+            codec (str or JSONCodec, optional): JSON codec used to encode
+                requests and decode responses (default = fastest installed codec)
+            data_encoding (str, optional): encoding of memory bytes in
+                readData/writeData requests; "list" or "base64" (base64
+                requires a DebugServer-js that accepts the 'encoding'
+                argument; default = "list")
+            timeout (float, optional): seconds to wait for a response before
+                raising :py:class:`TimeoutException` (default = None; wait forever)
+            timeouts (dict, optional): command name -> timeout overriding
+                timeout for that command
+            socket_options (dict, optional): keyword arguments passed to
+                :py:func:`dsclient.utils.create_socket`
+            retry (RetryPolicy, optional): reconnect and retry requests when
+                the connection is lost
+            name (str, optional): full session name (identifies the device in
+                the image cache)
 
         Warning:
             You should never instantiate this class directly. Instead call the
             :py:meth:`DebugServer.open_session` function to create a DebugSession object
         """
-        self._port = port
-        self._hostname = host
+        self._init_data_encoding(data_encoding)
+        self._running = False
+        self._register_cache = None
+        self._register_cache_stats = {"hits": 0, "misses": 0}
+        self._memory_cache = None
+        self._memory_block_size = DEFAULT_MEMORY_BLOCK_SIZE
+        self._memory_cache_blocks = DEFAULT_MEMORY_CACHE_BLOCKS
+        self._memory_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._name = name
+        self._image_cache = None
+        self._image_cache_device = None
+        self._image_probe_size = None
+        # Whether the device has an entry in the image cache (so writes only
+        # lock and rewrite the cache file when there is an entry to remove)
+        self._image_cache_entry = False
+        self._image_cache_stats = {"hits": 0, "misses": 0}
+        super(DebugSession, self).__init__(
+            host=host,
+            port=port,
+            lazy=lazy,
+            codec=codec,
+            timeout=timeout,
+            timeouts=timeouts,
+            socket_options=socket_options,
+            retry=retry,
+        )
+
+    def enable_register_cache(self):
+        """Starts caching register values so repeat reads of a register are
+        served without a server round trip while the device is halted
+
+        The cache is cleared by :py:meth:`DebugSession.connect`,
+        :py:meth:`DebugSession.disconnect`, :py:meth:`DebugSession.erase`,
+        :py:meth:`DebugSession.reset`, :py:meth:`DebugSession.load`,
+        :py:meth:`DebugSession.evaluate`, :py:meth:`DebugSession.write_data`,
+        :py:meth:`DebugSession.perform_operation`, :py:meth:`DebugSession.run`
+        and :py:meth:`DebugSession.halt`. Values written with
+        :py:meth:`DebugSession.write_register` are stored in the cache.
+        Nothing is cached while the device is running (after
+        ``run(asynchronous=True)``).
+
+        Warning:
+            Registers changed by other means (e.g. writing one register that
+            changes another, or another client) are not noticed; call
+            :py:meth:`DebugSession.invalidate_register_cache` if needed.
+        """
+        if self._register_cache is None:
+            self._register_cache = dict()
+
+    def disable_register_cache(self):
+        """Stops caching register values (and clears the cache)"""
+        self._register_cache = None
+
+    def invalidate_register_cache(self):
+        """Clears cached register values"""
+        if self._register_cache is not None:
+            self._register_cache.clear()
+
+    def get_register_cache_info(self):
+        """Returns register cache counters
+
+        Returns:
+            dict: number of 'hits' (served from cache) and 'misses' (read
+            from device) of cached reads
+        """
+        return dict(self._register_cache_stats)
+
+    def enable_memory_cache(self, block_size=None, max_blocks=None):
+        """Starts caching memory read by :py:meth:`DebugSession.read_data`
+        while the device is halted
+
+        Reads are rounded out to aligned blocks, which are kept (per page) and
+        used to serve later reads of overlapping addresses without a server
+        round trip. The least recently used blocks are dropped once the cache
+        is full. The cache is cleared by the same commands as the register
+        cache (see :py:meth:`DebugSession.enable_register_cache`), including
+        :py:meth:`DebugSession.write_data`. Reads of more than max_blocks
+        blocks are not cached.
+
+        Warning:
+            Only enable for memory without read side effects (e.g. RAM, not
+            peripheral registers); whole blocks are read from the device.
+
+        Args:
+            block_size (int, optional): size (and alignment) of cached blocks
+                in bytes (default = 256)
+            max_blocks (int, optional): max number of blocks to keep
+                (default = 1024)
+        """
+        self._memory_block_size = block_size or DEFAULT_MEMORY_BLOCK_SIZE
+        self._memory_cache_blocks = max_blocks or DEFAULT_MEMORY_CACHE_BLOCKS
+        self._memory_cache = collections.OrderedDict()
+
+    def disable_memory_cache(self):
+        """Stops caching memory (and clears the cache)"""
+        self._memory_cache = None
+
+    def invalidate_memory_cache(self):
+        """Clears cached memory blocks"""
+        if self._memory_cache is not None:
+            self._memory_cache.clear()
+
+    def get_memory_cache_info(self):
+        """Returns memory cache counters
+
+        Returns:
+            dict: number of block 'hits' (served from cache), 'misses' (read
+            from device) and 'evictions' (dropped when cache was full)
+        """
+        return dict(self._memory_cache_stats)
+
+    def enable_image_cache(self, cache=None, device=None, probe_size=None):
+        """Skips :py:meth:`DebugSession.load` and :py:meth:`DebugSession.verify`
+        when the device was already verified to hold the same image
+
+        After an image is verified, the device identity, the hash of the image
+        file and its load address are recorded in a persistent
+        :py:class:`dsclient.image.ImageCache` (with the CRC-32 of each region
+        of the image). Later loads of the same image read those regions back
+        from the device and skip the load if they still match. Any erase,
+        load, memory write or flash operation through this session removes
+        the device's entry (the cache file is only read when enabling and
+        updated when the device has an entry, so writes stay cheap).
+
+        Args:
+            cache (str or ImageCache, optional): cache object or full path of
+                its JSON file (default="~/.cache/dsclient/images.json")
+            device (str, optional): identity of the device (default =
+                "<host>/<session name>"); should be unique per board (e.g.
+                include the ccxml file or probe serial number)
+            probe_size (int, optional): only check probe_size bytes at the
+                start, middle and end of each image segment, which is faster
+                but misses changes elsewhere (default = None; check the whole
+                image)
+
+        Raises:
+            Exception: raised when device is not provided and the session
+                name is unknown
+        """
+        if device is None:
+            if self._name is None:
+                raise Exception("Device identity required (session name unknown)")
+            device = "%s/%s" % (self._hostname, self._name)
+        if not isinstance(cache, image.ImageCache):
+            cache = image.ImageCache(cache)
+
+        self._image_cache = cache
+        self._image_cache_device = device
+        self._image_cache_entry = cache.has(device)
+        self._image_probe_size = probe_size
+        self._image_cache_stats = {"hits": 0, "misses": 0}
+
+    def disable_image_cache(self):
+        """Stops using the image cache (entries are kept on disk)"""
+        self._image_cache = None
+        self._image_cache_device = None
+
+    def get_image_cache_info(self):
+        """Returns image cache counters
+
+        Returns:
+            dict: number of 'hits' (load/verify skipped) and 'misses' (image
+            not cached or check regions did not match)
+        """
+        return dict(self._image_cache_stats)
+
+    def is_image_cached(self, file, binary=False, address=None):
+        """Returns whether the image cache shows the device holds an image
+
+        The image's check regions are read back from the device to confirm
+        it was not reprogrammed since the image was verified.
+
+        Args:
+            file (str): full path to image file
+            binary (boolean, optional): image is binary (default = False)
+            address (int, optional): load address of binary image (default=0x0)
+
+        Returns:
+            bool: True if device holds image (always False if the image cache
+            is not enabled)
+        """
+        if self._image_cache is None:
+            return False
+
+        key = image.ImageCache.key(image.file_digest(file), binary, address)
+        entry = self._image_cache.get(self._image_cache_device, key)
+        if entry is not None:
+            self._image_cache_entry = True
+        if entry is not None and self._probes_match(entry["probes"]):
+            self._image_cache_stats["hits"] += 1
+            return True
+
+        self._image_cache_stats["misses"] += 1
+        return False
+
+    def _probes_match(self, probes):
+        """Returns whether the device's memory matches image check regions"""
         try:
-            self._server_socket = utils.create_socket(self._port, host=self._hostname)
-        except:
-            raise Exception(
-                "Could not connect to DebugSession(%s,%s)"
-                % (self._hostname, self._port)
-            )
+            for address, length, crc in probes:
+                value = 0
+                for _, data in self._iter_memory_chunks(address, length):
+                    value = image.crc32(data, value)
+                if value != crc:
+                    return False
+        except (ConnectionException, TimeoutException):
+            raise
+        except Exception:
+            return False
+
+        return True
+
+    def _record_image(self, file, binary, address):
+        """Records in the image cache that the device holds an image (images
+        that can not be parsed locally are not recorded)"""
+        try:
+            parsed = image.load_image(file, binary, address)
+        except Exception:
+            return
+        key = image.ImageCache.key(image.file_digest(file), binary, address)
+        self._image_cache.put(
+            self._image_cache_device, key, file, parsed.probes(self._image_probe_size)
+        )
+        self._image_cache_entry = True
+
+    def _forget_image(self):
+        """Removes the device's entry from the image cache"""
+        if self._image_cache is not None and self._image_cache_entry:
+            self._image_cache.remove(self._image_cache_device)
+            self._image_cache_entry = False
+
+    def _invalidate_caches(self):
+        """Clears cached device state (called before commands that may change it)"""
+        self.invalidate_register_cache()
+        self.invalidate_memory_cache()
+
+    def _before_send(self, command):
+        """Clears cached device state before a request that may change it is
+        sent with _send_req or queued on a Pipeline (including batches)"""
+        if command in READ_ONLY_COMMANDS:
+            return
+        self._invalidate_caches()
+        if command in FLASH_WRITE_COMMANDS:
+            self._forget_image()
+        if command == "run":
+            self._running = True
+
+    def _close(self, exception=None):
+        # Device state may change while the connection is down (and a
+        # request that was lost may have changed it), so cached values are
+        # not trusted after reconnecting
+        self._invalidate_caches()
+        super(DebugSession, self)._close(exception)
+
+    def _read_cached(self, address, page, num_bytes):
+        """Reads memory using the memory cache
+
+        Returns:
+            bytearray: bytes read (None if blocks could not be read)
+        """
+        cache = self._memory_cache
+        size = self._memory_block_size
+        first = address // size
+        last = (address + num_bytes - 1) // size
+        if last - first + 1 > self._memory_cache_blocks:
+            return None
+
+        fetched = dict()
+        missing = [b for b in range(first, last + 1) if (page, b) not in cache]
+        if len(missing) > 0:
+            with self.pipeline() as p:
+                for block in missing:
+                    fetched[block] = p.send(
+                        self._read_data_req(block * size, page, size, "bytearray")
+                    )
+            try:
+                for block, future in fetched.items():
+                    fetched[block] = future.result()
+            except (ConnectionException, TimeoutException):
+                raise
+            except Exception:
+                # Block extends past readable memory; read without cache
+                return None
+
+        data = bytearray()
+        for block in range(first, last + 1):
+            if block in fetched:
+                data += fetched[block]
+            else:
+                # Move to end (most recently used)
+                value = cache[(page, block)] = cache.pop((page, block))
+                data += value
+
+        self._memory_cache_stats["hits"] += last - first + 1 - len(fetched)
+        self._memory_cache_stats["misses"] += len(fetched)
+        for block, value in fetched.items():
+            cache[(page, block)] = value
+        while len(cache) > self._memory_cache_blocks:
+            cache.popitem(last=False)
+            self._memory_cache_stats["evictions"] += 1
+
+        start = address - first * size
+        return data[start : start + num_bytes]
+
+    def batch(self, stop_on_error=True, window=None):
+        """Returns a Batch for sending a sequence of operations together and
+        collecting all of their results
+
+        Args:
+            stop_on_error (boolean, optional): do not run operations after a
+                checkpoint following a failed operation; checkpoints follow
+                every connect, reset, erase, run and halt (see
+                :py:class:`Batch`; default = True)
+            window (int, optional): max number of requests to write per send
+                (default = 64)
+
+        Returns:
+            Batch: Batch object
+        """
+        return Batch(self, stop_on_error=stop_on_error, window=window)
 
     def connect(self):
         """Connect to the device."""
@@ -287,6 +2306,7 @@ class DebugSession(GenericServer):
 
     def disconnect(self):
         """Disconnect from the device."""
+        self._running = False
         self._send_req("disconnect")
 
     def erase(self):
@@ -309,14 +2329,25 @@ class DebugSession(GenericServer):
             binary (boolean, optional): specify to load image as binary (default = False)
             address (int, optional): specify to load binary image at specifc address (only to be used when 'binary' is True; default=0x0)
 
+        Returns:
+            bool: True if load was skipped because the image cache shows the
+            device already holds the image (see
+            :py:meth:`DebugSession.enable_image_cache`)
 
         Raises:
             Exception if image fails to load
         """
-        if address is None:
-            address = 0x0
+        if self.is_image_cached(file, binary, address or 0x0):
+            return True
 
-        self._send_req("load", file=file, binary=binary, address=address)
+        self._load(file, binary, address)
+        return False
+
+    def _load(self, file, binary=False, address=None):
+        """Loads image without checking the image cache"""
+        self._invalidate_caches()
+        self._forget_image()
+        self._send(self._load_req("load", file, binary, address))
 
     def verify(self, file, binary=False, address=None):
         """Verifies image in device's flash.
@@ -326,14 +2357,214 @@ class DebugSession(GenericServer):
             binary (boolean, optional): specify to verify image as binary (default = False)
             address (int, optional): specify to verify binary image at specifc address (only to be used when 'binary' is True; default=0x0)
 
+        Returns:
+            bool: True if verify was skipped because the image cache shows the
+            device already holds the image (see
+            :py:meth:`DebugSession.enable_image_cache`)
 
         Raises:
             Exception if image fails verification process
         """
-        if address is None:
-            address = 0x0
+        if self.is_image_cached(file, binary, address or 0x0):
+            return True
+
+        self._verify(file, binary, address)
+        return False
+
+    def _verify(self, file, binary=False, address=None):
+        """Verifies image without checking the image cache (and records it
+        in the image cache)"""
+        self._send(self._load_req("verify", file, binary, address))
+        if self._image_cache is not None:
+            self._record_image(file, binary, address or 0x0)
+
+    def flash(
+        self,
+        file,
+        binary=False,
+        address=None,
+        connect=True,
+        erase=True,
+        verify=True,
+        result=None,
+        delta=False,
+        sector_size=None,
+    ):
+        """Runs the connect, erase, load and verify steps, timing each one.
+
+        If the image cache is enabled (see
+        :py:meth:`DebugSession.enable_image_cache`) a 'check' step runs after
+        connecting and the remaining steps are skipped if the device already
+        holds the image.
+
+        Args:
+            file (str): full path to file to load into flash
+            binary (boolean, optional): specify to load image as binary (default = False)
+            address (int, optional): specify to load binary image at specifc address (only to be used when 'binary' is True; default=0x0)
+            connect (boolean, optional): connect to device before flashing (default = True)
+            erase (boolean, optional): erase flash before loading (default = True)
+            verify (boolean, optional): verify image after loading (default = True)
+            result (FlashResult, optional): result object to fill in
+            delta (boolean, optional): only program sectors that differ from
+                the image using :py:meth:`DebugSession.flash_delta` instead of
+                the erase and load steps (default = False)
+            sector_size (int, optional): flash sector size used when delta is
+                True (default = 4096)
+
+        Returns:
+            FlashResult: timings of each step and the error raised (if any);
+            errors are recorded instead of raised
+        """
+        result = result or FlashResult(None)
+
+        if delta:
+            start = time.time()
+            try:
+                if connect:
+                    step_start = time.time()
+                    try:
+                        self.connect()
+                    finally:
+                        result.timings["connect"] = time.time() - step_start
+                self.flash_delta(
+                    file,
+                    binary=binary,
+                    address=address,
+                    sector_size=sector_size,
+                    verify=verify,
+                    result=result,
+                )
+            except Exception as e:
+                result.error = e
+            result.elapsed = time.time() - start
+            return result
+
+        steps = list()
+        if connect:
+            steps.append(("connect", self.connect, ()))
+        if self._image_cache is not None:
+            steps.append(("check", self.is_image_cached, (file, binary, address)))
+        if erase:
+            steps.append(("erase", self.erase, ()))
+        # The image cache was already checked, so load/verify do not check it
+        steps.append(("load", self._load, (file, binary, address)))
+        if verify:
+            steps.append(("verify", self._verify, (file, binary, address)))
+
+        start = time.time()
+        for step, func, args in steps:
+            step_start = time.time()
+            try:
+                if func(*args) and step == "check":
+                    result.skipped = True
+                    break
+            except Exception as e:
+                result.error = e
+                break
+            finally:
+                result.timings[step] = time.time() - step_start
+        result.elapsed = time.time() - start
+
+        return result
+
+    def flash_delta(
+        self,
+        file,
+        binary=False,
+        address=None,
+        sector_size=None,
+        verify=True,
+        erase_sector=None,
+        result=None,
+    ):
+        """Programs only the flash sectors whose contents differ from an image
+
+        The image (Intel HEX, ELF or binary) is parsed locally and split into
+        sectors; bytes of a sector not covered by the image are expected to be
+        erased (0xFF). The current contents of those sectors are read back
+        from the device and only sectors that differ are written (using
+        :py:meth:`DebugSession.write_memory_region`, which relies on the
+        device's flash programmer to erase the sectors written).
+
+        Args:
+            file (str): full path to image file
+            binary (boolean, optional): specify to load image as binary (default = False)
+            address (int, optional): address to load binary image at (default=0x0)
+            sector_size (int, optional): size (and alignment) of flash sectors
+                in bytes (default = 4096)
+            verify (boolean, optional): read back programmed sectors and
+                compare them to the image (default = True)
+            erase_sector (callable, optional): called as
+                erase_sector(session, address, sector_size) before each changed
+                sector is written, for devices that need an explicit erase
+                (e.g. a device specific :py:meth:`DebugSession.perform_operation`)
+            result (FlashResult, optional): result object to fill in
+
+        Returns:
+            FlashResult: timings of the 'parse', 'read', 'program' and
+            'verify' steps, number of sectors compared and addresses of the
+            sectors programmed
 
-        self._send_req("verify", file=file, binary=binary, address=address)
+        Raises:
+            Exception: raised when image can not be parsed, or a sector could
+                not be read, written or verified
+        """
+        result = result or FlashResult(None)
+        sector_size = sector_size or DEFAULT_SECTOR_SIZE
+        start = time.time()
+
+        step_start = time.time()
+        sectors = image.load_image(file, binary=binary, address=address).sectors(
+            sector_size
+        )
+        result.timings["parse"] = time.time() - step_start
+        result.sectors = len(sectors)
+
+        step_start = time.time()
+        changed = self._changed_sectors(sectors, sector_size)
+        result.timings["read"] = time.time() - step_start
+        result.changed_sectors = list(changed.keys())
+
+        step_start = time.time()
+        for run_address, data in _join_sectors(changed):
+            if erase_sector is not None:
+                for sector in range(run_address, run_address + len(data), sector_size):
+                    erase_sector(self, sector, sector_size)
+            self.write_memory_region(data, run_address)
+        result.timings["program"] = time.time() - step_start
+
+        if verify and len(changed) > 0:
+            step_start = time.time()
+            mismatches = self._changed_sectors(changed, sector_size)
+            result.timings["verify"] = time.time() - step_start
+            if len(mismatches) > 0:
+                raise Exception(
+                    "Verify failed for sectors at: %s"
+                    % ", ".join("0x%x" % sector for sector in mismatches)
+                )
+        result.elapsed = time.time() - start
+
+        return result
+
+    def _changed_sectors(self, sectors, sector_size):
+        """Returns the sectors whose contents on the device differ
+
+        Args:
+            sectors (OrderedDict): sector address -> expected bytearray
+            sector_size (int): size of each sector
+
+        Returns:
+            collections.OrderedDict: sector address -> expected bytearray of
+            sectors that differ
+        """
+        changed = collections.OrderedDict()
+        for run_address, expected in _join_sectors(sectors):
+            actual = self.read_memory_region(run_address, len(expected))
+            for offset in range(0, len(expected), sector_size):
+                sector = expected[offset : offset + sector_size]
+                if actual[offset : offset + sector_size] != sector:
+                    changed[run_address + offset] = sector
+        return changed
 
     def evaluate(self, expression, file=None):
         """Evaluates an expression (after loading optional symbols file)
@@ -349,38 +2580,105 @@ class DebugSession(GenericServer):
         Raises:
             Exception if expression is invalid.
         """
-        result = None
-        if file is not None:
-            result = self._send_req("evaluate", expression=expression, file=file)
-        else:
-            result = self._send_req("evaluate", expression=expression)
+        self._invalidate_caches()
+        self._forget_image()
 
-        return result
+        return self._send(self._evaluate_req(expression, file))
 
-    def read_data(self, address, page=0, num_bytes=1):
+    def read_data(self, address, page=0, num_bytes=1, output=None):
         """Read memory from device
 
         Args:
             address (int): address to read data from
             page (int, optional): page in memory to get address from (default = 0)
             num_bytes (int, optional): number of bytes to read
+            output (str, optional): return bytes read as one of "list",
+                "bytes", "bytearray", "memoryview" or "numpy" (numpy.uint8
+                array; requires numpy). Buffer types are decoded directly from
+                the response without building a list of ints (default = "list")
 
         Returns:
-            list: list of bytes(ints) read
+            list: list of bytes(ints) read (or buffer type specified by output)
 
 
         Raises:
             Exception if address location is invalid.
         """
-        return self._send_req(
-            "readData", address=address, page=page, numBytes=num_bytes
+        request = self._read_data_req(address, page, num_bytes, output)
+        if self._memory_cache is not None and not self._running and num_bytes > 0:
+            data = self._read_cached(address, page, num_bytes)
+            if data is not None:
+                return utils.convert_bytes(data, output or "list")
+
+        return self._send(request)
+
+    def watch(
+        self,
+        addresses,
+        interval=None,
+        size=None,
+        page=0,
+        signed=False,
+        byteorder="little",
+        count=None,
+        ring=None,
+    ):
+        """Samples memory at a fixed rate (e.g. variables of running firmware)
+
+        All addresses are read in each poll using one pipelined exchange
+        (nearby addresses are read in the same request). Polls are scheduled
+        at fixed times; polls that can not start on time are skipped and
+        counted in the stats::
+
+            w = session.watch([0x20000000, (0x20000010, 2)], interval=0.005)
+            for sample in w:
+                print(sample.timestamp, sample.values)
+                if sample.values[0] > 100:
+                    w.stop()
+            print(w.stats.snapshot())
+
+        Args:
+            addresses (list): addresses to watch; each an int (read size bytes)
+                or an (address, size) tuple
+            interval (float, optional): seconds between polls (default = 0.01)
+            size (int, optional): default number of bytes per address
+                (default = 4)
+            page (int, optional): page in memory to get addresses from (default = 0)
+            signed (boolean, optional): decode values as signed ints
+                (default = False)
+            byteorder (str, optional): "little" or "big" (default="little")
+            count (int, optional): number of samples to take (default = until
+                :py:meth:`dsclient.watch.Watch.stop` is called)
+            ring (dsclient.watch.RingBuffer, optional): numpy ring buffer to
+                append each sample to
+
+        Returns:
+            dsclient.watch.Watch: iterator of
+            :py:class:`dsclient.watch.WatchSample` (see its stats attribute
+            for latency and jitter statistics)
+        """
+        plan = watch.WatchPlan(
+            addresses,
+            size=size or watch.DEFAULT_SIZE,
+            signed=signed,
+            byteorder=byteorder,
+        )
+
+        return watch.Watch(
+            self,
+            plan,
+            interval or watch.DEFAULT_INTERVAL,
+            page=page,
+            count=count,
+            ring=ring,
         )
 
     def write_data(self, data, address, page=0):
         """Write to memory on device
 
         Args:
-            data (list): list of bytes (ints) to write to memory
+            data (list): list of bytes (ints) to write to memory (can also be
+                bytes, bytearray, memoryview or numpy.uint8 array)
             address (int): address to read data from
             page (int, optional): page in memory to get address from (default = 0)
 
@@ -388,7 +2686,229 @@ class DebugSession(GenericServer):
         Raises:
             Exception if address location is invalid.
         """
-        return self._send_req("writeData", data=data, address=address, page=page)
+        self._invalidate_caches()
+        self._forget_image()
+
+        return self._send(self._write_data_req(data, address, page))
+
+    def read_memory_region(
+        self, address, num_bytes, page=0, chunk_size=None, progress=None, into=None
+    ):
+        """Read a (large) region of memory from device
+
+        The region is split into chunks which are read using a
+        :py:class:`Pipeline` and copied into a preallocated buffer as they
+        arrive.
+
+        Args:
+            address (int): address to start reading data from
+            num_bytes (int): number of bytes to read
+            page (int, optional): page in memory to get address from (default = 0)
+            chunk_size (int, optional): max number of bytes per request
+                (default = 16384)
+            progress (callable, optional): called as progress(bytes_done, num_bytes)
+                after each chunk is received
+            into (writable buffer, optional): buffer (bytearray, memoryview or
+                numpy.uint8 array) of at least num_bytes to read into
+                (default creates a new bytearray)
+
+        Returns:
+            bytearray: bytes read (or the into buffer if provided)
+
+
+        Raises:
+            Exception if address location is invalid.
+        """
+        buf = into if into is not None else bytearray(num_bytes)
+        view = memoryview(buf)
+        if len(view) < num_bytes:
+            raise Exception(
+                "Buffer too small: %d bytes (need %d)" % (len(view), num_bytes)
+            )
+
+        done = 0
+        for offset, data in self._iter_memory_chunks(
+            address, num_bytes, page, chunk_size
+        ):
+            view[offset : offset + len(data)] = data
+            done += len(data)
+            if progress is not None:
+                progress(done, num_bytes)
+
+        return buf
+
+    def _iter_memory_chunks(self, address, num_bytes, page=0, chunk_size=None):
+        """Reads a region of memory in chunks using a :py:class:`Pipeline`
+
+        Only a bounded number of chunks are in-flight at a time, so memory use
+        does not depend on the size of the region.
+
+        Args:
+            address (int): address to start reading data from
+            num_bytes (int): number of bytes to read
+            page (int, optional): page in memory to get address from (default = 0)
+            chunk_size (int, optional): max number of bytes per request
+                (default = 16384)
+
+        Yields:
+            (int, bytearray): offset (from address) and bytes of each chunk (in order)
+        """
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        pending = collections.deque()
+
+        def receive(offset, future):
+            try:
+                return (offset, future.result())
+            except Exception as e:
+                raise Exception(
+                    "Failed to read chunk at 0x%x: %s" % (address + offset, e)
+                )
+
+        with self.pipeline() as p:
+            for offset in range(0, num_bytes, chunk_size):
+                request = self._read_data_req(
+                    address + offset,
+                    page,
+                    min(chunk_size, num_bytes - offset),
+                    "bytearray",
+                )
+                pending.append((offset, p.send(request)))
+                while len(pending) > 0 and pending[0][1].done():
+                    yield receive(*pending.popleft())
+
+            while len(pending) > 0:
+                yield receive(*pending.popleft())
+
+    def dump_memory(
+        self,
+        address,
+        num_bytes,
+        file,
+        page=0,
+        chunk_size=None,
+        progress=None,
+        use_mmap=False,
+    ):
+        """Dump a region of memory from device to a file
+
+        Each chunk is written to the file as soon as it is received, so memory
+        use does not depend on the size of the region.
+
+        Args:
+            address (int): address to start reading data from
+            num_bytes (int): number of bytes to dump
+            file (str, path-like or file object): full path of file to
+                create, or a writable (binary) file object to write to
+            page (int, optional): page in memory to get address from (default = 0)
+            chunk_size (int, optional): max number of bytes per request
+                (default = 16384)
+            progress (callable, optional): called as progress(bytes_done, num_bytes)
+                after each chunk is written
+            use_mmap (boolean, optional): create file with num_bytes size and
+                read directly into a memory map of it (file must be a path;
+                default = False)
+
+        Returns:
+            int or mmap.mmap: number of bytes written, or the (open) memory
+            map of the file if use_mmap is True (an empty file can not be
+            memory mapped, so 0 is returned when num_bytes is 0)
+
+        Raises:
+            Exception if address location is invalid.
+        """
+        is_path = isinstance(file, _PATH_TYPES)
+        if use_mmap:
+            if not is_path:
+                raise Exception("use_mmap requires file to be a path")
+            with open(file, "w+b") as f:
+                if num_bytes == 0:
+                    return 0
+                f.truncate(num_bytes)
+                mm = mmap.mmap(f.fileno(), num_bytes)
+            try:
+                self.read_memory_region(
+                    address,
+                    num_bytes,
+                    page=page,
+                    chunk_size=chunk_size,
+                    progress=progress,
+                    into=mm,
+                )
+            except Exception:
+                mm.close()
+                raise
+            return mm
+
+        f = open(file, "wb") if is_path else file
+        try:
+            done = 0
+            for _, data in self._iter_memory_chunks(
+                address, num_bytes, page, chunk_size
+            ):
+                f.write(data)
+                done += len(data)
+                if progress is not None:
+                    progress(done, num_bytes)
+        finally:
+            if f is not file:
+                f.close()
+
+        return done
+
+    def write_memory_region(
+        self, data, address, page=0, chunk_size=None, progress=None
+    ):
+        """Write a (large) region of memory on device
+
+        The data is split into chunks which are written using a
+        :py:class:`Pipeline`.
+
+        Args:
+            data (bytes-like): bytes to write (bytes, bytearray, memoryview,
+                numpy.uint8 array or list of ints)
+            address (int): address to start writing data to
+            page (int, optional): page in memory to get address from (default = 0)
+            chunk_size (int, optional): max number of bytes per request
+                (default = 16384)
+            progress (callable, optional): called as progress(bytes_done, num_bytes)
+                after each chunk is written
+
+
+        Raises:
+            Exception if address location is invalid.
+        """
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self._invalidate_caches()
+        self._forget_image()
+        if isinstance(data, (list, tuple)):
+            data = bytearray(data)
+        view = memoryview(data)
+        num_bytes = len(view)
+
+        pending = collections.deque()
+        done = [0]
+
+        def confirm(offset, length, future):
+            try:
+                future.result()
+            except Exception as e:
+                raise Exception(
+                    "Failed to write chunk at 0x%x: %s" % (address + offset, e)
+                )
+            done[0] += length
+            if progress is not None:
+                progress(done[0], num_bytes)
+
+        with self.pipeline() as p:
+            for offset in range(0, num_bytes, chunk_size):
+                chunk = view[offset : offset + chunk_size]
+                request = self._write_data_req(chunk, address + offset, page)
+                pending.append((offset, len(chunk), p.send(request)))
+                while len(pending) > 0 and pending[0][2].done():
+                    confirm(*pending.popleft())
+
+            while len(pending) > 0:
+                confirm(*pending.popleft())
 
     def read_register(self, name):
         """Read value from register
@@ -403,7 +2923,55 @@ class DebugSession(GenericServer):
         Raises:
             Exception if register name is invalid.
         """
-        return self._send_req("readRegister", name=name)
+        cache = self._register_cache
+        if cache is None or self._running:
+            return self._send(self._read_register_req(name))
+
+        if name in cache:
+            self._register_cache_stats["hits"] += 1
+            return cache[name]
+
+        self._register_cache_stats["misses"] += 1
+        value = cache[name] = self._send(self._read_register_req(name))
+        return value
+
+    def read_registers(self, names):
+        """Read values of many registers in one pipelined exchange
+
+        Registers already in the register cache (if enabled) are not read
+        again.
+
+        Args:
+            names (list): register names to read
+
+        Returns:
+            collections.OrderedDict: register name -> value read (in order of names)
+
+
+        Raises:
+            Exception if a register name is invalid.
+        """
+        cache = self._register_cache
+        if self._running:
+            cache = None
+
+        values = collections.OrderedDict()
+        futures = collections.OrderedDict()
+        with self.pipeline() as p:
+            for name in names:
+                if cache is not None and name in cache:
+                    self._register_cache_stats["hits"] += 1
+                    values[name] = cache[name]
+                elif name not in futures:
+                    futures[name] = p.send(self._read_register_req(name))
+
+        for name, future in futures.items():
+            values[name] = future.result()
+            if cache is not None:
+                self._register_cache_stats["misses"] += 1
+                cache[name] = values[name]
+
+        return collections.OrderedDict((name, values[name]) for name in names)
 
     def write_register(self, name, value):
         """Write value to register on device
@@ -416,7 +2984,13 @@ class DebugSession(GenericServer):
         Raises:
             Exception if register name is invalid.
         """
-        return self._send_req("writeRegister", name=name, value=value)
+        if self._register_cache is not None:
+            self._register_cache.pop(name, None)
+        result = self._send(self._write_register_req(name, value))
+        if self._register_cache is not None and not self._running:
+            self._register_cache[name] = value
+
+        return result
 
     def get_option(self, option_id):
         """Get the value of a device option
@@ -431,7 +3005,7 @@ class DebugSession(GenericServer):
         Raises:
             Exception if option id is invalid.
         """
-        return self._send_req("getOption", id=option_id)
+        return self._send(self._get_option_req(option_id))
 
     def set_option(self, option_id, value):
         """Set the value of a device option
@@ -444,7 +3018,7 @@ class DebugSession(GenericServer):
         Raises:
             Exception if option id is invalid.
         """
-        return self._send_req("setOption", id=option_id, value=value)
+        return self._send(self._set_option_req(option_id, value))
 
     def perform_operation(self, opcode):
         """Performs flash operation
@@ -459,7 +3033,9 @@ class DebugSession(GenericServer):
         Raises:
             Exception if opcode is invalid.
         """
-        return self._send_req("performOperation", opcode=opcode)
+        self._invalidate_caches()
+        self._forget_image()
+        return self._send(self._perform_operation_req(opcode))
 
     def run(self, asynchronous=False):
         """Issues the run command to the device
@@ -467,7 +3043,9 @@ class DebugSession(GenericServer):
         Args:
             asynchronous (boolean, optional): run and return control immediately (default = False)
         """
-        self._send_req("run", asynchronous=asynchronous)
+        self._invalidate_caches()
+        self._send(self._run_req(asynchronous))
+        self._running = bool(asynchronous)
 
     def halt(self, wait=False):
         """Halts the device
@@ -475,7 +3053,36 @@ class DebugSession(GenericServer):
         Args:
             wait (boolean): wait until device is actually halted before returning
         """
-        self._send_req("halt", wait=wait)
+        self._invalidate_caches()
+        self._send(self._halt_req(wait))
+        self._running = False
+
+    def run_nowait(self):
+        """Runs the device until it halts (e.g. at a breakpoint) without
+        waiting
+
+        Returns:
+            HaltFuture: completes when the target halts
+        """
+        return self._send_halt_future(self._run_req(asynchronous=False))
+
+    def halt_nowait(self):
+        """Halts the device without waiting for it to actually halt
+
+        Returns:
+            HaltFuture: completes when the target has halted
+        """
+        return self._send_halt_future(self._halt_req(wait=True))
+
+    def _send_halt_future(self, request):
+        """Sends a request whose response arrives when the target halts"""
+        self._invalidate_caches()
+        self._running = True
+        p = self.pipeline()
+        future = p.send(request)
+        p.flush()
+
+        return HaltFuture(self, future)
 
     def stop(self):
         """Stops the session thread but does not terminate the session."""
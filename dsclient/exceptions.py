@@ -0,0 +1,49 @@
+"""Contains exception types raised by dsclient"""
+
+
+class TimeoutException(Exception):
+    """Raised when connecting to, or waiting for a response from, a
+    DebugServer/DebugSession takes longer than its timeout
+
+    The connection is closed when a request times out (a late response would
+    otherwise be returned for the next request); it is reopened on the next
+    request.
+
+    Attributes:
+        command (str): name of command that timed out (None when connecting)
+        timeout (float): timeout in seconds
+    """
+
+    def __init__(self, message, command=None, timeout=None):
+        super(TimeoutException, self).__init__(message)
+        self.command = command
+        self.timeout = timeout
+
+
+class ConnectionException(Exception):
+    """Raised when the connection to a DebugServer/DebugSession can not be
+    opened or is lost before a response is received"""
+
+
+class BatchException(Exception):
+    """Raised when operations of a :py:class:`dsclient.core.Batch` fail
+
+    Attributes:
+        errors (list): (index, step, exception) of each failed operation (in
+            order); step is a description of the operation, e.g.
+            "write_register(R0, 1)"
+        results (list): result of each operation (None if it failed or was
+            not run)
+        skipped (list): indexes of operations not run because an earlier one
+            failed (stop_on_error only)
+    """
+
+    def __init__(self, errors, results, skipped=None):
+        index, step, error = errors[0]
+        message = "Batch step %d (%s) failed: %s" % (index, step, error)
+        if len(errors) > 1:
+            message += " (and %d more)" % (len(errors) - 1)
+        super(BatchException, self).__init__(message)
+        self.errors = errors
+        self.results = results
+        self.skipped = skipped or list()
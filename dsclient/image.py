@@ -0,0 +1,435 @@
+"""Contains parsers for firmware images (Intel HEX, ELF and binary) and a
+persistent cache of images known to be on each device
+
+Images are parsed locally into segments of bytes so they can be compared
+against the contents of a device's flash (see
+:py:meth:`dsclient.DebugSession.flash_delta` and
+:py:meth:`dsclient.DebugSession.enable_image_cache`).
+"""
+import os
+import json
+import time
+import struct
+import hashlib
+import binascii
+import tempfile
+import contextlib
+import collections
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Value of erased flash bytes
+ERASED_BYTE = 0xFF
+
+# Default file used to store ImageCache entries
+DEFAULT_IMAGE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "dsclient", "images.json"
+)
+_ELF_MAGIC = b"\x7fELF"
+_PT_LOAD = 1
+
+
+class Image(object):
+    """Firmware image as a sorted list of non-overlapping segments"""
+
+    def __init__(self, segments=None):
+        """
+        Args:
+            segments (list, optional): (address, bytes) tuples to add
+        """
+        self.segments = list()
+        for address, data in segments or list():
+            self.add(address, data)
+
+    def add(self, address, data):
+        """Adds bytes at address (merging with adjacent segments)
+
+        Args:
+            address (int): address of first byte
+            data (bytes-like): bytes to add
+
+        Raises:
+            Exception: raised when data overlaps an existing segment
+        """
+        data = bytearray(data)
+        if len(data) == 0:
+            return
+
+        end = address + len(data)
+        for start, existing in self.segments:
+            if address < start + len(existing) and start < end:
+                raise Exception("Image data overlaps at address 0x%x" % address)
+
+        self.segments.append([address, data])
+        self.segments.sort(key=lambda segment: segment[0])
+
+        merged = list()
+        for start, segment in self.segments:
+            if len(merged) > 0 and merged[-1][0] + len(merged[-1][1]) == start:
+                merged[-1][1] += segment
+            else:
+                merged.append([start, segment])
+        self.segments = merged
+
+    @property
+    def size(self):
+        """int: total number of bytes in image"""
+        return sum(len(data) for _, data in self.segments)
+
+    def sectors(self, sector_size, fill=ERASED_BYTE):
+        """Returns expected contents of each flash sector the image touches
+
+        Bytes of a sector not covered by the image are set to fill (the
+        value of erased flash).
+
+        Args:
+            sector_size (int): size (and alignment) of flash sectors in bytes
+            fill (int, optional): value of bytes not covered by image
+                (default=0xFF)
+
+        Returns:
+            collections.OrderedDict: sector address -> bytearray (sorted by address)
+        """
+        sectors = dict()
+        for address, data in self.segments:
+            offset = 0
+            while offset < len(data):
+                sector = (address + offset) // sector_size * sector_size
+                start = address + offset - sector
+                n = min(len(data) - offset, sector_size - start)
+                if sector not in sectors:
+                    sectors[sector] = bytearray([fill]) * sector_size
+                sectors[sector][start : start + n] = data[offset : offset + n]
+                offset += n
+
+        return collections.OrderedDict(sorted(sectors.items()))
+
+    def probes(self, size=None):
+        """Returns regions of the image read back to check that a device
+        still holds it
+
+        By default each segment is one region, so any changed byte is found.
+        With size, only the start, middle and end of each segment are checked,
+        which is faster but misses changes elsewhere.
+
+        Args:
+            size (int, optional): max number of bytes in each region
+                (default = None; whole segments)
+
+        Returns:
+            list: [address, length, crc32] of each region (sorted by address)
+        """
+        probes = list()
+        for address, data in self.segments:
+            if size is None:
+                probes.append([address, len(data), crc32(data)])
+                continue
+            starts = sorted(
+                set([0, max(0, len(data) // 2 - size // 2), max(0, len(data) - size)])
+            )
+            for start in starts:
+                region = data[start : start + size]
+                probes.append([address + start, len(region), crc32(region)])
+
+        return probes
+
+
+def crc32(data, value=0):
+    """Returns unsigned CRC-32 of bytes (same value in Python 2 and 3)
+
+    Args:
+        data (bytes-like): bytes to checksum
+        value (int, optional): CRC-32 of the preceding bytes, to checksum
+            data read in chunks (default = 0)
+    """
+    return binascii.crc32(bytes(data), value) & 0xFFFFFFFF
+
+
+def file_digest(file):
+    """Returns SHA-256 hex digest of a file's contents
+
+    Args:
+        file (str): full path to file
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class ImageCache(object):
+    """Persistent record of which image each device was last verified to hold
+
+    Entries are stored in a JSON file keyed by device identity, image content
+    hash and load address, so they are shared between processes and CI runs
+    (updates hold a lock on a ``.lock`` file next to it).
+    Each entry also holds the CRC-32 of the image's regions (see
+    :py:meth:`Image.probes`) which are read back from the device to confirm
+    it has not been reprogrammed by something else since.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): full path of JSON file to store entries in
+                (default="~/.cache/dsclient/images.json")
+        """
+        self.path = path or DEFAULT_IMAGE_CACHE_PATH
+
+    @staticmethod
+    def key(digest, binary=False, address=None):
+        """Returns key of an image in a device's entries"""
+        return "%s:%s:0x%x" % (digest, "bin" if binary else "img", address or 0)
+
+    def _read(self):
+        """Returns all entries (device -> image key -> entry)"""
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            return dict()
+
+        return entries if isinstance(entries, dict) else dict()
+
+    def _directory(self):
+        """Returns directory of the cache file (created if missing)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+        return directory
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """Holds an exclusive lock for a read-modify-write of the entries (on
+        a separate file, since the cache file is replaced by every write)"""
+        self._directory()
+        with open(self.path + ".lock", "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _write(self, entries):
+        """Atomically replaces the cache file with entries"""
+        directory = self._directory()
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            if hasattr(os, "replace"):
+                os.replace(tmp_path, self.path)
+            else:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                os.rename(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, device, key):
+        """Returns entry of an image on a device
+
+        Args:
+            device (str): device identity
+            key (str): image key (see :py:meth:`ImageCache.key`)
+
+        Returns:
+            dict: entry (file, probes, verified) or None if not cached
+        """
+        return self._read().get(device, dict()).get(key)
+
+    def has(self, device):
+        """Returns whether any entries of a device are recorded
+
+        Args:
+            device (str): device identity
+
+        Returns:
+            bool: True if device has entries
+        """
+        return device in self._read()
+
+    def put(self, device, key, file, probes):
+        """Records that device holds an image (replacing any other image
+        recorded for the device)
+
+        Args:
+            device (str): device identity
+            key (str): image key (see :py:meth:`ImageCache.key`)
+            file (str): full path of image file
+            probes (list): regions to check (see :py:meth:`Image.probes`)
+        """
+        with self._lock():
+            entries = self._read()
+            entries[device] = {
+                key: {"file": file, "probes": probes, "verified": time.time()}
+            }
+            self._write(entries)
+
+    def remove(self, device):
+        """Removes all entries of a device
+
+        Args:
+            device (str): device identity
+        """
+        with self._lock():
+            entries = self._read()
+            if entries.pop(device, None) is not None:
+                self._write(entries)
+
+    def clear(self):
+        """Removes all entries"""
+        with self._lock():
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def load_image(file, binary=False, address=None):
+    """Parses an image file
+
+    The format is detected from the file contents: ELF files start with the
+    ELF magic number and Intel HEX files start with ':'. Other formats (e.g.
+    Motorola S-record or TI COFF) are not supported unless binary is True.
+
+    Args:
+        file (str): full path to image file
+        binary (boolean, optional): read file as a binary image (default = False)
+        address (int, optional): address to load binary image at (default=0x0)
+
+    Returns:
+        Image: parsed image
+
+    Raises:
+        Exception: raised when file does not exist, its format is not
+            supported or it can not be parsed
+    """
+    if not os.path.isfile(file):
+        raise Exception("File does not exist: %s" % file)
+
+    with open(file, "rb") as f:
+        data = f.read()
+
+    if binary:
+        return Image([(address or 0, data)])
+    elif data.startswith(_ELF_MAGIC):
+        return parse_elf(data)
+    elif data.lstrip().startswith(b":"):
+        return parse_intel_hex(data)
+
+    raise Exception("Unsupported image format (not ELF or Intel HEX): %s" % file)
+
+
+def parse_intel_hex(data):
+    """Parses an Intel HEX image
+
+    Args:
+        data (bytes): contents of Intel HEX file
+
+    Returns:
+        Image: parsed image
+
+    Raises:
+        Exception: raised when a record is invalid
+    """
+    image = Image()
+    base = 0
+    for number, line in enumerate(data.splitlines(), 1):
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        if not line.startswith(b":"):
+            raise Exception("Invalid Intel HEX record on line %d" % number)
+
+        try:
+            record = bytearray(binascii.unhexlify(line[1:]))
+        except (TypeError, ValueError, binascii.Error):
+            raise Exception("Invalid Intel HEX record on line %d" % number)
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise Exception("Invalid Intel HEX record length on line %d" % number)
+        if sum(record) & 0xFF != 0:
+            raise Exception("Invalid Intel HEX checksum on line %d" % number)
+
+        count, offset, kind = record[0], (record[1] << 8) | record[2], record[3]
+        payload = record[4 : 4 + count]
+        if kind == 0x00:
+            image.add(base + offset, payload)
+        elif kind == 0x01:
+            break
+        elif kind == 0x02:
+            base = ((payload[0] << 8) | payload[1]) << 4
+        elif kind == 0x04:
+            base = ((payload[0] << 8) | payload[1]) << 16
+        # Start address records (0x03, 0x05) do not contain data
+
+    return image
+
+
+def parse_elf(data):
+    """Parses the loadable segments of an ELF image
+
+    Segments are placed at their physical (load) address.
+
+    Args:
+        data (bytes): contents of ELF file
+
+    Returns:
+        Image: parsed image
+
+    Raises:
+        Exception: raised when data is not a valid ELF file
+    """
+    if not data.startswith(_ELF_MAGIC) or len(data) < 52:
+        raise Exception("Invalid ELF file")
+
+    ei_class, ei_data = bytearray(data[4:6])
+    endian = "<" if ei_data == 1 else ">"
+    if ei_class == 1:
+        phoff, = struct.unpack_from(endian + "I", data, 28)
+        phentsize, phnum = struct.unpack_from(endian + "HH", data, 42)
+        header = endian + "IIIIIIII"
+    elif ei_class == 2:
+        phoff, = struct.unpack_from(endian + "Q", data, 32)
+        phentsize, phnum = struct.unpack_from(endian + "HH", data, 54)
+        header = endian + "IIQQQQQQ"
+    else:
+        raise Exception("Invalid ELF class: %d" % ei_class)
+
+    image = Image()
+    for i in range(phnum):
+        fields = struct.unpack_from(header, data, phoff + i * phentsize)
+        if ei_class == 1:
+            p_type, p_offset, _, p_paddr, p_filesz = fields[:5]
+        else:
+            p_type, _, p_offset, _, p_paddr, p_filesz = fields[:6]
+        if p_type != _PT_LOAD or p_filesz == 0:
+            continue
+        if p_offset + p_filesz > len(data):
+            raise Exception("Invalid ELF segment at offset 0x%x" % p_offset)
+        image.add(p_paddr, data[p_offset : p_offset + p_filesz])
+
+    return image
@@ -0,0 +1,180 @@
+"""Contains request instrumentation (latency histograms and counters)"""
+import json
+import math
+import time
+
+# Use highest resolution clock available (Python 3.3+)
+timer = getattr(time, "perf_counter", time.time)
+
+# Number of histogram buckets; bucket i counts latencies <= 2**i microseconds
+NUM_BUCKETS = 40
+
+
+class Histogram(object):
+    """Latency histogram with power of 2 (microsecond) buckets"""
+
+    def __init__(self):
+        self._buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        """Adds a latency to the histogram
+
+        Args:
+            seconds (float): latency in seconds
+        """
+        index = math.frexp(seconds * 1e6)[1] if seconds > 1e-6 else 0
+        self._buckets[min(index, NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Returns the approximate latency at the q percentile
+
+        Args:
+            q (float): percentile to get (0-100)
+
+        Returns:
+            float: upper bound (in seconds) of the bucket containing the
+            percentile (or None if histogram is empty)
+        """
+        if self.count == 0:
+            return None
+
+        target = self.count * q / 100.0
+        seen = 0
+        for index, count in enumerate(self._buckets):
+            seen += count
+            if seen >= target and count > 0:
+                return min((2 ** index) / 1e6, self.max)
+
+        return self.max
+
+    def snapshot(self):
+        """Returns the histogram as a dict
+
+        Returns:
+            dict: count, total, min, max, mean, p50, p90 and p99 latencies (in
+            seconds) and non-empty 'buckets' (upper bound in microseconds -> count)
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count > 0 else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": dict(
+                (2 ** index, count)
+                for index, count in enumerate(self._buckets)
+                if count > 0
+            ),
+        }
+
+
+class CommandStats(object):
+    """Counters and latency histogram of a single command"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram()
+
+    def snapshot(self):
+        """Returns the stats as a dict
+
+        Returns:
+            dict: count, errors, request_bytes, response_bytes and latency
+        """
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class Metrics(object):
+    """Records latency, sizes and errors of each request sent over a connection"""
+
+    def __init__(self, name=None, callback=None):
+        """
+        Args:
+            name (str, optional): name to identify the connection with
+            callback (callable, optional): called with an event dict (name,
+                command, latency, request_bytes, response_bytes, error) after
+                every request
+        """
+        self.name = name
+        self._callback = callback
+        self._commands = dict()
+
+    def record(self, command, latency, request_bytes, response_bytes, error):
+        """Records a completed request
+
+        Args:
+            command (str): name of command
+            latency (float): seconds from sending request to receiving response
+            request_bytes (int): size of request message
+            response_bytes (int): size of response message
+            error (bool): whether the request failed
+        """
+        stats = self._commands.get(command)
+        if stats is None:
+            stats = self._commands[command] = CommandStats()
+        stats.count += 1
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+        stats.latency.add(latency)
+        if error:
+            stats.errors += 1
+
+        if self._callback is not None:
+            self._callback(
+                {
+                    "name": self.name,
+                    "command": command,
+                    "latency": latency,
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                    "error": error,
+                }
+            )
+
+    def reset(self):
+        """Clears all recorded stats"""
+        self._commands = dict()
+
+    def snapshot(self):
+        """Returns all recorded stats as a dict
+
+        Returns:
+            dict: 'name' and 'commands' (command name -> stats dict)
+        """
+        return {
+            "name": self.name,
+            "commands": dict(
+                (command, stats.snapshot())
+                for command, stats in self._commands.items()
+            ),
+        }
+
+    def to_json(self):
+        """Returns all recorded stats as a JSON string
+
+        Returns:
+            str: JSON formatted stats
+        """
+        return json.dumps(self.snapshot())
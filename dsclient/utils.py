@@ -1,31 +1,176 @@
 import os
 import re
 import json
+import base64
 import socket
 import subprocess
 
+from dsclient.codec import get_codec
+from dsclient.exceptions import ConnectionException
 
-def create_socket(port, host=None, connect=True):
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Output types supported when reading bytes
+BYTE_OUTPUTS = ("bytes", "bytearray", "memoryview", "numpy")
+
+# Encodings of memory bytes in readData/writeData messages ("list" is a JSON
+# list of ints and is supported by every DebugServer-js version)
+LIST = "list"
+BASE64 = "base64"
+DATA_ENCODINGS = (LIST, BASE64)
+
+# Decimal string of each byte value (used to encode byte lists)
+_BYTE_STRINGS = [str(i).encode() for i in range(256)]
+
+# Compiled session name patterns
+_PATTERN_CACHE = dict()
+_PATTERN_CACHE_SIZE = 256
+
+
+def create_socket(
+    port,
+    host=None,
+    connect=True,
+    connect_timeout=None,
+    nodelay=True,
+    keepalive=None,
+    send_buffer=None,
+    recv_buffer=None,
+):
     """Creates and returns a socket
 
     Args:
         port (int): port number to use
         connect (bool, optional): whether socket should be connected (default=True)
         host (str, optional): hostname to connect to (default="localhost")
+        connect_timeout (float, optional): seconds to wait for connection
+            (default=None; wait forever)
+        nodelay (bool, optional): disable Nagle's algorithm so small requests
+            are sent immediately (default=True)
+        keepalive (bool or int, optional): enable TCP keepalive; an int also
+            sets the idle seconds before probes are sent (where supported)
+            (default=None; OS default)
+        send_buffer (int, optional): size of socket send buffer (SO_SNDBUF)
+        recv_buffer (int, optional): size of socket receive buffer (SO_RCVBUF)
 
     Returns:
-        socket: socket created
+        socket: socket created (in blocking mode)
 
+    Raises:
+        socket.timeout: raised when connection is not made within connect_timeout
     """
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     if host is None:
         host = "localhost"
+    if nodelay:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if keepalive:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if keepalive is not True and hasattr(socket, "TCP_KEEPIDLE"):
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(keepalive))
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, int(keepalive))
+    # Buffer sizes must be set before connecting to affect the TCP window
+    if send_buffer is not None:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+    if recv_buffer is not None:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
     if connect:
-        s.connect((host, port))
+        s.settimeout(connect_timeout)
+        try:
+            s.connect((host, port))
+        except Exception:
+            s.close()
+            raise
+        s.settimeout(None)
     return s
 
 
-def send(s, req):
+class StreamReader(object):
+    """Buffered reader for newline delimited messages received over a socket.
+
+    Data is received in large chunks into a reusable buffer and only the newly
+    received bytes are scanned for the delimiter. Any bytes received after a
+    delimiter are kept and returned by the next call to
+    :py:meth:`StreamReader.readline`.
+    """
+
+    def __init__(self, s, bufsize=65536, delimiter=b"\n"):
+        """
+        Args:
+            s (socket): connected socket to read from
+            bufsize (int, optional): max number of bytes to receive per recv call
+                (default=65536)
+            delimiter (bytes, optional): message delimiter (default=b"\\n")
+        """
+        self._socket = s
+        self._delimiter = delimiter
+        self._chunk = bytearray(bufsize)
+        self._chunk_view = memoryview(self._chunk)
+        self._buffer = bytearray()
+
+    def pending(self):
+        """Returns the number of received bytes not yet returned as a message
+
+        Returns:
+            int: number of buffered bytes
+        """
+        return len(self._buffer)
+
+    def has_message(self):
+        """Returns whether a full message is buffered (so
+        :py:meth:`StreamReader.readline` will not block)
+
+        Returns:
+            bool: True if a full message is buffered
+        """
+        return self._buffer.find(self._delimiter) >= 0
+
+    def receive(self):
+        """Receives available bytes into the buffer (waits/blocks if none are
+        available; use select to check first)
+
+        Raises:
+            ConnectionException: raised when connection is closed
+        """
+        nbytes = self._socket.recv_into(self._chunk)
+        if nbytes == 0:
+            raise ConnectionException("Connection closed before response was received")
+        self._buffer += self._chunk_view[:nbytes]
+
+    def readline(self):
+        """Returns the next message (without the delimiter).
+
+        This will wait/block until a full message is received or timeout occurs
+
+        Returns:
+            bytes: next message received
+
+        Raises:
+            ConnectionException: raised when connection is closed before a
+                full message is received
+        """
+        start = 0
+        while True:
+            index = self._buffer.find(self._delimiter, start)
+            if index >= 0:
+                line = bytes(self._buffer[:index])
+                del self._buffer[: index + len(self._delimiter)]
+                return line
+
+            # Only rescan the bytes that have not been searched yet
+            start = max(0, len(self._buffer) - len(self._delimiter) + 1)
+            nbytes = self._socket.recv_into(self._chunk)
+            if nbytes == 0:
+                raise ConnectionException(
+                    "Connection closed before response was received"
+                )
+            self._buffer += self._chunk_view[:nbytes]
+
+
+def send(s, req, reader=None, codec=None):
     """Sends a JSON formatted request and returns the response.
 
     This will wait/block until a response is received or timeout occurs
@@ -33,19 +178,167 @@ def send(s, req):
     Args:
         s (socket): socket to send request over
         req (dict): request to convert to json and send over socket
+        reader (StreamReader, optional): reader to receive response with;
+            should be reused for every request sent over the same socket so
+            that no received bytes are lost (default creates a new reader)
+        codec (str or JSONCodec, optional): JSON codec to use (default=fastest
+            installed codec)
+
+    Returns:
+        dict: JSON formatted response
+    """
+    codec = get_codec(codec)
+    if reader is None:
+        reader = StreamReader(s)
+
+    s.sendall(codec.encode_request(req))
+
+    return codec.decode_response(reader.readline())
+
+
+def encode_request(req, codec=None):
+    """Encodes a request as a newline terminated JSON message
+
+    Args:
+        req (dict): request to convert to json
+        codec (str or JSONCodec, optional): JSON codec to use (default=fastest
+            installed codec)
+
+    Returns:
+        bytes: encoded message ready to send over socket
+    """
+    return get_codec(codec).encode_request(req)
+
+
+def decode_response(msg, codec=None):
+    """Decodes a JSON response message
+
+    Args:
+        msg (bytes): message received (without delimiter)
+        codec (str or JSONCodec, optional): JSON codec to use (default=fastest
+            installed codec)
+
+    Returns:
+        dict: JSON formatted response
+    """
+    return get_codec(codec).decode_response(msg)
+
+
+def encode_byte_request(cmd, key, data, codec=None, encoding=None, **kwargs):
+    """Encodes a request with a list of bytes argument as a newline
+    terminated JSON message without building a list of ints
+
+    Args:
+        cmd (str): command name
+        key (str): name of argument to hold list of bytes
+        data (bytes, bytearray, memoryview or numpy.ndarray): bytes to encode
+        codec (str or JSONCodec, optional): JSON codec to use for base64
+            requests (default=fastest installed codec); lists of bytes are
+            always encoded directly from the buffer
+        encoding (str, optional): "base64" to send the bytes as a base64
+            string along with an 'encoding' argument (requires server
+            support); default sends a list of ints
+        **kwargs (dict, optional): other keyword arguments to specify for command
+
+    Returns:
+        bytes: encoded message ready to send over socket
+    """
+    codec = get_codec(codec)
+    if encoding == BASE64:
+        kwargs[key] = base64.b64encode(bytes(bytearray(data))).decode("ascii")
+        kwargs["encoding"] = BASE64
+        return codec.encode_request(create_request(cmd, **kwargs))
+    elif encoding not in (None, LIST):
+        raise Exception(
+            "Invalid encoding: %s (must be one of %s)" % (encoding, str(DATA_ENCODINGS))
+        )
+
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+
+    args = json.dumps(kwargs).encode()
+    return b'{"name": %s, "args": %s%s"%s": [%s]}}\n' % (
+        json.dumps(cmd).encode(),
+        args[:-1],
+        b", " if len(kwargs) > 0 else b"",
+        key.encode(),
+        b",".join(map(_BYTE_STRINGS.__getitem__, data)),
+    )
+
+
+def decode_byte_response(msg, output="bytearray", codec=None):
+    """Decodes a JSON response message whose 'data' value is a list of bytes
+    (ints) or a base64 string into a byte buffer
+
+    The message is decoded by the codec (which parses lists of ints faster
+    than any pure Python scan of the message) and the 'data' value is then
+    copied into the buffer.
+
+    Args:
+        msg (bytes): message received (without delimiter)
+        output (str, optional): type of buffer to return 'data' as; one of
+            "bytes", "bytearray", "memoryview" or "numpy" (default="bytearray")
+        codec (str or JSONCodec, optional): JSON codec to use (default=fastest
+            installed codec)
 
     Returns:
         dict: JSON formatted response
     """
-    msg = json.dumps(req)
-    s.sendall(b"%s\n" % msg.encode())
+    check_byte_output(output)
+
+    resp = get_codec(codec).decode_response(msg)
+    data = resp.get("data")
+    if isinstance(data, list):
+        data = bytearray(data)
+    elif isinstance(data, type(u"")):
+        data = bytearray(base64.b64decode(data))
+    else:
+        return resp
+
+    resp["data"] = convert_bytes(data, output)
+
+    return resp
+
+
+def check_byte_output(output):
+    """Checks output is a supported buffer type
+
+    Args:
+        output (str): one of "bytes", "bytearray", "memoryview" or "numpy"
+
+    Raises:
+        Exception: raised when output is not supported (or requires numpy and
+            numpy is not installed)
+    """
+    if output not in BYTE_OUTPUTS:
+        raise Exception(
+            "Invalid output: %s (must be one of %s)" % (output, str(BYTE_OUTPUTS))
+        )
+    if output == "numpy" and numpy is None:
+        raise Exception("numpy output requires numpy to be installed")
 
-    r = bytearray()
-    while b"\n" not in r:
-        r.extend(s.recv(1024))
 
-    result = json.loads(r.decode())
-    return result
+def convert_bytes(data, output="bytearray"):
+    """Converts a bytearray to another buffer type (or list of ints)
+
+    Args:
+        data (bytearray): bytes to convert
+        output (str, optional): one of "list", "bytes", "bytearray",
+            "memoryview" or "numpy" (default="bytearray")
+
+    Returns:
+        bytes of type specified by output
+    """
+    if output == "list":
+        return list(data)
+    elif output == "bytes":
+        return bytes(data)
+    elif output == "memoryview":
+        return memoryview(data)
+    elif output == "numpy":
+        return numpy.frombuffer(data, dtype=numpy.uint8)
+
+    return data
 
 
 def create_request(cmd, **kwargs):
@@ -63,3 +356,33 @@ def create_request(cmd, **kwargs):
         req["args"] = kwargs
 
     return req
+
+
+def match_session_name(session_name, potential_sessions):
+    """Matches the provided session_name (regex) to exactly one of the
+    potential (full) session names
+
+    Args:
+        session_name (str): session name to resolve (can be regex pattern)
+        potential_sessions (list): list of full session names
+
+    Returns:
+        str: full session name matched
+
+    Raises:
+        Exception: raised when no or multiple session names match
+    """
+    pattern = _PATTERN_CACHE.get(session_name)
+    if pattern is None:
+        if len(_PATTERN_CACHE) >= _PATTERN_CACHE_SIZE:
+            _PATTERN_CACHE.clear()
+        pattern = _PATTERN_CACHE[session_name] = re.compile(session_name)
+
+    matches = [sess for sess in potential_sessions if pattern.search(sess) is not None]
+
+    if len(matches) == 0:
+        raise Exception("Could not resolve session name: %s" % session_name)
+    elif len(matches) > 1:
+        raise Exception("Found multiple potential session names: %s" % str(matches))
+
+    return matches[0]
@@ -0,0 +1,366 @@
+"""Contains helpers for sampling device memory at a fixed rate
+
+See :py:meth:`dsclient.DebugSession.watch` (and
+:py:meth:`dsclient.aio.AsyncDebugSession.watch`). All watched addresses are
+read in each poll using as few requests as possible (nearby addresses are
+read together), the request messages are encoded once and reused, and polls
+are scheduled at fixed times so slow polls do not shift later samples.
+"""
+import math
+import time
+import struct
+import collections
+
+from dsclient import metrics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_INTERVAL = 0.01
+DEFAULT_SIZE = 4
+# Max number of unwatched bytes between addresses read in the same request
+MERGE_GAP = 64
+
+# Struct format of unsigned values by size (lower case for signed)
+_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+class WatchSample(
+    collections.namedtuple("WatchSample", ["timestamp", "latency", "values"])
+):
+    """Values of watched addresses read in one poll
+
+    Attributes:
+        timestamp (float): time (seconds since the epoch) halfway through the
+            poll
+        latency (float): seconds taken by the poll (round trip)
+        values (tuple): value of each watched address (int for sizes 1, 2, 4
+            and 8; bytes otherwise)
+    """
+
+    __slots__ = ()
+
+
+class WatchPlan(object):
+    """Requests covering the watched addresses and decoding of their values"""
+
+    def __init__(
+        self,
+        addresses,
+        size=DEFAULT_SIZE,
+        signed=False,
+        byteorder="little",
+        merge_gap=MERGE_GAP,
+    ):
+        """
+        Args:
+            addresses (list): addresses to watch; each an int (read size bytes)
+                or an (address, size) tuple
+            size (int, optional): default number of bytes per address
+                (default=4)
+            signed (boolean, optional): decode values as signed ints
+                (default = False)
+            byteorder (str, optional): "little" or "big" (default="little")
+            merge_gap (int, optional): max number of unwatched bytes between
+                addresses read in the same request (default=64)
+
+        Raises:
+            Exception: raised when no addresses are given or byteorder is invalid
+        """
+        if byteorder not in ("little", "big"):
+            raise Exception("Invalid byteorder: %s" % byteorder)
+
+        fields = list()
+        for entry in addresses:
+            if isinstance(entry, (tuple, list)):
+                address, num_bytes = entry
+            else:
+                address, num_bytes = entry, size
+            fields.append((address, num_bytes))
+        if len(fields) == 0:
+            raise Exception("No addresses to watch")
+
+        # Merge nearby addresses into regions (address, num_bytes)
+        regions = list()
+        for address, num_bytes in sorted(fields):
+            end = address + num_bytes
+            if len(regions) > 0 and address <= sum(regions[-1]) + merge_gap:
+                start = regions[-1][0]
+                regions[-1][1] = max(sum(regions[-1]), end) - start
+            else:
+                regions.append([address, num_bytes])
+
+        self.regions = [tuple(region) for region in regions]
+        self._offsets = list()
+        offset = 0
+        for _, num_bytes in self.regions:
+            self._offsets.append(offset)
+            offset += num_bytes
+        self.buffer = bytearray(offset)
+
+        prefix = "<" if byteorder == "little" else ">"
+        self._fields = list()
+        for address, num_bytes in fields:
+            for index, (start, length) in enumerate(self.regions):
+                if start <= address < start + length:
+                    break
+            position = self._offsets[index] + address - start
+            fmt = _FORMATS.get(num_bytes)
+            if fmt is not None:
+                fmt = struct.Struct(prefix + (fmt.lower() if signed else fmt))
+            self._fields.append((position, num_bytes, fmt))
+
+    def fill(self, index, data):
+        """Copies bytes read for a region into the (reused) buffer
+
+        Args:
+            index (int): index of region
+            data (bytes-like): bytes read
+        """
+        offset = self._offsets[index]
+        self.buffer[offset : offset + len(data)] = data
+
+    def decode(self):
+        """Returns the values of the watched addresses from the buffer
+
+        Returns:
+            tuple: value of each watched address (in order given)
+        """
+        buf = self.buffer
+        return tuple(
+            fmt.unpack_from(buf, position)[0]
+            if fmt is not None
+            else bytes(buf[position : position + num_bytes])
+            for position, num_bytes, fmt in self._fields
+        )
+
+
+class WatchStats(object):
+    """Latency and jitter statistics of a watch
+
+    Jitter is how late each poll started compared to its scheduled time.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = 0
+        self.missed = 0
+        self.latency = metrics.Histogram()
+        self._jitter_total = 0.0
+        self._jitter_squares = 0.0
+        self._jitter_max = 0.0
+        self._start = None
+        self._end = None
+
+    def add(self, start, latency, lateness):
+        """Records a poll
+
+        Args:
+            start (float): timer value when poll started
+            latency (float): seconds taken by poll
+            lateness (float): seconds poll started after its scheduled time
+        """
+        if self._start is None:
+            self._start = start
+        self._end = start
+        self.samples += 1
+        self.latency.add(latency)
+        self._jitter_total += lateness
+        self._jitter_squares += lateness * lateness
+        self._jitter_max = max(self._jitter_max, lateness)
+
+    def snapshot(self):
+        """Returns the statistics as a dict
+
+        Returns:
+            dict: number of 'samples', 'missed' polls (skipped because a poll
+            took longer than the interval), achieved 'rate' (samples per
+            second), 'latency' histogram (see
+            :py:meth:`dsclient.metrics.Histogram.snapshot`) and 'jitter'
+            (mean, rms and max seconds late)
+        """
+        rate = None
+        if self.samples > 1 and self._end > self._start:
+            rate = (self.samples - 1) / (self._end - self._start)
+        jitter = {"mean": None, "rms": None, "max": None}
+        if self.samples > 0:
+            jitter = {
+                "mean": self._jitter_total / self.samples,
+                "rms": math.sqrt(self._jitter_squares / self.samples),
+                "max": self._jitter_max,
+            }
+
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "missed": self.missed,
+            "rate": rate,
+            "latency": self.latency.snapshot(),
+            "jitter": jitter,
+        }
+
+
+class Schedule(object):
+    """Fixed rate schedule of polls (late polls do not delay later ones)"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.scheduled = None
+
+    def delay(self, now):
+        """Returns time to wait until the next poll
+
+        Polls that can no longer start on time are skipped.
+
+        Args:
+            now (float): current timer value
+
+        Returns:
+            (float, int): seconds to wait and number of polls skipped
+        """
+        if self.scheduled is None:
+            self.scheduled = now
+        missed = 0
+        if now >= self.scheduled + self.interval:
+            missed = int((now - self.scheduled) / self.interval)
+            self.scheduled += missed * self.interval
+
+        return (max(0.0, self.scheduled - now), missed)
+
+    def advance(self):
+        """Moves to the next scheduled poll"""
+        self.scheduled += self.interval
+
+
+class RingBuffer(object):
+    """Fixed size numpy buffer of the latest samples (e.g. for live plotting)"""
+
+    def __init__(self, capacity, width, dtype="float64"):
+        """
+        Args:
+            capacity (int): max number of samples kept
+            width (int): number of values per sample (watched addresses)
+            dtype (str or numpy.dtype, optional): type of values (default="float64")
+
+        Raises:
+            Exception: raised when numpy is not installed
+        """
+        if numpy is None:
+            raise Exception("RingBuffer requires numpy to be installed")
+
+        self.capacity = capacity
+        self.times = numpy.zeros(capacity, dtype="float64")
+        self.values = numpy.zeros((capacity, width), dtype=dtype)
+        self._index = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, values):
+        """Adds a sample (overwriting the oldest sample if full)
+
+        Args:
+            timestamp (float): time of sample
+            values (sequence): value of each watched address
+        """
+        self.times[self._index] = timestamp
+        self.values[self._index] = values
+        self._index = (self._index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def arrays(self):
+        """Returns samples in order (oldest first)
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): times (count,) and values
+            (count, width); copies when buffer has wrapped around
+        """
+        if self._count < self.capacity:
+            return (self.times[: self._count], self.values[: self._count])
+
+        order = numpy.r_[self._index : self.capacity, 0 : self._index]
+        return (self.times[order], self.values[order])
+
+
+class Watch(object):
+    """Iterator of samples of watched addresses (see
+    :py:meth:`dsclient.DebugSession.watch`)"""
+
+    def __init__(self, session, plan, interval, page=0, count=None, ring=None):
+        """
+        Args:
+            session (DebugSession): session to read memory with
+            plan (WatchPlan): regions to read and values to decode
+            interval (float): seconds between polls
+            page (int, optional): page in memory of addresses (default = 0)
+            count (int, optional): number of samples to take (default =
+                until stopped)
+            ring (RingBuffer, optional): buffer to append each sample to
+
+        Warning:
+            You should never instantiate this class directly. Instead call
+            :py:meth:`dsclient.DebugSession.watch`
+        """
+        self._session = session
+        self.plan = plan
+        self.page = page
+        self.count = count
+        self.ring = ring
+        self.stats = WatchStats(interval)
+        self._schedule = Schedule(interval)
+        self._requests = None
+        self._stopped = False
+
+    def __iter__(self):
+        return self
+
+    def stop(self):
+        """Ends iteration (after the current sample)"""
+        self._stopped = True
+
+    def __next__(self):
+        if self._stopped or (
+            self.count is not None and self.stats.samples >= self.count
+        ):
+            raise StopIteration
+
+        delay, missed = self._schedule.delay(metrics.timer())
+        self.stats.missed += missed
+        if delay > 0:
+            time.sleep(delay)
+
+        start = metrics.timer()
+        wall = time.time()
+        self._poll()
+        latency = metrics.timer() - start
+        self.stats.add(start, latency, max(0.0, start - self._schedule.scheduled))
+        self._schedule.advance()
+
+        sample = WatchSample(wall + latency / 2, latency, self.plan.decode())
+        if self.ring is not None:
+            self.ring.append(sample.timestamp, sample.values)
+
+        return sample
+
+    # Python 2
+    next = __next__
+
+    def _read_requests(self):
+        """Returns readData request of each region (built on first poll)"""
+        if self._requests is None:
+            self._requests = [
+                self._session._read_data_req(address, self.page, num_bytes, "bytearray")
+                for address, num_bytes in self.plan.regions
+            ]
+
+        return self._requests
+
+    def _poll(self):
+        """Reads all regions in one pipelined exchange"""
+        with self._session.pipeline() as p:
+            futures = [p.send(request) for request in self._read_requests()]
+        for index, future in enumerate(futures):
+            self.plan.fill(index, future.result())
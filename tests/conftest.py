@@ -1,33 +1,97 @@
-import os, shutil
+import os, sys, shutil
 import pytest
 import json
+import itertools
 from .utils import dss
+from .utils.fakeserver import FakeDebugServer
+from .utils.lease import DeviceLease
+from .utils.serverpool import ServerPool, DEFAULT_POOL_SIZE
 
 
 from dsclient import DebugServer, DebugSession
 
 SETUP_FILE = os.path.join(os.path.dirname(__file__), "setup.json")
 
+# asyncio client tests use syntax that does not compile before Python 3.5
+collect_ignore = ["test_aio.py"] if sys.version_info < (3, 5) else []
+
+# Name of pytest-xdist worker running tests ("master" when not distributed)
+WORKER = os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def pytest_configure(config):
+    # Registered here so the mark is known without pytest-xdist installed
+    config.addinivalue_line(
+        "markers", "xdist_group(name): run tests of group in the same xdist worker"
+    )
+    config.addinivalue_line(
+        "markers",
+        "unconfigured_server: use a DS server process whose config was never set",
+    )
+
+
 # parametrize tenv fixture with each test setup
 def pytest_generate_tests(metafunc):
-    with open(SETUP_FILE, "r") as f:
-        tsetup = json.load(f)
     if "tdevice" in metafunc.fixturenames:
-        tdevices = [tsetup[dev] for dev in tsetup["devices"]]
-        metafunc.parametrize("tdevice", tdevices, scope="class")
+        # Tests requiring a device are skipped until 'make configure' is run
+        tdevices = list()
+        if os.path.exists(SETUP_FILE):
+            with open(SETUP_FILE, "r") as f:
+                tsetup = json.load(f)
+            # Tests of a device are grouped on one worker ('--dist loadgroup')
+            tdevices = [
+                pytest.param(
+                    dict(tsetup[dev], name=dev),
+                    id=dev,
+                    marks=pytest.mark.xdist_group(dev),
+                )
+                for dev in tsetup["devices"]
+            ]
+        metafunc.parametrize("tdevice", tdevices, scope="class", indirect=True)
+
+
+def load_paths():
+    """Returns paths set in setup.json file; the workspace and tmp directories
+    are made unique per xdist worker"""
+    with open(SETUP_FILE, "r") as f:
+        paths = json.load(f)["paths"]
+
+    if WORKER != "master":
+        for key in ("workspace", "tmp"):
+            paths[key] = "%s-%s" % (paths[key], WORKER)
+
+    return paths
 
 
 @pytest.fixture(scope="class")
 def tenv(request):
     """Fixture for accessing paths set in setup.json file"""
-    with open(SETUP_FILE, "r") as f:
-        tsetup = json.load(f)
+    if not os.path.exists(SETUP_FILE):
+        pytest.skip("setup.json not found (run 'make configure')")
+
+    return load_paths()
+
 
-    return tsetup["paths"]
+@pytest.fixture(scope="class")
+def tdevice(request):
+    """Device entry of setup.json file; the device is leased for the duration
+    of the class so no other process (e.g. xdist worker) uses it at the same
+    time"""
+    lease = DeviceLease(request.param.get("serno") or request.param["name"])
+    timeout = os.environ.get("DSCLIENT_LEASE_TIMEOUT")
+    lease.acquire(timeout=float(timeout) if timeout else None)
+
+    request.addfinalizer(lease.release)
+
+    return request.param
 
 
 @pytest.fixture(autouse=True, scope="class")
-def test_env_setup(request, tenv):
+def test_env_setup(request):
+    if not os.path.exists(SETUP_FILE):
+        return
+
+    tenv = request.getfixturevalue("tenv")
     os.makedirs(tenv["tmp"])
 
     def teardown():
@@ -36,13 +100,42 @@ def test_env_setup(request, tenv):
     request.addfinalizer(teardown)
 
 
+@pytest.fixture(scope="session")
+def server_pool(request):
+    """Pool of warm DS server processes (size set by DSCLIENT_SERVER_POOL
+    environment variable; set DSCLIENT_SERVER_POOL_KEEP_CONFIG=0 to replace
+    processes whose config was set instead of reusing them)"""
+    if not os.path.exists(SETUP_FILE):
+        pytest.skip("setup.json not found (run 'make configure')")
+
+    paths = load_paths()
+    workspaces = itertools.count()
+
+    def launch():
+        # Each CCS process needs its own (eclipse) workspace
+        workspace = "%s-%d" % (paths["workspace"], next(workspaces))
+        return dss.launch_server(paths["ccs"], workspace)
+
+    pool = ServerPool(
+        launch,
+        size=int(os.environ.get("DSCLIENT_SERVER_POOL", DEFAULT_POOL_SIZE)),
+        keep_config=os.environ.get("DSCLIENT_SERVER_POOL_KEEP_CONFIG") != "0",
+    )
+
+    request.addfinalizer(pool.close)
+
+    return pool
+
+
 @pytest.fixture(scope="function")
-def pid_and_port(request, tenv):
-    """Launches DS server and returns process handle and port number"""
-    p, port = dss.launch_server(tenv["ccs"], tenv["workspace"])
+def pid_and_port(request, tenv, server_pool):
+    """Returns process handle and port number of a DS server from the pool
+    (never configured if the test is marked unconfigured_server)"""
+    configured = request.node.get_closest_marker("unconfigured_server") is None
+    p, port = server_pool.acquire(configured=configured)
 
     def teardown():
-        p.terminate()
+        server_pool.release(p, port)
 
     request.addfinalizer(teardown)
 
@@ -50,13 +143,14 @@ def pid_and_port(request, tenv):
 
 
 @pytest.fixture(scope="function")
-def debug_server(request, tenv):
+def debug_server(request, pid_and_port):
     """An instantiated DebugServer object"""
-    p, port = dss.launch_server(tenv["ccs"], tenv["workspace"])
+    p, port = pid_and_port
     DS = DebugServer(port=port)
 
     def teardown():
-        p.terminate()
+        # Close connection so the server can be reset by the pool
+        DS._close()
 
     request.addfinalizer(teardown)
 
@@ -77,3 +171,44 @@ def debug_session(request, debug_server, tenv, tdevice):
     request.addfinalizer(teardown)
 
     return ds
+
+
+@pytest.fixture(scope="function")
+def fake_server(request):
+    """A running FakeDebugServer (no CCS or device required)"""
+    fake = FakeDebugServer().start()
+
+    request.addfinalizer(fake.stop)
+
+    return fake
+
+
+@pytest.fixture(scope="function")
+def fake_ccxml(request, tmpdir):
+    """Path to a (dummy) ccxml file accepted by FakeDebugServer"""
+    path = tmpdir.join("fake.ccxml")
+    path.write("<configurations/>\n")
+
+    return str(path)
+
+
+@pytest.fixture(scope="function")
+def fake_debug_server(request, fake_server, fake_ccxml):
+    """An instantiated DebugServer object connected to a FakeDebugServer"""
+    DS = DebugServer(port=fake_server.port)
+    DS.set_config(fake_ccxml)
+
+    return DS
+
+
+@pytest.fixture(scope="function")
+def fake_debug_session(request, fake_debug_server, fake_server):
+    """An instantiated DebugSession object connected to a FakeDebugServer"""
+    ds = fake_debug_server.open_session(fake_server.cpus[0])
+
+    def teardown():
+        ds.stop()
+
+    request.addfinalizer(teardown)
+
+    return ds
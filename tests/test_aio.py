@@ -0,0 +1,287 @@
+import sys
+import pytest
+
+if sys.version_info < (3, 5):
+    pytest.skip("asyncio client requires Python 3.5+", allow_module_level=True)
+
+import asyncio
+from dsclient import ConnectionException, RetryPolicy, TimeoutException
+from dsclient.aio import AsyncDebugServer, AsyncDebugSession
+
+
+def run(coro):
+    """Runs coroutine to completion on the event loop"""
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+@pytest.fixture(scope="function")
+def async_debug_server(request, pid_and_port):
+    """An instantiated AsyncDebugServer object"""
+    p, port = pid_and_port
+    return run(AsyncDebugServer.create(port=port))
+
+
+@pytest.fixture(scope="function")
+def async_debug_session(request, async_debug_server, tdevice):
+    """An instantiated AsyncDebugSession object"""
+    run(async_debug_server.set_config(tdevice["ccxml-path"]))
+    ds = run(async_debug_server.open_session(tdevice["session"]))
+
+    def teardown():
+        run(ds.stop())
+
+    request.addfinalizer(teardown)
+
+    return ds
+
+
+class TestAsyncDebugServer(object):
+    def test_get_config_after_set(self, async_debug_server, tdevice):
+        """Tests setting ccxml config file of AsyncDebugServer object"""
+        run(async_debug_server.set_config(tdevice["ccxml-path"]))
+        assert run(async_debug_server.get_config()) == tdevice["ccxml-path"]
+
+    def test_open_session(self, async_debug_server, tdevice):
+        """Tests opening an AsyncDebugSession"""
+        session_name = tdevice["session"]
+        run(async_debug_server.set_config(tdevice["ccxml-path"]))
+
+        debug_session = run(async_debug_server.open_session(session_name))
+        assert type(debug_session) == AsyncDebugSession
+        assert run(async_debug_server.get_session(session_name)) is debug_session
+
+    def test_terminate_session(self, async_debug_server, tdevice):
+        """Tests terminating an AsyncDebugSession"""
+        session_name = tdevice["session"]
+        run(async_debug_server.set_config(tdevice["ccxml-path"]))
+
+        run(async_debug_server.open_session(session_name))
+        run(async_debug_server.terminate_session(session_name))
+
+        assert session_name not in run(async_debug_server.get_list_of_sessions())
+
+
+class TestAsyncDebugSession(object):
+    def test_read_data(self, async_debug_session, tdevice):
+        """Tests reading data from device's memory"""
+        run(async_debug_session.connect())
+
+        result = run(
+            async_debug_session.read_data(
+                page=0, address=int(tdevice["address"], 16), num_bytes=4
+            )
+        )
+
+        assert type(result) == list
+        assert len(result) == 4
+
+    def test_concurrent_read_register(self, async_debug_session):
+        """Tests concurrent requests on the same session"""
+        run(async_debug_session.connect())
+
+        results = run(
+            asyncio.gather(
+                *[async_debug_session.read_register("PC") for _ in range(10)]
+            )
+        )
+
+        assert all(type(r) == int for r in results)
+
+    def test_fail_read_register(self, async_debug_session):
+        """Tests fails when reading value of invalid register"""
+        run(async_debug_session.connect())
+
+        with pytest.raises(Exception):
+            run(async_debug_session.read_register("INVALIDREG"))
+
+
+class TestAsyncFakeDebugServer(object):
+    def test_concurrent_sessions(self, fake_server, fake_ccxml):
+        """Tests driving multiple sessions from one event loop"""
+
+        async def flash(server, name):
+            session = await server.open_session(name)
+            await session.connect()
+            await session.write_data(b"\x01\x02", 0x100)
+            return await session.read_data(0x100, num_bytes=2, output="bytes")
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            return await asyncio.gather(
+                *[flash(server, name) for name in fake_server.cpus]
+            )
+
+        assert run(main()) == [b"\x01\x02"] * len(fake_server.cpus)
+
+    def test_run_nowait(self, fake_server, fake_ccxml):
+        """Tests waiting for targets of multiple sessions to halt"""
+        fake_server.latency["run"] = 0.2
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            sessions = [await server.open_session(n) for n in fake_server.cpus]
+            for session in sessions:
+                await session.connect()
+            tasks = [session.run_nowait() for session in sessions]
+            done, pending = await asyncio.wait(tasks, timeout=5)
+            return len(done), len(pending)
+
+        assert run(main()) == (len(fake_server.cpus), 0)
+
+    def test_watch(self, fake_server, fake_ccxml):
+        """Tests sampling memory with an async iterator"""
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+            await session.write_data(b"\x2a\x00", 0x100)
+            w = session.watch([(0x100, 2)], interval=0.01, count=3)
+            return [sample.values async for sample in w], w.stats.samples
+
+        assert run(main()) == ([(42,)] * 3, 3)
+
+    def test_watch_pipelined(self, fake_server, fake_ccxml):
+        """Tests each poll writes the requests of all regions before reading
+        any response"""
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+
+            events = list()
+            write, readline = session._writer.write, session._reader.readline
+
+            def logged_write(msg):
+                events.append("write")
+                write(msg)
+
+            async def logged_readline():
+                events.append("read")
+                return await readline()
+
+            session._writer.write = logged_write
+            session._reader.readline = logged_readline
+            w = session.watch([0x100, 0x1000, 0x2000], interval=0.01, count=2)
+            samples = [sample.values async for sample in w]
+            return samples, events
+
+        samples, events = run(main())
+        assert samples == [(0, 0, 0)] * 2
+        assert events == ["write", "read", "read", "read"] * 2
+
+    def test_timeout(self, fake_server, fake_ccxml):
+        """Tests a slow response raises TimeoutException and the next request
+        uses a new connection"""
+        fake_server.latency["readRegister"] = 0.5
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+            await session.write_register("R0", 7)
+            session.set_timeout(0.1, command="readRegister")
+            with pytest.raises(TimeoutException) as e:
+                await session.read_register("R0")
+            assert e.value.command == "readRegister"
+            assert not session.is_connected()
+
+            fake_server.latency["readRegister"] = 0.0
+            return await session.read_register("R0")
+
+        assert run(main()) == 7
+
+    def test_cancel(self, fake_server, fake_ccxml):
+        """Tests cancelling a request does not return its late response for
+        the next request"""
+        fake_server.latency["readRegister"] = 0.3
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+            task = asyncio.ensure_future(session.read_register("PC"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            fake_server.latency["readRegister"] = 0.0
+            await session.write_register("R0", 5)
+            return await session.read_register("R0")
+
+        assert run(main()) == 5
+
+    def test_retry_idempotent(self, fake_server, fake_ccxml):
+        """Tests read only commands are retried after reconnecting"""
+        fake_server.inject_disconnect("readRegister", count=2)
+
+        async def main():
+            server = await AsyncDebugServer.create(
+                port=fake_server.port, retry=RetryPolicy(backoff=0.01)
+            )
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+            return await session.read_register("PC")
+
+        assert run(main()) == 0
+        assert fake_server.request_counts["readRegister"] == 3
+
+    def test_fail_connection_lost(self, fake_server, fake_ccxml):
+        """Tests a lost connection raises ConnectionException when requests
+        are not retried"""
+        fake_server.inject_disconnect("readRegister")
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            session = await server.open_session(fake_server.cpus[0])
+            await session.connect()
+            with pytest.raises(ConnectionException):
+                await session.read_register("PC")
+            return await session.read_register("PC")
+
+        assert run(main()) == 0
+
+    def test_existing_sessions_lazy(self, fake_server, fake_ccxml):
+        """Tests handles to already open sessions connect when first used"""
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            for name in fake_server.cpus:
+                await (await server.open_session(name)).connect()
+
+            other = await AsyncDebugServer.create(port=fake_server.port)
+            sessions = await other.get_list_of_sessions()
+            connected = [s.is_connected() for s in sessions.values()]
+            session = await other.get_session(fake_server.cpus[0])
+            return connected, await session.read_register("PC")
+
+        connected, value = run(main())
+        assert connected == [False] * len(fake_server.cpus)
+        assert value == 0
+
+    def test_session_name_cache(self, fake_server, fake_ccxml):
+        """Tests session names are resolved without fetching the CPU list
+        again"""
+
+        async def main():
+            server = await AsyncDebugServer.create(port=fake_server.port)
+            await server.set_config(fake_ccxml)
+            await server.open_session(fake_server.cpus[0])
+            for _ in range(3):
+                await server.get_session(fake_server.cpus[0])
+            return server.get_session_name_cache_info()
+
+        info = run(main())
+        assert info["cpu_list_fetches"] == 1
+        assert info["hits"] == 3
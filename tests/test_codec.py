@@ -0,0 +1,84 @@
+"""Tests JSON codecs (no CCS or device required)"""
+import json
+import pytest
+from dsclient import DebugServer
+from dsclient import codec
+from dsclient.utils import create_request, decode_byte_response, encode_byte_request
+
+CODECS = codec.available_codecs()
+
+
+@pytest.mark.parametrize("name", CODECS)
+class TestCodec(object):
+    def test_encode_decode(self, name):
+        """Tests requests are encoded as newline terminated JSON messages"""
+        c = codec.get_codec(name)
+        req = create_request("readData", address=0x100, page=0, numBytes=4)
+        msg = c.encode_request(req)
+
+        assert msg.endswith(b"\n")
+        assert json.loads(msg.decode()) == req
+        assert c.decode_response(msg.rstrip(b"\n")) == req
+
+    def test_encode_byte_request(self, name):
+        """Tests encoding a request with a bytes argument"""
+        msg = encode_byte_request(
+            "writeData", "data", b"\x00\x7f\xff", codec=name, address=0x100, page=0
+        )
+
+        assert json.loads(msg.decode()) == {
+            "name": "writeData",
+            "args": {"address": 0x100, "page": 0, "data": [0, 127, 255]},
+        }
+
+    @pytest.mark.parametrize("output", ["bytes", "bytearray", "memoryview"])
+    def test_decode_byte_response(self, name, output):
+        """Tests decoding a list of bytes response into a buffer"""
+        data = list(range(256)) * 10
+        msg = json.dumps({"status": "OK", "data": data}).encode()
+
+        resp = decode_byte_response(msg, output=output, codec=name)
+
+        assert resp["status"] == "OK"
+        assert bytearray(resp["data"]) == bytearray(data)
+
+    def test_decode_byte_response_without_data(self, name):
+        """Tests decoding an error response"""
+        msg = b'{"status": "FAIL", "message": "data"}'
+
+        assert decode_byte_response(msg, codec=name) == json.loads(msg.decode())
+
+    def test_session_codec(self, name, fake_server, fake_ccxml):
+        """Tests codec is used by DebugServer and the sessions it opens"""
+        DS = DebugServer(port=fake_server.port, codec=name)
+        DS.set_config(fake_ccxml)
+        session = DS.open_session(fake_server.cpus[0])
+        session.connect()
+        session.write_data(b"\x01\x02\x03", 0x1000)
+
+        assert DS.get_codec().name == name
+        assert session.get_codec().name == name
+        assert session.read_data(0x1000, num_bytes=3) == [1, 2, 3]
+        assert session.read_data(0x1000, num_bytes=3, output="bytes") == b"\x01\x02\x03"
+
+
+def test_default_codec():
+    """Tests fastest installed codec is used by default"""
+    assert codec.get_codec().name == CODECS[0]
+    assert CODECS[-1] == "json"
+
+
+def test_set_codec(fake_server):
+    """Tests changing the codec of a connection"""
+    DS = DebugServer(port=fake_server.port, codec="json")
+    assert DS.get_codec().name == "json"
+
+    DS.set_codec(CODECS[0])
+    assert DS.get_codec().name == CODECS[0]
+    assert DS.get_list_of_sessions() == dict()
+
+
+def test_fail_invalid_codec():
+    """Tests fails when codec is unknown"""
+    with pytest.raises(Exception):
+        codec.get_codec("yaml")
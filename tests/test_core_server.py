@@ -10,10 +10,36 @@ class Test_DebugServer:
         p, port = pid_and_port
         DS = DebugServer(port=port)
 
+    def test_DebugServer_existing_sessions_are_lazy(self, debug_server, tdevice):
+        """Tests handles to already open sessions connect on first use"""
+        session_name = tdevice["session"]
+        debug_server.set_config(tdevice["ccxml-path"])
+        debug_server.open_session(session_name)
+
+        DS = DebugServer(port=debug_server._port)
+        session = DS.get_session(session_name)
+        assert not session.is_connected()
+
+        session.connect()
+        assert session.is_connected()
+
+    def test_DebugServer_without_listing_sessions(self, debug_server, tdevice):
+        """Tests attaching to a DebugServer without listing open sessions"""
+        session_name = tdevice["session"]
+        debug_server.set_config(tdevice["ccxml-path"])
+        debug_server.open_session(session_name)
+
+        DS = DebugServer(port=debug_server._port, list_sessions=False)
+        assert len(DS._sessions) == 0
+
+        assert type(DS.get_session(session_name)) == DebugSession
+        assert session_name in list(DS.get_list_of_sessions().keys())
+
     def test_set_config(self, debug_server, tdevice):
         """Tests setting ccxml config file of DebugServer object"""
         debug_server.set_config(tdevice["ccxml-path"])
 
+    @pytest.mark.unconfigured_server
     def test_get_config_no_set(self, debug_server):
         """Tests setting ccxml config file of DebugServer object"""
         assert debug_server.get_config() is None
@@ -127,6 +153,32 @@ class Test_DebugServer:
         debug_session = debug_server.open_session(session_regex)
         assert debug_server.get_session(session_regex) == debug_session
 
+    def test_get_session_uses_session_name_cache(self, debug_server, tdevice):
+        """Tests repeated session lookups do not fetch the list of CPUs again"""
+        session_name = tdevice["session"]
+        session_regex = ".*" + session_name + ".*"
+        debug_server.set_config(tdevice["ccxml-path"])
+
+        debug_session = debug_server.open_session(session_regex)
+        for _ in range(10):
+            assert debug_server.get_session(session_regex) is debug_session
+
+        info = debug_server.get_session_name_cache_info()
+        assert info["cpu_list_fetches"] == 1
+        assert info["misses"] == 1
+        assert info["hits"] == 10
+
+    def test_set_config_invalidates_session_name_cache(self, debug_server, tdevice):
+        """Tests setting config clears the cached list of CPUs"""
+        session_name = tdevice["session"]
+        debug_server.set_config(tdevice["ccxml-path"])
+        debug_server.open_session(".*" + session_name + ".*")
+
+        debug_server.set_config(tdevice["ccxml-path"])
+        debug_server.get_session(".*" + session_name + ".*")
+
+        assert debug_server.get_session_name_cache_info()["cpu_list_fetches"] == 2
+
     def test_fail_get_unopen_session(self, debug_server, tdevice):
         """Tests fails when trying to get unopen session"""
         session_name = tdevice["session"]
@@ -178,6 +230,65 @@ class Test_DebugServer:
         debug_session = debug_server.open_session(session_name)
         debug_server.terminate_session(session_name)
 
+    def test_flash_sessions(self, debug_server, tdevice):
+        """Tests flashing multiple sessions in parallel"""
+        session_name = tdevice["session"]
+        debug_server.set_config(tdevice["ccxml-path"])
+
+        results = debug_server.flash_sessions([session_name], tdevice["hex-image"])
+
+        assert list(results.keys()) == [session_name]
+        assert results[session_name].ok
+        assert list(results[session_name].timings.keys()) == [
+            "connect",
+            "erase",
+            "load",
+            "verify",
+        ]
+        assert session_name in list(debug_server._sessions.keys())
+
+    def test_flash_sessions_records_errors(self, debug_server, tdevice):
+        """Tests failed steps are recorded in the result instead of raised"""
+        session_name = tdevice["session"]
+        debug_server.set_config(tdevice["ccxml-path"])
+
+        results = debug_server.flash_sessions(
+            [session_name], "/path/to/nonexistent.hex", erase=False
+        )
+
+        assert not results[session_name].ok
+        assert "load" in results[session_name].timings
+        assert "verify" not in results[session_name].timings
+
+    def test_fail_flash_sessions_unresolved_name(self, debug_server, tdevice):
+        """Tests fails when a session name can not be resolved"""
+        debug_server.set_config(tdevice["ccxml-path"])
+
+        with pytest.raises(Exception):
+            debug_server.flash_sessions(["NotASessionName"], tdevice["hex-image"])
+
+    def test_metrics(self, debug_server, tdevice):
+        """Tests recording metrics of DebugServer and its sessions"""
+        session_name = tdevice["session"]
+        events = list()
+        debug_server.enable_metrics(callback=events.append)
+
+        debug_server.set_config(tdevice["ccxml-path"])
+        debug_session = debug_server.open_session(session_name)
+        debug_session.connect()
+
+        snapshot = debug_server.get_metrics(include_sessions=True)
+        assert snapshot["commands"]["setConfig"]["count"] == 1
+        assert snapshot["sessions"][session_name]["commands"]["connect"]["count"] == 1
+        assert events[-1]["name"] == session_name
+        assert events[-1]["command"] == "connect"
+
+    def test_metrics_disabled(self, debug_server):
+        """Tests metrics are not recorded unless enabled"""
+        debug_server.get_config()
+
+        assert debug_server.get_metrics() is None
+
     def test_attach_ccs(self, debug_server, tdevice):
         """Tests terminating a DebugSession"""
         session_name = tdevice["session"]
@@ -1,3 +1,4 @@
+import io
 import os
 import pytest
 from dsclient import DebugServer, DebugSession
@@ -138,6 +139,20 @@ class TestDebugSession(object):
         assert type(result) == list
         assert len(result) == 4
 
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    @pytest.mark.parametrize("output", ["bytes", "bytearray", "memoryview"])
+    def test_read_data_as_buffer(self, debug_session, tdevice, output):
+        """Tests reading data from device's memory into a byte buffer"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+
+        expected = debug_session.read_data(page=0, address=address, num_bytes=16)
+        result = debug_session.read_data(
+            page=0, address=address, num_bytes=16, output=output
+        )
+
+        assert bytearray(result) == bytearray(expected)
+
     @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
     def test_fail_read_data_invalid_address(self, debug_session):
         """Tests fails when reading data from invalid address in device's memory"""
@@ -155,6 +170,18 @@ class TestDebugSession(object):
             data=[0xFF, 0xFF], page=0, address=int(tdevice["address"], 16)
         )
 
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_write_data_from_buffer(self, debug_session, tdevice):
+        """Tests writing a byte buffer to device's memory"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+
+        debug_session.write_data(data=b"\xde\xad", page=0, address=address)
+
+        assert debug_session.read_data(
+            page=0, address=address, num_bytes=2, output="bytes"
+        ) == bytes(bytearray([0xDE, 0xAD]))
+
     @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
     def test_fail_write_data_invalid_address(self, debug_session):
         """Tests fails when reading data from invalid address in device's memory"""
@@ -163,6 +190,95 @@ class TestDebugSession(object):
         with pytest.raises(Exception):
             debug_session.write_data(data=[0xFF, 0xFF], page=0, address=0x10000000)
 
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_read_memory_region(self, debug_session, tdevice):
+        """Tests reading a region of memory in chunks"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+        progress = list()
+
+        result = debug_session.read_memory_region(
+            address,
+            64,
+            chunk_size=16,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+
+        assert type(result) == bytearray
+        assert result == bytearray(
+            debug_session.read_data(page=0, address=address, num_bytes=64)
+        )
+        assert progress == [(16, 64), (32, 64), (48, 64), (64, 64)]
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_read_memory_region_into_buffer(self, debug_session, tdevice):
+        """Tests reading a region of memory into a preallocated buffer"""
+        debug_session.connect()
+        buf = bytearray(32)
+
+        result = debug_session.read_memory_region(
+            int(tdevice["address"], 16), 32, chunk_size=10, into=buf
+        )
+
+        assert result is buf
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_write_memory_region(self, debug_session, tdevice):
+        """Tests writing a region of memory in chunks"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+        data = bytearray(range(48))
+
+        debug_session.write_memory_region(data, address, chunk_size=16)
+
+        assert debug_session.read_memory_region(address, 48) == data
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_dump_memory_to_path(self, debug_session, tdevice, tenv):
+        """Tests dumping a region of memory to a file path"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+        path = os.path.join(tenv["tmp"], "dump.bin")
+
+        written = debug_session.dump_memory(address, 64, path, chunk_size=16)
+
+        assert written == 64
+        with open(path, "rb") as f:
+            assert bytearray(f.read()) == debug_session.read_memory_region(address, 64)
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_dump_memory_to_file_object(self, debug_session, tdevice):
+        """Tests dumping a region of memory to a file object"""
+        debug_session.connect()
+        f = io.BytesIO()
+
+        debug_session.dump_memory(int(tdevice["address"], 16), 64, f, chunk_size=16)
+
+        assert len(f.getvalue()) == 64
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_dump_memory_mmap(self, debug_session, tdevice, tenv):
+        """Tests dumping a region of memory to a memory mapped file"""
+        debug_session.connect()
+        address = int(tdevice["address"], 16)
+        path = os.path.join(tenv["tmp"], "dump_mmap.bin")
+
+        mm = debug_session.dump_memory(address, 64, path, use_mmap=True)
+
+        assert bytearray(mm[:]) == debug_session.read_memory_region(address, 64)
+        mm.close()
+        assert os.path.getsize(path) == 64
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_fail_read_memory_region_small_buffer(self, debug_session, tdevice):
+        """Tests fails when reading into a buffer that is too small"""
+        debug_session.connect()
+
+        with pytest.raises(Exception):
+            debug_session.read_memory_region(
+                int(tdevice["address"], 16), 32, into=bytearray(16)
+            )
+
     @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
     def test_read_register(self, debug_session):
         """Tests reading register value of device"""
@@ -289,3 +405,39 @@ class TestDebugSession(object):
         debug_session.run(asynchronous=True)
 
         debug_session.halt(wait=True)
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_pipeline_read_register(self, debug_session):
+        """Tests reading register values through a pipeline"""
+        debug_session.connect()
+
+        with debug_session.pipeline(window=8) as p:
+            futures = [p.send_req("readRegister", name="PC") for _ in range(20)]
+
+        assert all(f.done() for f in futures)
+        assert all(type(f.result()) == int for f in futures)
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_pipeline_failed_request(self, debug_session):
+        """Tests a failed pipelined request does not affect other requests"""
+        debug_session.connect()
+
+        with debug_session.pipeline() as p:
+            bad = p.send_req("readRegister", name="INVALIDREG")
+            good = p.send_req("readRegister", name="PC")
+
+        with pytest.raises(Exception):
+            bad.result()
+        assert type(good.result()) == int
+
+    @pytest.mark.dependency(depends=["TestDebugSession::test_connect"])
+    def test_send_req_after_pipeline(self, debug_session):
+        """Tests single requests still work while pipelined requests are in-flight"""
+        debug_session.connect()
+
+        p = debug_session.pipeline()
+        future = p.send_req("readRegister", name="PC")
+        p.flush()
+
+        assert type(debug_session.read_register("PC")) == int
+        assert future.done()
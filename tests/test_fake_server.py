@@ -0,0 +1,781 @@
+"""Tests DebugServer and DebugSession against a FakeDebugServer (no CCS or
+device required)"""
+import io
+import os
+import time
+import pytest
+from dsclient import (
+    ALL_HALTED,
+    FIRST_HALTED,
+    wait_for_halt,
+    BatchException,
+    ConnectionException,
+    DebugServer,
+    DebugSession,
+    RetryPolicy,
+    TimeoutException,
+)
+from dsclient.image import ImageCache
+from .utils.fakeserver import FakeDebugServer
+
+
+class TestFakeDebugServer(object):
+    def test_open_session(self, fake_debug_server, fake_server):
+        """Tests opening a session using a regex session name"""
+        debug_session = fake_debug_server.open_session("Cortex_M3_0$")
+
+        assert type(debug_session) == DebugSession
+        assert fake_server.cpus[0] in fake_debug_server.get_list_of_sessions()
+
+    def test_fail_open_session_without_config(self, fake_server):
+        """Tests fails to open a session before setting config"""
+        DS = DebugServer(port=fake_server.port)
+
+        with pytest.raises(Exception):
+            DS.open_session("Cortex_M3_0")
+
+    def test_terminate_session(self, fake_debug_server, fake_server):
+        """Tests terminating a session"""
+        name = fake_server.cpus[0]
+        fake_debug_server.open_session(name)
+        fake_debug_server.terminate_session(name)
+
+        assert name not in fake_server.sessions
+
+    def test_create_config(self, fake_debug_server, tmpdir):
+        """Tests creating a ccxml file"""
+        resp = fake_debug_server.create_config(
+            "NEW.ccxml", connection="XDS110", device="CC1310F128", directory=str(tmpdir)
+        )
+
+        assert resp["name"] == "NEW.ccxml"
+        assert os.path.exists(os.path.join(str(tmpdir), "NEW.ccxml"))
+
+    def test_existing_sessions_are_lazy(self, fake_debug_server, fake_server):
+        """Tests handles to already open sessions connect on first use"""
+        name = fake_server.cpus[0]
+        fake_debug_server.open_session(name)
+
+        DS = DebugServer(port=fake_server.port)
+        session = DS.get_session(name)
+        assert not session.is_connected()
+
+        session.connect()
+        assert session.is_connected()
+
+    def test_fail_open_session_opened_elsewhere(self, fake_debug_server, fake_server):
+        """Tests opening a session already opened by another client fails
+        without sending openSession when sessions were not listed yet"""
+        name = fake_server.cpus[0]
+        fake_debug_server.open_session(name)
+
+        DS = DebugServer(port=fake_server.port, list_sessions=False)
+        with pytest.raises(Exception, match="already open"):
+            DS.open_session(name)
+
+        assert fake_server.request_counts["openSession"] == 1
+        assert DS.get_session(name) is not None
+
+    def test_session_name_cache(self, fake_debug_server, fake_server):
+        """Tests repeated lookups do not request the list of CPUs again"""
+        session = fake_debug_server.open_session("Cortex_M3_0$")
+        for _ in range(10):
+            assert fake_debug_server.get_session("Cortex_M3_0$") is session
+
+        assert fake_server.request_counts["getListOfCPUs"] == 1
+
+    def test_flash_sessions(self, fake_debug_server, fake_server, tmpdir):
+        """Tests flashing multiple sessions in parallel"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(b"\x01\x02\x03\x04")
+
+        results = fake_debug_server.flash_sessions(
+            ["Cortex_M3_0", "Cortex_M3_1"], str(image), binary=True
+        )
+
+        assert [r.ok for r in results.values()] == [True, True]
+        for name in fake_server.cpus:
+            memory = fake_server.sessions[name].memory[0]
+            assert memory.read(0, 4) == b"\x01\x02\x03\x04"
+
+    def test_flash_sessions_latency_is_parallel(
+        self, fake_debug_server, fake_server, tmpdir
+    ):
+        """Tests flashing time depends on the slowest session, not the sum"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(b"\x00")
+        fake_server.latency["load"] = 0.5
+
+        results = fake_debug_server.flash_sessions(
+            ["Cortex_M3_0", "Cortex_M3_1"], str(image), binary=True, verify=False
+        )
+
+        assert all(r.ok for r in results.values())
+        assert max(r.elapsed for r in results.values()) < 0.9
+
+    def test_wait_for_halt(self, fake_debug_server, fake_server):
+        """Tests waiting for targets of many sessions to halt at once"""
+        sessions = [fake_debug_server.open_session(name) for name in fake_server.cpus]
+        for session in sessions:
+            session.connect()
+        fake_server.latency["run"] = 0.4
+
+        start = time.time()
+        futures = [session.run_nowait() for session in sessions]
+        done, pending = wait_for_halt(futures, timeout=0.1)
+        assert (len(done), len(pending)) == (0, 2)
+
+        done, pending = wait_for_halt(futures, timeout=5, return_when=FIRST_HALTED)
+        assert len(done) >= 1
+        done, pending = wait_for_halt(futures, timeout=5, return_when=ALL_HALTED)
+        assert (len(done), len(pending)) == (2, 0)
+        assert time.time() - start < 0.75
+        assert not any(session._running for session in sessions)
+
+    def test_metrics(self, fake_debug_server, fake_server):
+        """Tests recording metrics of DebugServer and its sessions"""
+        name = fake_server.cpus[0]
+        fake_debug_server.enable_metrics()
+        session = fake_debug_server.open_session(name)
+        session.connect()
+
+        snapshot = fake_debug_server.get_metrics(include_sessions=True)
+        assert snapshot["commands"]["openSession"]["count"] == 1
+        assert snapshot["sessions"][name]["commands"]["connect"]["count"] == 1
+
+
+class TestFakeDebugSession(object):
+    def test_fail_when_not_connected(self, fake_debug_session):
+        """Tests fails when device is not connected"""
+        with pytest.raises(Exception):
+            fake_debug_session.read_register("PC")
+
+    def test_read_write_register(self, fake_debug_session):
+        """Tests writing then reading a register"""
+        fake_debug_session.connect()
+        fake_debug_session.write_register("R1", 0xBEEF)
+
+        assert fake_debug_session.read_register("R1") == 0xBEEF
+
+    def test_register_cache(self, fake_debug_session, fake_server):
+        """Tests repeat register reads are served from the cache until
+        invalidated"""
+        fake_debug_session.connect()
+        fake_debug_session.enable_register_cache()
+        fake_debug_session.write_register("R0", 5)
+
+        for _ in range(5):
+            assert fake_debug_session.read_register("R0") == 5
+            assert fake_debug_session.read_register("R1") == 0
+        assert fake_server.request_counts["readRegister"] == 1
+
+        fake_server.sessions[fake_server.cpus[0]].registers["R0"] = 6
+        fake_debug_session.run()
+        assert fake_debug_session.read_register("R0") == 6
+        assert fake_server.request_counts["readRegister"] == 2
+
+        fake_debug_session.run(asynchronous=True)
+        fake_debug_session.read_register("R0")
+        fake_debug_session.read_register("R0")
+        assert fake_server.request_counts["readRegister"] == 4
+
+    def test_register_cache_failed_run(self, fake_debug_session, fake_server):
+        """Tests a failed run does not mark the target as running"""
+        fake_debug_session.connect()
+        fake_debug_session.enable_register_cache()
+        fake_server.inject_failure("run")
+
+        with pytest.raises(Exception):
+            fake_debug_session.run(asynchronous=True)
+        fake_debug_session.read_register("R0")
+        fake_debug_session.read_register("R0")
+        assert fake_server.request_counts["readRegister"] == 1
+
+    def test_register_cache_reconnect(self, fake_debug_session, fake_server):
+        """Tests cached values are cleared when the connection is lost"""
+        fake_debug_session.connect()
+        fake_debug_session.enable_register_cache()
+        assert fake_debug_session.read_register("R0") == 0
+
+        fake_server.sessions[fake_server.cpus[0]].registers["R0"] = 6
+        fake_server.inject_disconnect("getOption")
+        with pytest.raises(ConnectionException):
+            fake_debug_session.get_option("ResetOnRestart")
+        assert fake_debug_session.read_register("R0") == 6
+
+    def test_read_registers(self, fake_debug_session, fake_server):
+        """Tests reading many registers in one pipelined exchange"""
+        fake_debug_session.connect()
+        fake_debug_session.enable_register_cache()
+        for i in range(4):
+            fake_debug_session.write_register("R%d" % i, i)
+
+        values = fake_debug_session.read_registers(["R3", "PC", "R1", "R0", "R2"])
+
+        assert list(values.items()) == [
+            ("R3", 3),
+            ("PC", 0),
+            ("R1", 1),
+            ("R0", 0),
+            ("R2", 2),
+        ]
+        assert fake_server.request_counts["readRegister"] == 1
+        with pytest.raises(Exception):
+            fake_debug_session.read_registers(["PC", "INVALIDREG"])
+
+    def test_run_nowait(self, fake_debug_session, fake_server):
+        """Tests polling and waiting on a run until the target halts"""
+        fake_debug_session.connect()
+        fake_server.latency["run"] = 0.3
+
+        future = fake_debug_session.run_nowait()
+
+        assert not future.done()
+        with pytest.raises(TimeoutException):
+            future.result(timeout=0.05)
+        assert future.wait(timeout=5)
+        assert future.done()
+        assert future.result() is None
+
+    def test_run_nowait_connection_lost(self, fake_debug_session, fake_server):
+        """Tests a run whose connection is lost fails instead of reporting the
+        target halted"""
+        fake_debug_session.connect()
+        fake_server.inject_disconnect("run")
+
+        future = fake_debug_session.run_nowait()
+        done, pending = wait_for_halt([future], timeout=5)
+
+        assert (done, pending) == (set([future]), set())
+        assert isinstance(future.exception(), ConnectionException)
+        with pytest.raises(ConnectionException):
+            future.wait(timeout=5)
+        with pytest.raises(ConnectionException):
+            future.result()
+
+    def test_halt_nowait_then_request(self, fake_debug_session, fake_server):
+        """Tests other requests wait for a pending halt"""
+        fake_debug_session.connect()
+        fake_debug_session.run(asynchronous=True)
+        fake_server.latency["halt"] = 0.2
+
+        future = fake_debug_session.halt_nowait()
+        assert fake_debug_session.read_register("PC") == 0
+
+        assert future.done()
+        assert not fake_server.sessions[fake_server.cpus[0]].running
+
+    def test_watch(self, fake_debug_session, fake_server):
+        """Tests sampling many addresses at a fixed rate"""
+        fake_debug_session.connect()
+        fake_debug_session.write_data(b"\x01\x00\x00\x00\xff\xff", 0x20000000)
+        fake_debug_session.write_data(b"\x07", 0x20001000)
+
+        w = fake_debug_session.watch(
+            [0x20000000, (0x20000004, 2), (0x20001000, 1)],
+            interval=0.02,
+            count=5,
+        )
+        samples = list(w)
+
+        assert [s.values for s in samples] == [(1, 0xFFFF, 7)] * 5
+        assert len(w.plan.regions) == 2
+        assert fake_server.request_counts["readData"] == 10
+        times = [s.timestamp for s in samples]
+        assert all(0.01 < b - a < 0.05 for a, b in zip(times, times[1:]))
+        stats = w.stats.snapshot()
+        assert stats["samples"] == 5
+        assert stats["latency"]["count"] == 5
+        assert stats["jitter"]["max"] < 0.02
+
+    def test_watch_stop(self, fake_debug_session, fake_server):
+        """Tests stopping a watch and decoding signed values"""
+        fake_debug_session.connect()
+        fake_debug_session.write_data(b"\xfe\xff", 0x20000000)
+
+        w = fake_debug_session.watch([0x20000000], size=2, signed=True, interval=0.001)
+        for sample in w:
+            assert sample.values == (-2,)
+            if w.stats.samples == 3:
+                w.stop()
+
+        assert w.stats.samples == 3
+
+    def test_batch(self, fake_debug_session, fake_server):
+        """Tests a sequence of operations returns all results in order"""
+        batch = fake_debug_session.batch()
+        batch.connect().reset()
+        for i in range(4):
+            batch.write_register("R%d" % i, i)
+        batch.read_register("R3")
+        batch.write_data(b"\x01\x02\x03", 0x20000000)
+        batch.read_data(0x20000000, num_bytes=3, output="bytes")
+        batch.run(asynchronous=True)
+
+        results = batch.execute()
+
+        assert len(results) == len(batch) == 10
+        assert results[6:8] == [3, None]
+        assert results[8] == b"\x01\x02\x03"
+        session = fake_server.sessions[fake_server.cpus[0]]
+        assert session.running
+        assert fake_debug_session._running
+
+    def test_batch_errors(self, fake_debug_session, fake_server):
+        """Tests failed operations are reported by step"""
+        fake_debug_session.connect()
+        batch = fake_debug_session.batch(stop_on_error=False)
+        batch.read_register("PC").read_register("INVALIDREG")
+        batch.checkpoint()
+        batch.write_register("R0", 5).read_register("BADREG")
+
+        with pytest.raises(BatchException) as e:
+            batch.execute()
+
+        assert [(i, step) for i, step, _ in e.value.errors] == [
+            (1, "read_register(INVALIDREG)"),
+            (3, "read_register(BADREG)"),
+        ]
+        assert e.value.results == [0, None, None, None]
+        assert "step 1 (read_register(INVALIDREG))" in str(e.value)
+        assert fake_server.sessions[fake_server.cpus[0]].registers["R0"] == 5
+
+    def test_batch_stop_on_error(self, fake_debug_session, fake_server):
+        """Tests operations after a checkpoint are not run after an error"""
+        fake_debug_session.connect()
+        batch = fake_debug_session.batch()
+        batch.read_register("INVALIDREG").checkpoint().write_register("R0", 5)
+
+        with pytest.raises(BatchException) as e:
+            batch.execute()
+
+        assert e.value.skipped == [1]
+        assert fake_server.request_counts["writeRegister"] == 0
+        assert fake_server.sessions[fake_server.cpus[0]].registers["R0"] == 0
+
+    def test_batch_stop_on_error_implicit(self, fake_debug_session, fake_server):
+        """Tests operations after a failed state changing step are not run
+        without an explicit checkpoint"""
+        fake_server.inject_failure("connect")
+        batch = fake_debug_session.batch()
+        batch.connect().write_register("R0", 5).read_register("R0")
+
+        with pytest.raises(BatchException) as e:
+            batch.execute()
+
+        assert e.value.skipped == [1, 2]
+        assert fake_server.request_counts["writeRegister"] == 0
+
+        fake_server.inject_failure("connect")
+        batch = fake_debug_session.batch(stop_on_error=False)
+        batch.connect().write_register("R0", 5)
+        with pytest.raises(BatchException) as e:
+            batch.execute()
+        assert e.value.skipped == list()
+
+    def test_fail_injected(self, fake_debug_session, fake_server):
+        """Tests injected failures are returned as errors"""
+        fake_debug_session.connect()
+        fake_server.inject_failure("readRegister")
+
+        with pytest.raises(Exception):
+            fake_debug_session.read_register("PC")
+        assert fake_debug_session.read_register("PC") == 0
+
+    def test_read_write_data(self, fake_debug_session):
+        """Tests writing then reading memory as a list and as bytes"""
+        fake_debug_session.connect()
+        fake_debug_session.write_data([1, 2, 3], 0x20000000)
+
+        assert fake_debug_session.read_data(0x20000000, num_bytes=3) == [1, 2, 3]
+        assert (
+            fake_debug_session.read_data(0x20000000, num_bytes=3, output="bytes")
+            == b"\x01\x02\x03"
+        )
+
+    def test_data_encoding_base64(self, fake_server, fake_ccxml):
+        """Tests memory bytes are sent as base64 when enabled"""
+        DS = DebugServer(port=fake_server.port, data_encoding="base64")
+        DS.set_config(fake_ccxml)
+        session = DS.open_session(fake_server.cpus[0])
+        session.connect()
+        session.write_data([1, 2, 3], 0x1000)
+        session.write_data(b"\x04\x05", 0x1003)
+
+        assert session.get_data_encoding() == "base64"
+        assert session.read_data(0x1000, num_bytes=5) == [1, 2, 3, 4, 5]
+
+    def test_data_encoding_default(self, fake_ccxml):
+        """Tests memory bytes are sent as lists by default (without asking the
+        server which encodings it supports)"""
+        with FakeDebugServer(data_encodings=None) as fake:
+            DS = DebugServer(port=fake.port)
+            DS.set_config(fake_ccxml)
+            session = DS.open_session(fake.cpus[0])
+            session.connect()
+            session.write_memory_region(b"\x01\x02\x03", 0x1000)
+
+            assert session.get_data_encoding() == "list"
+            assert session.read_data(0x1000, num_bytes=3) == [1, 2, 3]
+            assert session.read_data(0x1000, num_bytes=3, output="bytes") == (
+                b"\x01\x02\x03"
+            )
+            assert sorted(fake.request_counts) == [
+                "connect",
+                "getListOfCPUs",
+                "getListOfSessions",
+                "openSession",
+                "readData",
+                "setConfig",
+                "writeData",
+            ]
+
+    def test_timeout(self, fake_debug_session, fake_server):
+        """Tests a slow response raises TimeoutException and the next request
+        uses a new connection"""
+        fake_debug_session.connect()
+        fake_debug_session.write_register("R0", 7)
+        fake_debug_session.set_timeout(0.1, command="readRegister")
+        fake_server.latency["readRegister"] = 0.5
+
+        with pytest.raises(TimeoutException) as e:
+            fake_debug_session.read_register("R0")
+        assert e.value.command == "readRegister"
+        assert not fake_debug_session.is_connected()
+
+        fake_server.latency["readRegister"] = 0.0
+        assert fake_debug_session.read_register("R0") == 7
+        assert fake_debug_session.get_timeout("readRegister") == 0.1
+        assert fake_debug_session.get_timeout() is None
+
+    def test_timeout_pipeline(self, fake_debug_session, fake_server):
+        """Tests in-flight pipelined requests fail when one times out"""
+        fake_debug_session.connect()
+        fake_debug_session.set_timeout(0.1)
+        fake_server.latency["readRegister"] = 0.5
+
+        p = fake_debug_session.pipeline()
+        futures = [p.send_req("readRegister", name="PC") for _ in range(3)]
+        p.flush()
+
+        for future in futures:
+            with pytest.raises(TimeoutException):
+                future.result()
+
+    def test_fail_connection_lost(self, fake_debug_session, fake_server):
+        """Tests a lost connection raises ConnectionException and the next
+        request uses a new connection"""
+        fake_debug_session.connect()
+        fake_server.inject_disconnect("readRegister")
+
+        with pytest.raises(ConnectionException):
+            fake_debug_session.read_register("PC")
+        assert fake_debug_session.read_register("PC") == 0
+
+    def test_retry_idempotent(self, fake_debug_session, fake_server):
+        """Tests read only commands are retried after reconnecting"""
+        fake_debug_session.connect()
+        fake_debug_session.set_retry_policy(RetryPolicy(backoff=0.01))
+        fake_server.inject_disconnect("readRegister", count=2)
+
+        assert fake_debug_session.read_register("PC") == 0
+        assert fake_server.request_counts["readRegister"] == 3
+
+    def test_retry_gives_up(self, fake_debug_session, fake_server):
+        """Tests retrying stops after max number of retries"""
+        fake_debug_session.connect()
+        fake_debug_session.set_retry_policy(RetryPolicy(retries=2, backoff=0.01))
+        fake_server.inject_disconnect("readRegister", count=None)
+
+        with pytest.raises(ConnectionException):
+            fake_debug_session.read_register("PC")
+        assert fake_server.request_counts["readRegister"] == 3
+
+    def test_no_retry_unsafe(self, fake_debug_session, fake_server):
+        """Tests commands that are not safe to repeat are not retried unless
+        allowed"""
+        fake_debug_session.connect()
+        fake_debug_session.set_retry_policy(RetryPolicy(backoff=0.01))
+        fake_server.inject_disconnect("writeRegister")
+
+        with pytest.raises(ConnectionException):
+            fake_debug_session.write_register("R0", 1)
+        assert fake_server.request_counts["writeRegister"] == 1
+
+        fake_debug_session.set_retry_policy(
+            RetryPolicy(backoff=0.01, allow_unsafe=True)
+        )
+        fake_server.inject_disconnect("writeRegister")
+        fake_debug_session.write_register("R0", 1)
+        assert fake_server.request_counts["writeRegister"] == 3
+
+    def test_memory_cache(self, fake_debug_session, fake_server):
+        """Tests small reads are served from cached blocks until invalidated"""
+        fake_debug_session.connect()
+        data = bytearray(os.urandom(1024))
+        fake_debug_session.write_data(data, 0x20000000)
+        fake_debug_session.enable_memory_cache(block_size=256, max_blocks=2)
+        count = fake_server.request_counts["readData"]
+
+        for offset in range(0, 256, 4):
+            assert fake_debug_session.read_data(
+                0x20000000 + offset, num_bytes=8, output="bytes"
+            ) == bytes(data[offset : offset + 8])
+        assert fake_server.request_counts["readData"] == count + 2
+        assert fake_debug_session.get_memory_cache_info()["misses"] == 2
+
+        # Least recently used block is evicted
+        assert fake_debug_session.read_data(0x20000000 + 600, num_bytes=2) == list(
+            data[600:602]
+        )
+        assert fake_debug_session.get_memory_cache_info()["evictions"] == 1
+
+        fake_debug_session.write_data(b"\xaa", 0x20000000 + 601)
+        assert fake_debug_session.read_data(0x20000000 + 600, num_bytes=2) == [
+            data[600],
+            0xAA,
+        ]
+
+    def test_memory_cache_raw_requests(self, fake_debug_session, fake_server):
+        """Tests requests sent through a pipeline or _send_req clear the
+        caches"""
+        fake_debug_session.connect()
+        fake_debug_session.enable_memory_cache(block_size=256)
+        fake_debug_session.enable_register_cache()
+        assert fake_debug_session.read_data(0x100, num_bytes=2) == [0, 0]
+        assert fake_debug_session.read_register("R0") == 0
+
+        with fake_debug_session.pipeline() as p:
+            p.send_req("writeData", data=[1, 2], address=0x100, page=0)
+            p.send_req("writeRegister", name="R0", value=1)
+        assert fake_debug_session.read_data(0x100, num_bytes=2) == [1, 2]
+        assert fake_debug_session.read_register("R0") == 1
+
+        fake_debug_session._send_req("writeData", data=[3], address=0x100, page=0)
+        assert fake_debug_session.read_data(0x100, num_bytes=2) == [3, 2]
+
+        with fake_debug_session.pipeline() as p:
+            p.send_req("run", asynchronous=True)
+        count = fake_server.request_counts["readRegister"]
+        fake_debug_session.read_register("R0")
+        fake_debug_session.read_register("R0")
+        assert fake_server.request_counts["readRegister"] == count + 2
+
+    def test_memory_cache_fallback(self, fake_ccxml):
+        """Tests reads near the end of memory fall back to uncached reads"""
+        with FakeDebugServer(address_limit=0x1002) as fake:
+            DS = DebugServer(port=fake.port)
+            DS.set_config(fake_ccxml)
+            session = DS.open_session(fake.cpus[0])
+            session.connect()
+            session.enable_memory_cache(block_size=256)
+
+            assert session.read_data(0x1000, num_bytes=2) == [0, 0]
+            assert fake.request_counts["readData"] == 2
+            with pytest.raises(Exception):
+                session.read_data(0x1001, num_bytes=2)
+
+    def test_fail_read_data_invalid_address(self, fake_debug_session):
+        """Tests fails when reading an invalid address"""
+        fake_debug_session.connect()
+
+        with pytest.raises(Exception):
+            fake_debug_session.read_data(0xFFFFFFFFF, num_bytes=4)
+
+    def test_pipeline(self, fake_debug_session):
+        """Tests pipelined requests are returned in order"""
+        fake_debug_session.connect()
+
+        with fake_debug_session.pipeline(window=4) as p:
+            writes = [
+                p.send_req("writeRegister", name="R%d" % i, value=i) for i in range(10)
+            ]
+            reads = [p.send_req("readRegister", name="R%d" % i) for i in range(10)]
+            bad = p.send_req("readRegister", name="INVALIDREG")
+
+        assert all(w.result() is None for w in writes)
+        assert [r.result() for r in reads] == list(range(10))
+        with pytest.raises(Exception):
+            bad.result()
+
+    def test_memory_region(self, fake_debug_session):
+        """Tests chunked write and read of a memory region"""
+        fake_debug_session.connect()
+        data = bytearray(os.urandom(100000))
+        progress = list()
+
+        fake_debug_session.write_memory_region(data, 0x20000000, chunk_size=4096)
+        result = fake_debug_session.read_memory_region(
+            0x20000000,
+            len(data),
+            chunk_size=4096,
+            progress=lambda done, total: progress.append(done),
+        )
+
+        assert result == data
+        assert progress[-1] == len(data)
+
+    def test_dump_memory(self, fake_debug_session, tmpdir):
+        """Tests dumping memory to a file object, a path and a memory map"""
+        fake_debug_session.connect()
+        data = bytearray(os.urandom(10000))
+        fake_debug_session.write_memory_region(data, 0x1000)
+
+        f = io.BytesIO()
+        fake_debug_session.dump_memory(0x1000, len(data), f, chunk_size=1000)
+        assert f.getvalue() == data
+
+        path = str(tmpdir.join("dump.bin"))
+        mm = fake_debug_session.dump_memory(0x1000, len(data), path, use_mmap=True)
+        assert mm[:] == data
+        mm.close()
+
+    def test_dump_memory_path_like(self, fake_debug_session, tmpdir):
+        """Tests dumping memory to a path object, and dumping no bytes to a
+        memory map"""
+        fake_debug_session.connect()
+        fake_debug_session.write_data(b"\x01\x02\x03", 0x1000)
+
+        path = tmpdir.join("dump.bin")
+        assert fake_debug_session.dump_memory(0x1000, 3, path) == 3
+        assert path.read_binary() == b"\x01\x02\x03"
+
+        empty = tmpdir.join("empty.bin")
+        assert fake_debug_session.dump_memory(0x1000, 0, empty, use_mmap=True) == 0
+        assert empty.size() == 0
+
+    def test_flash(self, fake_debug_session, tmpdir):
+        """Tests flash steps are timed"""
+        image = tmpdir.join("image.hex")
+        image.write(":00000001FF\n")
+
+        result = fake_debug_session.flash(str(image))
+
+        assert result.ok
+        assert list(result.timings.keys()) == ["connect", "erase", "load", "verify"]
+
+    def test_flash_delta(self, fake_debug_session, fake_server, tmpdir):
+        """Tests re-flashing only programs the sectors that changed"""
+        data = bytearray(range(256)) * 40
+        image = tmpdir.join("image.bin")
+        image.write_binary(bytes(data))
+        fake_debug_session.connect()
+        fake_debug_session.erase()
+
+        result = fake_debug_session.flash_delta(str(image), binary=True)
+        assert result.sectors == 3
+        assert result.changed_sectors == [0x0, 0x1000, 0x2000]
+
+        data[0x1800] ^= 0xFF
+        image.write_binary(bytes(data))
+        fake_server.request_counts.clear()
+        result = fake_debug_session.flash(str(image), binary=True, delta=True)
+
+        assert result.ok
+        assert list(result.timings.keys()) == [
+            "connect",
+            "parse",
+            "read",
+            "program",
+            "verify",
+        ]
+        assert result.changed_sectors == [0x1000]
+        assert fake_server.request_counts["writeData"] == 1
+        session = fake_server.sessions[fake_server.cpus[0]]
+        assert session.memory[0].read(0, len(data)) == data
+
+    def test_image_cache(self, fake_debug_session, fake_server, tmpdir):
+        """Tests flashing the same image again skips erase/load/verify"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(bytes(bytearray(range(256)) * 4))
+        fake_debug_session.enable_image_cache(str(tmpdir.join("images.json")))
+
+        result = fake_debug_session.flash(str(image), binary=True)
+        assert result.ok and not result.skipped
+
+        fake_server.request_counts.clear()
+        result = fake_debug_session.flash(str(image), binary=True)
+        assert result.ok and result.skipped
+        assert list(result.timings.keys()) == ["connect", "check"]
+        assert fake_server.request_counts["load"] == 0
+        assert fake_debug_session.load(str(image), binary=True) is True
+
+        # Device reprogrammed by something else
+        fake_debug_session.write_data([0xAA], 0x200)
+        result = fake_debug_session.flash(str(image), binary=True)
+        assert result.ok and not result.skipped
+        assert fake_server.request_counts["load"] == 1
+        assert fake_debug_session.get_image_cache_info()["hits"] == 2
+
+    def test_image_cache_forgets_writes(self, fake_debug_session, tmpdir):
+        """Tests writing memory through the session removes the device's
+        entry, and one flash checks the cache once"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(bytes(bytearray(range(256)) * 4))
+        fake_debug_session.enable_image_cache(str(tmpdir.join("images.json")))
+
+        assert not fake_debug_session.flash(str(image), binary=True).skipped
+        assert fake_debug_session.get_image_cache_info() == {"hits": 0, "misses": 1}
+
+        fake_debug_session.write_data([0xAA] * 16, 0x100)
+        assert not fake_debug_session.is_image_cached(str(image), binary=True)
+
+        fake_debug_session.flash(str(image), binary=True)
+        fake_debug_session.perform_operation("Erase")
+        assert not fake_debug_session.is_image_cached(str(image), binary=True)
+
+    def test_image_cache_writes_skip_file(self, fake_debug_session, tmpdir):
+        """Tests writes only read/update the cache file when the device has an
+        entry"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(bytes(bytearray(range(256)) * 4))
+        cache = ImageCache(str(tmpdir.join("images.json")))
+        reads = list()
+        read = cache._read
+
+        def counted_read():
+            reads.append(True)
+            return read()
+
+        cache._read = counted_read
+        fake_debug_session.enable_image_cache(cache, device="board")
+        fake_debug_session.connect()
+
+        del reads[:]
+        for _ in range(3):
+            fake_debug_session.write_data([0xAA], 0x100)
+        assert len(reads) == 0
+
+        fake_debug_session.flash(str(image), binary=True)
+        assert cache.has("board")
+        del reads[:]
+        for _ in range(3):
+            fake_debug_session.write_data([0xAA], 0x100)
+        assert len(reads) == 1
+        assert not cache.has("board")
+
+    def test_image_cache_checks_whole_image(
+        self, fake_debug_session, fake_server, tmpdir
+    ):
+        """Tests a byte changed anywhere in the image is detected"""
+        image = tmpdir.join("image.bin")
+        image.write_binary(bytes(bytearray(range(256)) * 4))
+        fake_debug_session.enable_image_cache(str(tmpdir.join("images.json")))
+        fake_debug_session.flash(str(image), binary=True)
+
+        # Reprogrammed by something else (outside start/middle/end probes)
+        fake_server.sessions[fake_server.cpus[0]].memory[0].write(0x100, b"\xaa")
+
+        result = fake_debug_session.flash(str(image), binary=True)
+        assert result.ok and not result.skipped
+
+    def test_image_cache_unsupported_format(self, fake_debug_session, tmpdir):
+        """Tests images that can not be parsed locally are flashed but not
+        cached"""
+        image = tmpdir.join("image.s19")
+        image.write("S00600004844521B\nS9030000FC\n")
+        fake_debug_session.enable_image_cache(str(tmpdir.join("images.json")))
+
+        for _ in range(2):
+            result = fake_debug_session.flash(str(image))
+            assert result.ok and not result.skipped
@@ -0,0 +1,206 @@
+"""Tests firmware image parsers (no CCS or device required)"""
+import struct
+import pytest
+import threading
+from dsclient import image
+
+
+def hex_record(kind, offset, data):
+    record = bytearray([len(data), offset >> 8, offset & 0xFF, kind]) + data
+    record.append(-sum(record) & 0xFF)
+    return ":" + "".join("%02X" % b for b in record)
+
+
+def elf32(segments):
+    """Returns a minimal little endian 32-bit ELF file with PT_LOAD segments"""
+    phoff = 52
+    data_offset = phoff + 32 * len(segments)
+    header = b"\x7fELF" + bytes(bytearray([1, 1, 1])) + b"\x00" * 9
+    header += struct.pack(
+        "<HHIIIIIHHHHHH", 2, 40, 1, 0, phoff, 0, 0, 52, 32, len(segments), 0, 0, 0
+    )
+
+    program_headers = b""
+    contents = b""
+    for paddr, data in segments:
+        offset = data_offset + len(contents)
+        program_headers += struct.pack(
+            "<IIIIIIII", 1, offset, paddr + 0x1000, paddr, len(data), len(data), 5, 4
+        )
+        contents += data
+
+    return header + program_headers + contents
+
+
+class TestImage(object):
+    def test_merge_segments(self):
+        """Tests adjacent segments are merged"""
+        img = image.Image([(0x10, b"\x01\x02"), (0x0, b"\x00"), (0x12, b"\x03")])
+
+        assert img.segments == [
+            [0x0, bytearray(b"\x00")],
+            [0x10, bytearray(b"\x01\x02\x03")],
+        ]
+        assert img.size == 4
+
+    def test_overlap(self):
+        """Tests overlapping segments raise an exception"""
+        img = image.Image([(0x10, b"\x01\x02")])
+        with pytest.raises(Exception):
+            img.add(0x11, b"\x00")
+
+    def test_sectors(self):
+        """Tests sectors are padded with erased bytes"""
+        img = image.Image([(0x0E, b"\x01\x02\x03\x04"), (0x30, b"\x05")])
+        sectors = img.sectors(16)
+
+        assert list(sectors.keys()) == [0x0, 0x10, 0x30]
+        assert sectors[0x0] == b"\xff" * 14 + b"\x01\x02"
+        assert sectors[0x10] == b"\x03\x04" + b"\xff" * 14
+        assert sectors[0x30] == b"\x05" + b"\xff" * 15
+
+
+    def test_probes(self):
+        """Tests probes cover the start, middle and end of each segment"""
+        img = image.Image([(0x100, bytearray(range(200))), (0x400, b"\x01")])
+        probes = img.probes(size=16)
+
+        assert [(address, length) for address, length, _ in probes] == [
+            (0x100, 16),
+            (0x100 + 92, 16),
+            (0x100 + 184, 16),
+            (0x400, 1),
+        ]
+        assert probes[0][2] == image.crc32(bytearray(range(16)))
+
+    def test_probes_whole_segments(self):
+        """Tests probes cover each whole segment by default"""
+        data = bytearray(range(200))
+        img = image.Image([(0x100, data), (0x400, b"\x01")])
+
+        assert img.probes() == [
+            [0x100, 200, image.crc32(data)],
+            [0x400, 1, image.crc32(b"\x01")],
+        ]
+        assert image.crc32(data[100:], image.crc32(data[:100])) == image.crc32(data)
+
+
+class TestImageCache(object):
+    def test_put_get(self, tmpdir):
+        """Tests entries are persisted and replaced per device"""
+        path = str(tmpdir.join("cache", "images.json"))
+        image.ImageCache(path).put("board1", "a", "a.hex", [[0, 1, 2]])
+        image.ImageCache(path).put("board2", "b", "b.hex", list())
+        image.ImageCache(path).put("board1", "c", "c.hex", list())
+
+        cache = image.ImageCache(path)
+        assert cache.get("board1", "a") is None
+        assert cache.get("board1", "c")["file"] == "c.hex"
+        assert cache.get("board2", "b")["probes"] == list()
+
+        assert cache.has("board2")
+        cache.remove("board2")
+        assert cache.get("board2", "b") is None
+        assert not cache.has("board2")
+        cache.clear()
+        assert cache.get("board1", "c") is None
+
+    def test_concurrent_put(self, tmpdir):
+        """Tests concurrent updates of different devices are all kept"""
+        path = str(tmpdir.join("images.json"))
+
+        def put(worker):
+            cache = image.ImageCache(path)
+            for i in range(20):
+                cache.put("board%d-%d" % (worker, i), "a", "a.hex", list())
+
+        threads = [threading.Thread(target=put, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        cache = image.ImageCache(path)
+        assert all(
+            cache.get("board%d-%d" % (w, i), "a") is not None
+            for w in range(8)
+            for i in range(20)
+        )
+
+    def test_key(self, tmpdir):
+        """Tests keys depend on file contents and load address"""
+        path = tmpdir.join("image.bin")
+        path.write_binary(b"\x01")
+        digest = image.file_digest(str(path))
+
+        assert image.ImageCache.key(digest) != image.ImageCache.key(digest, True)
+        assert image.ImageCache.key(digest, True) == image.ImageCache.key(
+            digest, True, 0
+        )
+        assert image.ImageCache.key(digest, True) != image.ImageCache.key(
+            digest, True, 0x100
+        )
+        path.write_binary(b"\x02")
+        assert image.file_digest(str(path)) != digest
+
+
+class TestLoadImage(object):
+    def test_intel_hex(self, tmpdir):
+        """Tests parsing data and extended linear address records"""
+        path = tmpdir.join("image.hex")
+        path.write(
+            "\n".join(
+                [
+                    hex_record(0x00, 0x0100, bytearray(b"\x01\x02")),
+                    hex_record(0x04, 0x0000, bytearray(b"\x00\x01")),
+                    hex_record(0x00, 0x0000, bytearray(b"\x03")),
+                    hex_record(0x01, 0x0000, bytearray()),
+                ]
+            )
+        )
+
+        img = image.load_image(str(path))
+
+        assert img.segments == [
+            [0x100, bytearray(b"\x01\x02")],
+            [0x10000, bytearray(b"\x03")],
+        ]
+
+    def test_intel_hex_checksum(self):
+        """Tests records with an invalid checksum raise an exception"""
+        with pytest.raises(Exception):
+            image.parse_intel_hex(b":0100000001FF\n")
+
+    def test_elf(self, tmpdir):
+        """Tests loadable segments are placed at their physical address"""
+        path = tmpdir.join("image.out")
+        path.write_binary(elf32([(0x200, b"\x01\x02\x03"), (0x8000, b"\x04")]))
+
+        img = image.load_image(str(path))
+
+        assert img.segments == [
+            [0x200, bytearray(b"\x01\x02\x03")],
+            [0x8000, bytearray(b"\x04")],
+        ]
+
+    def test_binary(self, tmpdir):
+        """Tests binary images are loaded at address"""
+        path = tmpdir.join("image.bin")
+        path.write_binary(b":\x01\x02")
+
+        img = image.load_image(str(path), binary=True, address=0x400)
+
+        assert img.segments == [[0x400, bytearray(b":\x01\x02")]]
+
+    def test_missing_file(self, tmpdir):
+        """Tests loading a missing file raises an exception"""
+        with pytest.raises(Exception):
+            image.load_image(str(tmpdir.join("missing.hex")))
+
+    def test_unsupported_format(self, tmpdir):
+        """Tests an unrecognised image (e.g. S-record) is not read as binary"""
+        path = tmpdir.join("image.s19")
+        path.write("S00600004844521B\nS9030000FC\n")
+
+        with pytest.raises(Exception, match="Unsupported image format"):
+            image.load_image(str(path))
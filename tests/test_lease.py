@@ -0,0 +1,51 @@
+"""Tests device leases used to share boards between test processes (no CCS
+or device required)"""
+import os
+import sys
+import subprocess
+import pytest
+from .utils.lease import DeviceLease
+
+UTILS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils")
+
+# Script acquiring a lease then waiting to be killed
+HOLD_LEASE = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from lease import DeviceLease
+lease = DeviceLease("board", directory=sys.argv[2])
+lease.acquire()
+print("ACQUIRED")
+sys.stdout.flush()
+time.sleep(60)
+"""
+
+
+class TestDeviceLease(object):
+    def test_exclusive(self, tmpdir):
+        """Tests a lease can only be held by one owner at a time"""
+        directory = str(tmpdir)
+        with DeviceLease("XDS110/L1100", directory=directory) as lease:
+            assert lease.held
+            with pytest.raises(Exception):
+                DeviceLease("XDS110/L1100", directory=directory).acquire(timeout=0.2)
+            DeviceLease("XDS110/L1101", directory=directory).acquire(timeout=0.2)
+
+        assert not lease.held
+        DeviceLease("XDS110/L1100", directory=directory).acquire(timeout=0.2)
+
+    def test_released_on_crash(self, tmpdir):
+        """Tests a lease is released when the process holding it is killed"""
+        p = subprocess.Popen(
+            [sys.executable, "-c", HOLD_LEASE, UTILS_DIR, str(tmpdir)],
+            stdout=subprocess.PIPE,
+        )
+        try:
+            assert p.stdout.readline().strip() == b"ACQUIRED"
+            with pytest.raises(Exception):
+                DeviceLease("board", directory=str(tmpdir)).acquire(timeout=0.2)
+        finally:
+            p.kill()
+            p.wait()
+
+        DeviceLease("board", directory=str(tmpdir)).acquire(timeout=5)
@@ -0,0 +1,82 @@
+import json
+import pytest
+from dsclient.metrics import Histogram, Metrics
+
+
+class TestHistogram(object):
+    def test_add(self):
+        """Tests adding latencies to histogram"""
+        h = Histogram()
+        for latency in (0.0001, 0.0002, 0.003):
+            h.add(latency)
+
+        snapshot = h.snapshot()
+        assert snapshot["count"] == 3
+        assert snapshot["min"] == 0.0001
+        assert snapshot["max"] == 0.003
+        assert snapshot["mean"] == pytest.approx(0.0011)
+        assert sum(snapshot["buckets"].values()) == 3
+
+    def test_percentile(self):
+        """Tests percentiles are within a factor of 2 of the actual latency"""
+        h = Histogram()
+        for i in range(1, 101):
+            h.add(i / 1000.0)
+
+        assert 0.05 <= h.percentile(50) <= 0.1
+        assert 0.099 <= h.percentile(99) <= 0.1
+
+    def test_empty(self):
+        """Tests snapshot of empty histogram"""
+        snapshot = Histogram().snapshot()
+
+        assert snapshot["count"] == 0
+        assert snapshot["mean"] is None
+        assert snapshot["p50"] is None
+
+
+class TestMetrics(object):
+    def test_record(self):
+        """Tests recording requests per command"""
+        m = Metrics(name="test")
+        m.record("readData", 0.001, 60, 1000, False)
+        m.record("readData", 0.002, 60, 1000, False)
+        m.record("readRegister", 0.001, 40, 20, True)
+
+        snapshot = m.snapshot()
+        assert snapshot["name"] == "test"
+        assert snapshot["commands"]["readData"]["count"] == 2
+        assert snapshot["commands"]["readData"]["response_bytes"] == 2000
+        assert snapshot["commands"]["readRegister"]["errors"] == 1
+
+    def test_callback(self):
+        """Tests callback is called for every request"""
+        events = list()
+        m = Metrics(name="test", callback=events.append)
+        m.record("halt", 0.5, 30, 20, False)
+
+        assert events == [
+            {
+                "name": "test",
+                "command": "halt",
+                "latency": 0.5,
+                "request_bytes": 30,
+                "response_bytes": 20,
+                "error": False,
+            }
+        ]
+
+    def test_to_json(self):
+        """Tests exporting metrics as JSON"""
+        m = Metrics(name="test")
+        m.record("run", 0.01, 30, 20, False)
+
+        assert json.loads(m.to_json())["commands"]["run"]["count"] == 1
+
+    def test_reset(self):
+        """Tests clearing recorded metrics"""
+        m = Metrics()
+        m.record("run", 0.01, 30, 20, False)
+        m.reset()
+
+        assert m.snapshot()["commands"] == {}
@@ -0,0 +1,115 @@
+"""Tests the pool of warm server processes used by the test fixtures (uses
+FakeDebugServer processes; no CCS or device required)"""
+import pytest
+from dsclient import DebugServer
+from .utils.fakeserver import launch_process
+from .utils.serverpool import ServerPool
+
+
+@pytest.fixture(scope="function")
+def pool(request):
+    """A ServerPool of FakeDebugServer processes"""
+    pool = ServerPool(launch_process, size=1)
+
+    request.addfinalizer(pool.close)
+
+    return pool
+
+
+class TestServerPool(object):
+    def test_reuse(self, pool):
+        """Tests a released process is handed out again"""
+        p, port = pool.acquire(timeout=30)
+        DebugServer(port=port)._close()
+        pool.release(p, port)
+
+        assert pool.acquire(timeout=30) == (p, port)
+        assert (pool.launched, pool.reused) == (1, 1)
+
+    def test_reset_sessions(self, pool, fake_ccxml):
+        """Tests open sessions are terminated before a process is reused"""
+        p, port = pool.acquire(timeout=30)
+        ds = DebugServer(port=port)
+        ds.set_config(fake_ccxml)
+        ds.open_session("Cortex_M3_0")
+        ds._close()
+        pool.release(p, port)
+
+        assert pool.acquire(timeout=30) == (p, port)
+        assert DebugServer(port=port).get_list_of_sessions() == dict()
+
+    def test_reset_stopped_sessions(self, pool, fake_ccxml):
+        """Tests a process whose sessions were stopped is reused"""
+        p, port = pool.acquire(timeout=30)
+        ds = DebugServer(port=port)
+        ds.set_config(fake_ccxml)
+        ds.open_session("Cortex_M3_0").stop()
+        ds._close()
+        pool.release(p, port)
+
+        assert pool.acquire(timeout=30) == (p, port)
+        assert DebugServer(port=port).get_list_of_sessions() == dict()
+        assert pool.launched == 1
+
+    def test_replace_exited(self, pool):
+        """Tests a process that exited is replaced"""
+        p, port = pool.acquire(timeout=30)
+        p.terminate()
+        p.wait()
+        pool.release(p, port)
+
+        new_p, new_port = pool.acquire(timeout=30)
+        assert new_p is not p
+        assert new_p.poll() is None
+        assert pool.launched == 2
+
+    def test_reuse_configured(self, pool, fake_ccxml):
+        """Tests a process whose config was set is reused with its config"""
+        p, port = pool.acquire(timeout=30)
+        ds = DebugServer(port=port)
+        ds.set_config(fake_ccxml)
+        ds._close()
+        pool.release(p, port)
+
+        assert pool.acquire(timeout=30) == (p, port)
+        assert DebugServer(port=port).get_config() == fake_ccxml
+        assert pool.launched == 1
+
+    def test_acquire_unconfigured(self, pool, fake_ccxml):
+        """Tests a configured process is replaced when an unconfigured one is
+        needed"""
+        p, port = pool.acquire(timeout=30)
+        ds = DebugServer(port=port)
+        ds.set_config(fake_ccxml)
+        ds._close()
+        pool.release(p, port)
+
+        new_p, new_port = pool.acquire(timeout=30, configured=False)
+        assert new_p is not p
+        assert DebugServer(port=new_port).get_config() is None
+        pool.release(new_p, new_port)
+        assert pool.acquire(timeout=30, configured=False) == (new_p, new_port)
+
+    def test_replace_configured(self, request, fake_ccxml):
+        """Tests a process whose config was set is not reused when keep_config
+        is False"""
+        pool = ServerPool(launch_process, size=1, keep_config=False)
+        request.addfinalizer(pool.close)
+        p, port = pool.acquire(timeout=30)
+        ds = DebugServer(port=port)
+        ds.set_config(fake_ccxml)
+        ds._close()
+        pool.release(p, port)
+
+        assert p.poll() is not None
+        new_p, new_port = pool.acquire(timeout=30)
+        assert DebugServer(port=new_port).get_config() is None
+
+    def test_close(self, pool):
+        """Tests closing pool terminates processes and fails acquire"""
+        p, port = pool.acquire(timeout=30)
+        pool.close()
+
+        assert p.poll() is not None
+        with pytest.raises(Exception):
+            pool.acquire(timeout=1)
@@ -0,0 +1,238 @@
+import json
+import socket
+import pytest
+from dsclient.utils import (
+    StreamReader,
+    create_request,
+    create_socket,
+    decode_byte_response,
+    decode_response,
+    encode_byte_request,
+    encode_request,
+    match_session_name,
+    send,
+)
+
+
+@pytest.fixture(scope="function")
+def socket_pair(request):
+    """A pair of connected sockets (client, server)"""
+    client, server = socket.socketpair()
+
+    def teardown():
+        client.close()
+        server.close()
+
+    request.addfinalizer(teardown)
+
+    return (client, server)
+
+
+class TestCreateSocket(object):
+    def test_create_socket_options(self):
+        """Tests socket options are set on created sockets"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("localhost", 0))
+        listener.listen(1)
+        try:
+            s = create_socket(
+                listener.getsockname()[1],
+                connect_timeout=1.0,
+                keepalive=True,
+                recv_buffer=1 << 16,
+            )
+
+            assert s.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) != 0
+            assert s.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) != 0
+            assert s.gettimeout() is None
+            s.close()
+        finally:
+            listener.close()
+
+    def test_fail_create_socket_connection_refused(self):
+        """Tests fails when nothing is listening on port"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("localhost", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+
+        with pytest.raises(Exception):
+            create_socket(port, connect_timeout=1.0)
+
+
+class TestStreamReader(object):
+    def test_readline(self, socket_pair):
+        """Tests reading a single message"""
+        client, server = socket_pair
+        server.sendall(b'{"status": "OK"}\n')
+
+        reader = StreamReader(client)
+
+        assert reader.readline() == b'{"status": "OK"}'
+        assert reader.pending() == 0
+
+    def test_readline_keeps_leftover_bytes(self, socket_pair):
+        """Tests bytes received after a delimiter are returned by the next read"""
+        client, server = socket_pair
+        server.sendall(b"first\nsecond\nthi")
+
+        reader = StreamReader(client)
+
+        assert reader.readline() == b"first"
+        assert reader.readline() == b"second"
+        assert reader.pending() == 3
+
+        server.sendall(b"rd\n")
+        assert reader.readline() == b"third"
+
+    def test_readline_message_larger_than_buffer(self, socket_pair):
+        """Tests reading a message spanning many recv calls"""
+        client, server = socket_pair
+        msg = b"x" * 10000
+        server.sendall(msg + b"\n")
+
+        reader = StreamReader(client, bufsize=64)
+
+        assert reader.readline() == msg
+
+    def test_fail_readline_connection_closed(self, socket_pair):
+        """Tests fails when connection closes before a full message is received"""
+        client, server = socket_pair
+        server.sendall(b"partial")
+        server.close()
+
+        reader = StreamReader(client)
+
+        with pytest.raises(Exception):
+            reader.readline()
+
+
+class TestSend(object):
+    def test_send_with_reader(self, socket_pair):
+        """Tests sending a request and reading back the response"""
+        client, server = socket_pair
+        server.sendall(b'{"status": "OK", "data": [1, 2, 3]}\n')
+
+        reader = StreamReader(client)
+        resp = send(client, create_request("readData"), reader=reader)
+
+        assert resp["data"] == [1, 2, 3]
+        assert json.loads(server.recv(1024).decode()) == {
+            "name": "readData",
+            "args": {},
+        }
+
+    def test_encode_decode(self):
+        """Tests requests are encoded as newline terminated JSON messages"""
+        msg = encode_request(create_request("readRegister", name="PC"))
+
+        assert msg.endswith(b"\n")
+        assert decode_response(msg.rstrip(b"\n")) == {
+            "name": "readRegister",
+            "args": {"name": "PC"},
+        }
+
+
+class TestByteEncoding(object):
+    def test_encode_byte_request(self):
+        """Tests encoding a request with a bytes argument"""
+        msg = encode_byte_request(
+            "writeData", "data", bytearray([0, 127, 255]), address=0x100, page=0
+        )
+
+        assert json.loads(msg.decode()) == {
+            "name": "writeData",
+            "args": {"address": 0x100, "page": 0, "data": [0, 127, 255]},
+        }
+
+    def test_encode_byte_request_base64(self):
+        """Tests encoding a request with a bytes argument as base64"""
+        msg = encode_byte_request(
+            "writeData", "data", b"\x00\x7f\xff", encoding="base64", address=0x100
+        )
+
+        assert json.loads(msg.decode()) == {
+            "name": "writeData",
+            "args": {"address": 0x100, "data": "AH//", "encoding": "base64"},
+        }
+
+    def test_encode_byte_request_empty(self):
+        """Tests encoding a request with no bytes and no other arguments"""
+        msg = encode_byte_request("writeData", "data", b"")
+
+        assert json.loads(msg.decode()) == {"name": "writeData", "args": {"data": []}}
+
+    @pytest.mark.parametrize(
+        "output,expected_type", [("bytes", bytes), ("bytearray", bytearray)]
+    )
+    def test_decode_byte_response(self, output, expected_type):
+        """Tests decoding a list of bytes response into a buffer"""
+        data = list(range(256)) * 600
+        msg = json.dumps({"status": "OK", "data": data}).encode()
+
+        resp = decode_byte_response(msg, output=output)
+
+        assert resp["status"] == "OK"
+        assert type(resp["data"]) is expected_type
+        assert bytearray(resp["data"]) == bytearray(data)
+
+    def test_decode_byte_response_memoryview(self):
+        """Tests decoding a list of bytes response into a memoryview"""
+        resp = decode_byte_response(
+            b'{"status": "OK", "data": [1, 2, 3]}', output="memoryview"
+        )
+
+        assert resp["data"].tobytes() == b"\x01\x02\x03"
+
+    @pytest.mark.parametrize("codec", ["json", None])
+    def test_decode_byte_response_base64(self, codec):
+        """Tests decoding a base64 response into a buffer"""
+        resp = decode_byte_response(
+            b'{"status": "OK", "data": "AH//"}', output="bytes", codec=codec
+        )
+
+        assert resp["data"] == b"\x00\x7f\xff"
+
+    def test_decode_byte_response_empty(self):
+        """Tests decoding an empty list of bytes"""
+        resp = decode_byte_response(b'{"status": "OK", "data": []}')
+
+        assert resp["data"] == bytearray()
+
+    def test_decode_byte_response_without_data(self):
+        """Tests decoding an error response"""
+        resp = decode_byte_response(b'{"status": "FAIL", "message": "data"}')
+
+        assert resp == {"status": "FAIL", "message": "data"}
+
+    def test_decode_byte_response_nested_data(self):
+        """Tests only the top level 'data' value is decoded"""
+        msg = b'{"status": "OK", "args": {"data": [9, 9]}, "data": [1, 2]}'
+
+        resp = decode_byte_response(msg, output="bytes")
+
+        assert resp["args"] == {"data": [9, 9]}
+        assert resp["data"] == b"\x01\x02"
+
+    def test_fail_decode_byte_response_invalid_output(self):
+        """Tests fails when decoding into an unsupported output type"""
+        with pytest.raises(Exception):
+            decode_byte_response(b'{"status": "OK", "data": []}', output="str")
+
+
+class TestMatchSessionName(object):
+    SESSIONS = ["Texas Instruments XDS110 USB/Cortex_M3_0", "Texas/Cortex_M3_01"]
+
+    def test_match_session_name(self):
+        """Tests matching a regex pattern to a full session name"""
+        assert match_session_name("M3_0$", self.SESSIONS) == self.SESSIONS[0]
+
+    def test_fail_match_session_name_no_match(self):
+        """Tests fails when no session name matches"""
+        with pytest.raises(Exception):
+            match_session_name("Cortex_M4", self.SESSIONS)
+
+    def test_fail_match_session_name_multiple_matches(self):
+        """Tests fails when multiple session names match"""
+        with pytest.raises(Exception):
+            match_session_name("Cortex_M3", self.SESSIONS)
@@ -0,0 +1,64 @@
+"""Tests memory watch helpers (no CCS or device required)"""
+import pytest
+from dsclient import watch
+
+
+class TestWatchPlan(object):
+    def test_merge_regions(self):
+        """Tests nearby addresses are read in the same request"""
+        plan = watch.WatchPlan([0x108, 0x100, (0x200, 2), 0x1000], merge_gap=0x100)
+
+        assert plan.regions == [(0x100, 0x102), (0x1000, 4)]
+        assert len(plan.buffer) == 0x106
+
+    def test_decode(self):
+        """Tests values are decoded from the buffer in the order given"""
+        plan = watch.WatchPlan(
+            [(0x10, 2), (0x0, 4), (0x20, 3)], byteorder="big", merge_gap=0
+        )
+        plan.fill(0, b"\x00\x00\x01\x02")
+        plan.fill(1, b"\xff\xfe")
+        plan.fill(2, b"abc")
+
+        assert plan.decode() == (0xFFFE, 0x102, b"abc")
+
+    def test_invalid(self):
+        """Tests invalid arguments raise an exception"""
+        with pytest.raises(Exception):
+            watch.WatchPlan([])
+        with pytest.raises(Exception):
+            watch.WatchPlan([0x0], byteorder="middle")
+
+
+class TestSchedule(object):
+    def test_fixed_rate(self):
+        """Tests polls are scheduled at fixed times"""
+        schedule = watch.Schedule(0.1)
+
+        assert schedule.delay(10.0) == (0.0, 0)
+        schedule.advance()
+        assert schedule.delay(10.03) == (pytest.approx(0.07), 0)
+
+    def test_skip_late(self):
+        """Tests polls that can not start on time are skipped"""
+        schedule = watch.Schedule(0.1)
+        schedule.delay(10.0)
+        schedule.advance()
+
+        delay, missed = schedule.delay(10.35)
+        assert missed == 2
+        assert schedule.scheduled == pytest.approx(10.3)
+
+
+class TestRingBuffer(object):
+    def test_wrap(self):
+        """Tests samples are returned oldest first after wrapping"""
+        numpy = pytest.importorskip("numpy")
+        ring = watch.RingBuffer(3, 2)
+        for i in range(5):
+            ring.append(float(i), (i, i * 10))
+
+        times, values = ring.arrays()
+        assert len(ring) == 3
+        assert list(times) == [2.0, 3.0, 4.0]
+        assert numpy.array_equal(values, [[2, 20], [3, 30], [4, 40]])
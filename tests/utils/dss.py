@@ -2,6 +2,7 @@ import os
 import re
 import json
 import socket
+import threading
 import subprocess
 
 
@@ -24,6 +25,8 @@ def launch_server(ccs_exe, workspace):
     ccsexe = [
         ccs_exe,
         "-noSplash",
+        "-data",
+        workspace,
         "-application",
         "com.ti.ccstudio.apps.runScript",
         "-ccs.script",
@@ -47,4 +50,15 @@ def launch_server(ccs_exe, workspace):
         p.terminate()
         raise Exception("Could not retrieve port from debugserver process.")
 
+    # Keep reading output so the process never blocks on a full pipe
+    t = threading.Thread(target=_drain, args=(p.stdout,))
+    t.daemon = True
+    t.start()
+
     return (p, port)
+
+
+def _drain(stream):
+    """Reads (and discards) output until the stream is closed"""
+    for _ in iter(stream.readline, b""):
+        pass
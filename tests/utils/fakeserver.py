@@ -0,0 +1,600 @@
+"""Pure python stand-in for a DebugServer-js process
+
+Speaks the same newline delimited JSON protocol as DebugServer-js and
+simulates device memory, registers, options and session ports so the client
+can be tested and benchmarked without CCS or a device. Latency and failures
+can be injected per command.
+
+Example::
+
+    with FakeDebugServer() as fake:
+        ds = DebugServer(port=fake.port)
+"""
+import os
+import sys
+import json
+import base64
+import time
+import argparse
+import socket
+import threading
+import subprocess
+import collections
+from dsclient.utils import StreamReader
+
+DEFAULT_CPUS = [
+    "Texas Instruments XDS110 USB Debug Probe/Cortex_M3_0",
+    "Texas Instruments XDS110 USB Debug Probe/Cortex_M3_1",
+]
+DEFAULT_DEVICES = ["CC1310F128", "CC1350F128"]
+DEFAULT_CONNECTIONS = ["Texas Instruments XDS110 USB Debug Probe"]
+DEFAULT_REGISTERS = ["PC", "SP", "LR", "xPSR"] + ["R%d" % i for i in range(13)]
+DEFAULT_OPTIONS = {"ResetOnRestart": False, "FlashEraseSelection": "All"}
+DEFAULT_OPCODES = ["Erase", "MassErase", "ResetTarget"]
+DEFAULT_DATA_ENCODINGS = ["list", "base64"]
+
+# Max address (exclusive) of simulated memory
+DEFAULT_ADDRESS_LIMIT = 2 ** 32
+# Simulated flash region (start, size) set to 0xFF by erase
+DEFAULT_FLASH = (0x0, 0x20000)
+
+BLOCK_SIZE = 4096
+
+
+class FakeMemory(object):
+    """Sparse simulated memory (unwritten bytes read as fill value)"""
+
+    def __init__(self, limit=DEFAULT_ADDRESS_LIMIT, fill=0):
+        self.limit = limit
+        self.fill = fill
+        self._blocks = dict()
+
+    def _check(self, address, num_bytes):
+        if address < 0 or num_bytes < 0 or address + num_bytes > self.limit:
+            raise Exception("Invalid address: 0x%x" % address)
+
+    def read(self, address, num_bytes):
+        """Returns bytearray of num_bytes read from address"""
+        self._check(address, num_bytes)
+        data = bytearray()
+        while num_bytes > 0:
+            block, offset = divmod(address, BLOCK_SIZE)
+            n = min(num_bytes, BLOCK_SIZE - offset)
+            if block in self._blocks:
+                data += self._blocks[block][offset : offset + n]
+            else:
+                data += bytearray([self.fill]) * n
+            address += n
+            num_bytes -= n
+        return data
+
+    def write(self, address, data):
+        """Writes bytes-like data at address"""
+        self._check(address, len(data))
+        data = memoryview(bytearray(data))
+        while len(data) > 0:
+            block, offset = divmod(address, BLOCK_SIZE)
+            n = min(len(data), BLOCK_SIZE - offset)
+            if block not in self._blocks:
+                self._blocks[block] = bytearray([self.fill]) * BLOCK_SIZE
+            self._blocks[block][offset : offset + n] = data[:n]
+            address += n
+            data = data[n:]
+
+    def fill_region(self, address, num_bytes, value):
+        """Sets num_bytes from address to value"""
+        self.write(address, bytearray([value]) * num_bytes)
+
+
+class Listener(object):
+    """Accepts connections on a port and handles each one in a thread"""
+
+    def __init__(self, owner, host="localhost", port=0):
+        self._owner = owner
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        self._connections = list()
+        self._running = True
+        self._thread = threading.Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, _ = self._socket.accept()
+            except Exception:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections.append(conn)
+            t = threading.Thread(target=self._handle, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def _handle(self, conn):
+        reader = StreamReader(conn)
+        try:
+            while self._running:
+                msg = reader.readline()
+                req = json.loads(msg.decode())
+                resp = self._owner._dispatch(req, conn)
+                if resp is None:
+                    # Connection was closed on purpose
+                    return
+                conn.sendall(b"%s\n" % json.dumps(resp).encode())
+        except Exception:
+            pass
+        finally:
+            self._close_conn(conn)
+
+    def _close_conn(self, conn):
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        conn.close()
+        if conn in self._connections:
+            self._connections.remove(conn)
+
+    def shutdown(self):
+        """Stops accepting connections (open connections are closed once the
+        request being handled is answered)"""
+        self._running = False
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        self._socket.close()
+
+    def close(self):
+        """Stops accepting connections and closes all open connections"""
+        self.shutdown()
+        for conn in list(self._connections):
+            self._close_conn(conn)
+
+
+class FakeHandler(object):
+    """Base class for dispatching requests to cmd_<name> methods with
+    injected latency and failures
+
+    Each handler (the server and every session) has its own lock, so
+    requests of different sessions are handled concurrently.
+    """
+
+    def __init__(self, server):
+        self._server = server
+        self._lock = threading.RLock()
+
+    def _dispatch(self, req, conn):
+        name = req.get("name")
+        args = req.get("args") or dict()
+        server = self._server
+
+        with server._lock:
+            server.request_counts[name] += 1
+            latency = server.latency.get(name, server.latency.get(None, 0.0))
+            failure = server._take_injection(server._failures, name)
+            disconnect = server._take_injection(server._disconnects, name)
+
+        if latency > 0:
+            time.sleep(latency)
+        if disconnect is not None:
+            return None
+        if failure is not None:
+            return {"status": "FAIL", "message": failure}
+
+        handler = getattr(self, "cmd_" + str(name), None)
+        if handler is None:
+            return {"status": "FAIL", "message": "Unknown command: %s" % name}
+
+        try:
+            with self._lock:
+                data = handler(conn=conn, **args)
+        except Exception as e:
+            return {"status": "FAIL", "message": str(e)}
+
+        resp = {"status": "OK"}
+        if data is not None:
+            resp["data"] = data
+        return resp
+
+
+class FakeSession(FakeHandler):
+    """Simulated DebugServer-js session (device)"""
+
+    def __init__(self, server, name, host="localhost"):
+        super(FakeSession, self).__init__(server)
+        self.name = name
+        self.connected = False
+        self.running = False
+        self.image = None
+        self.registers = dict((reg, 0) for reg in DEFAULT_REGISTERS)
+        self.options = dict(server.options)
+        self.symbols = dict(server.symbols)
+        self.memory = collections.defaultdict(
+            lambda: FakeMemory(limit=server.address_limit)
+        )
+        self._listener = Listener(self, host=host)
+        self.port = self._listener.port
+
+    def close(self):
+        self._listener.close()
+
+    def _require_connected(self):
+        if not self.connected:
+            raise Exception("Target is not connected")
+
+    def cmd_connect(self, conn):
+        self.connected = True
+
+    def cmd_disconnect(self, conn):
+        self._require_connected()
+        self.connected = False
+        self.running = False
+
+    def cmd_erase(self, conn):
+        self._require_connected()
+        start, size = self._server.flash
+        self.memory[0].fill_region(start, size, 0xFF)
+        self.image = None
+
+    def cmd_reset(self, conn):
+        self._require_connected()
+        self.running = False
+        self.registers["PC"] = 0
+
+    def cmd_load(self, conn, file, binary=False, address=0):
+        self._require_connected()
+        if not os.path.isfile(file):
+            raise Exception("File does not exist: %s" % file)
+        if binary:
+            with open(file, "rb") as f:
+                self.memory[0].write(address, bytearray(f.read()))
+        self.image = (file, binary, address)
+
+    def cmd_verify(self, conn, file, binary=False, address=0):
+        self._require_connected()
+        if not os.path.isfile(file):
+            raise Exception("File does not exist: %s" % file)
+        if binary:
+            with open(file, "rb") as f:
+                data = bytearray(f.read())
+            if self.memory[0].read(address, len(data)) != data:
+                raise Exception("Verification failed")
+        elif self.image is None or self.image[0] != file:
+            raise Exception("Verification failed")
+
+    def cmd_evaluate(self, conn, expression, file=None):
+        self._require_connected()
+        if file is not None and not os.path.isfile(file):
+            raise Exception("File does not exist: %s" % file)
+        if expression in self.symbols:
+            return self.symbols[expression]
+        if expression in self.registers:
+            return self.registers[expression]
+        try:
+            return int(expression, 0)
+        except ValueError:
+            raise Exception("Could not evaluate expression: %s" % expression)
+
+    def _check_encoding(self, encoding):
+        if encoding != "list" and encoding not in (self._server.data_encodings or []):
+            raise Exception("Invalid encoding: %s" % encoding)
+
+    def cmd_readData(self, conn, address, page=0, numBytes=1, encoding="list"):
+        self._require_connected()
+        self._check_encoding(encoding)
+        data = self.memory[page].read(address, numBytes)
+        if encoding == "base64":
+            return base64.b64encode(bytes(data)).decode("ascii")
+        return list(data)
+
+    def cmd_writeData(self, conn, data, address, page=0, encoding="list"):
+        self._require_connected()
+        self._check_encoding(encoding)
+        if encoding == "base64":
+            data = base64.b64decode(data)
+        self.memory[page].write(address, bytearray(data))
+
+    def cmd_readRegister(self, conn, name):
+        self._require_connected()
+        if name not in self.registers:
+            raise Exception("Invalid register: %s" % name)
+        return self.registers[name]
+
+    def cmd_writeRegister(self, conn, name, value):
+        self._require_connected()
+        if name not in self.registers:
+            raise Exception("Invalid register: %s" % name)
+        self.registers[name] = value
+
+    def cmd_getOption(self, conn, id):
+        self._require_connected()
+        if id not in self.options:
+            raise Exception("Invalid option: %s" % id)
+        return self.options[id]
+
+    def cmd_setOption(self, conn, id, value):
+        self._require_connected()
+        if id not in self.options:
+            raise Exception("Invalid option: %s" % id)
+        if type(value) is not type(self.options[id]):
+            raise Exception("Invalid value for option %s: %s" % (id, value))
+        self.options[id] = value
+
+    def cmd_performOperation(self, conn, opcode):
+        self._require_connected()
+        if opcode not in self._server.opcodes:
+            raise Exception("Invalid opcode: %s" % opcode)
+
+    def cmd_run(self, conn, asynchronous=False):
+        self._require_connected()
+        # Synchronous runs return once the target halts (immediately here)
+        self.running = bool(asynchronous)
+
+    def cmd_halt(self, conn, wait=False):
+        self._require_connected()
+        self.running = False
+
+    def cmd_stop(self, conn):
+        # Session no longer accepts connections (response is still sent)
+        self._listener.shutdown()
+
+
+class FakeDebugServer(FakeHandler):
+    """Simulated DebugServer-js process
+
+    Attributes:
+        port (int): port number the server is listening on
+        sessions (dict): FakeSession for each open session name
+        request_counts (Counter): number of requests received per command
+            (server and all sessions)
+        latency (dict): seconds to sleep before handling a command (key None
+            applies to all commands)
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        port=0,
+        cpus=None,
+        latency=None,
+        address_limit=DEFAULT_ADDRESS_LIMIT,
+        flash=DEFAULT_FLASH,
+        options=None,
+        symbols=None,
+        opcodes=None,
+        data_encodings=DEFAULT_DATA_ENCODINGS,
+    ):
+        """
+        Args:
+            host (str, optional): hostname to listen on (default="localhost")
+            port (int, optional): port to listen on (default picks a free port)
+            cpus (list, optional): CPU (session) names available once a
+                config is set
+            latency (float or dict, optional): seconds to sleep before handling
+                every request, or dict of command name -> seconds
+            address_limit (int, optional): size of simulated memory (per page)
+            flash (tuple, optional): (start, size) of region erased by 'erase'
+            options (dict, optional): device options and default values
+            symbols (dict, optional): symbol name -> value used by 'evaluate'
+            opcodes (list, optional): valid 'performOperation' opcodes
+            data_encodings (list, optional): encodings of memory bytes
+                accepted by readData/writeData ('encoding' argument); None
+                only accepts lists of ints like DebugServer-js
+        """
+        super(FakeDebugServer, self).__init__(self)
+        self._host = host
+        self._requested_port = port
+        self._listener = None
+        self._failures = dict()
+        self._disconnects = dict()
+        self.cpus = list(cpus or DEFAULT_CPUS)
+        if isinstance(latency, dict):
+            self.latency = dict(latency)
+        else:
+            self.latency = {None: latency or 0.0}
+        self.address_limit = address_limit
+        self.flash = flash
+        self.options = dict(DEFAULT_OPTIONS if options is None else options)
+        self.symbols = dict(symbols or dict())
+        self.opcodes = list(DEFAULT_OPCODES if opcodes is None else opcodes)
+        self.data_encodings = data_encodings
+        self.config = None
+        self.sessions = dict()
+        self.request_counts = collections.Counter()
+        self.port = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Starts listening for connections
+
+        Returns:
+            FakeDebugServer: self
+        """
+        self._listener = Listener(self, host=self._host, port=self._requested_port)
+        self.port = self._listener.port
+        return self
+
+    def stop(self):
+        """Closes all sessions and stops listening"""
+        for session in list(self.sessions.values()):
+            session.close()
+        self.sessions.clear()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def inject_failure(self, command, message="Injected failure", count=1):
+        """Makes the next count requests of command fail
+
+        Args:
+            command (str): name of command
+            message (str, optional): failure message
+            count (int, optional): number of requests to fail (None = all)
+        """
+        with self._lock:
+            self._failures[command] = [message, count]
+
+    def inject_disconnect(self, command, count=1):
+        """Makes the next count requests of command close the connection
+        instead of responding
+
+        Args:
+            command (str): name of command
+            count (int, optional): number of requests to drop (None = all)
+        """
+        with self._lock:
+            self._disconnects[command] = [True, count]
+
+    def clear_injections(self):
+        """Removes all injected failures and disconnects"""
+        with self._lock:
+            self._failures.clear()
+            self._disconnects.clear()
+
+    def _take_injection(self, injections, name):
+        injection = injections.get(name)
+        if injection is None:
+            return None
+        value, count = injection
+        if count is not None:
+            if count <= 1:
+                del injections[name]
+            else:
+                injection[1] = count - 1
+        return value
+
+    def _require_config(self):
+        if self.config is None:
+            raise Exception("No configuration set")
+
+    def cmd_getListOfSessions(self, conn):
+        return [
+            {"name": name, "port": session.port}
+            for name, session in self.sessions.items()
+        ]
+
+    def cmd_setConfig(self, conn, path):
+        if not os.path.isfile(path):
+            raise Exception("Config file does not exist: %s" % path)
+        self.config = path
+
+    def cmd_getConfig(self, conn):
+        return self.config
+
+    def cmd_createConfig(
+        self, conn, name, connection=None, device=None, board=None, directory=None
+    ):
+        directory = directory or os.getcwd()
+        if not os.path.isdir(directory):
+            raise Exception("Directory does not exist: %s" % directory)
+        with open(os.path.join(directory, name), "w") as f:
+            f.write("<configurations/>\n")
+        return {"name": name, "directory": directory}
+
+    def cmd_getListOfCPUs(self, conn):
+        self._require_config()
+        return list(self.cpus)
+
+    def cmd_getListOfDevices(self, conn):
+        return list(DEFAULT_DEVICES)
+
+    def cmd_getListOfConnections(self, conn):
+        return list(DEFAULT_CONNECTIONS)
+
+    def cmd_getListOfConfigurations(self, conn):
+        return [self.config] if self.config is not None else []
+
+    def cmd_openSession(self, conn, name):
+        self._require_config()
+        if name not in self.cpus:
+            raise Exception("Invalid session name: %s" % name)
+        if name in self.sessions:
+            raise Exception("Session already open: %s" % name)
+        self.sessions[name] = FakeSession(self, name, host=self._host)
+        return {"name": name, "port": self.sessions[name].port}
+
+    def cmd_terminateSession(self, conn, name):
+        if name not in self.sessions:
+            raise Exception("Session not open: %s" % name)
+        self.sessions.pop(name).close()
+
+    def cmd_attachCCS(self, conn):
+        pass
+
+    def cmd_killServer(self, conn):
+        for session in list(self.sessions.values()):
+            session.close()
+        self.sessions.clear()
+        if self._listener is not None:
+            # Stop accepting new connections (response is still sent)
+            self._listener._running = False
+
+
+def launch_process(cpus=None, latency=0.0):
+    """Launches a FakeDebugServer in a separate process
+
+    Args:
+        cpus (int, optional): number of CPUs (sessions) to simulate
+        latency (float, optional): seconds of latency per request
+
+    Returns:
+        (subprocess.Popen, int): returns tuple containing process and port
+        number (same as :py:func:`dss.launch_server`)
+    """
+    args = [sys.executable, "-m", "tests.utils.fakeserver", "--latency", str(latency)]
+    if cpus is not None:
+        args += ["--cpus", str(cpus)]
+
+    top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    p = subprocess.Popen(args, stdout=subprocess.PIPE, cwd=top_dir)
+
+    line = p.stdout.readline().decode()
+    if not line.startswith("PORT: "):
+        p.terminate()
+        raise Exception("Could not retrieve port from fake server process.")
+
+    return (p, int(line.split(":")[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a FakeDebugServer")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on")
+    parser.add_argument(
+        "--cpus", type=int, default=None, help="number of CPUs (sessions) to simulate"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds of latency per request"
+    )
+    args = parser.parse_args()
+
+    cpus = None
+    if args.cpus is not None:
+        cpus = ["Fake Debug Probe/CPU_%d" % i for i in range(args.cpus)]
+
+    fake = FakeDebugServer(port=args.port, cpus=cpus, latency=args.latency).start()
+
+    # Same format as DebugServer-js (see dss.launch_server)
+    print("PORT: %d" % fake.port)
+    sys.stdout.flush()
+
+    try:
+        while fake._listener is not None and fake._listener._running:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Exclusive leases on test devices shared between processes
+
+When tests run in parallel (e.g. with pytest-xdist) each process must only
+use a board while it holds the board's lease. Leases are advisory locks on a
+file per device, so they are released by the operating system if the process
+holding one crashes or is killed.
+"""
+import os
+import time
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+DEFAULT_LEASE_DIR = os.path.join(tempfile.gettempdir(), "dsclient-leases")
+# Seconds between attempts to acquire a lease
+POLL_INTERVAL = 0.1
+
+
+class DeviceLease(object):
+    """Exclusive lease on a device (can be used as a context manager)"""
+
+    def __init__(self, name, directory=None):
+        """
+        Args:
+            name (str): name identifying the device (e.g. its serial number)
+            directory (str, optional): directory to create lock files in
+                (default=<tmp>/dsclient-leases)
+        """
+        self.name = name
+        self.directory = directory or DEFAULT_LEASE_DIR
+        self.path = os.path.join(
+            self.directory,
+            "".join(c if c.isalnum() or c in "-_." else "_" for c in name) + ".lock",
+        )
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @property
+    def held(self):
+        """bool: whether this lease is held"""
+        return self._file is not None
+
+    def acquire(self, timeout=None):
+        """Waits until the lease is acquired
+
+        Args:
+            timeout (float, optional): max seconds to wait (default = forever)
+
+        Raises:
+            Exception: raised when timeout expires
+        """
+        if self._file is not None:
+            raise Exception("Lease on %s already held" % self.name)
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # Created by another process
+                if not os.path.isdir(self.directory):
+                    raise
+
+        deadline = None if timeout is None else time.time() + timeout
+        f = open(self.path, "a+")
+        while not _try_lock(f):
+            if deadline is not None and time.time() >= deadline:
+                f.close()
+                raise Exception("Timed out waiting for lease on %s" % self.name)
+            time.sleep(POLL_INTERVAL)
+
+        # Record owner (for debugging stuck leases)
+        f.seek(0)
+        f.truncate()
+        f.write("%d\n" % os.getpid())
+        f.flush()
+        self._file = f
+
+    def release(self):
+        """Releases the lease (if held)"""
+        if self._file is None:
+            return
+
+        f, self._file = self._file, None
+        try:
+            f.seek(0)
+            f.truncate()
+            _unlock(f)
+        finally:
+            f.close()
+
+
+def _try_lock(f):
+    """Returns whether an exclusive lock on file was acquired (non-blocking)"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except (IOError, OSError):
+        return False
+
+    return True
+
+
+def _unlock(f):
+    """Releases lock on file"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
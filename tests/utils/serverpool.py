@@ -0,0 +1,213 @@
+"""Pool of warm DebugServer-js processes shared by tests
+
+Launching DebugServer-js starts CCS (Eclipse), which takes several seconds.
+Instead of launching a process for every test, the pool keeps a few processes
+ready, hands one out per test and resets it (terminating any open sessions)
+when the test is done. Processes that crashed, were killed by a test or could
+not be reset are replaced in the background, so startup is only paid once per
+run (or overlaps with other tests).
+
+DebugServer-js can not clear its config, so a process whose config was set is
+reset by setting the same config again. Tests that rely on no config being set
+acquire with configured=False, which only hands out processes that were never
+configured (replacing a configured one if needed); pass keep_config=False to
+replace every configured process instead.
+"""
+import time
+import threading
+import collections
+
+from dsclient import DebugServer
+
+DEFAULT_POOL_SIZE = 2
+# Seconds to wait for a response while resetting a process
+RESET_TIMEOUT = 30.0
+
+
+class ServerPool(object):
+    """Keeps a number of launched server processes ready for use"""
+
+    def __init__(
+        self,
+        launch,
+        size=DEFAULT_POOL_SIZE,
+        reset_timeout=RESET_TIMEOUT,
+        keep_config=True,
+    ):
+        """
+        Args:
+            launch (callable): called without arguments to launch a process;
+                returns (subprocess.Popen, int) tuple of process and port
+                number (e.g. functools.partial(dss.launch_server, ccs, workspace))
+            size (int, optional): number of processes to keep (default=2)
+            reset_timeout (float, optional): seconds to wait for a response
+                while resetting a process (default=30)
+            keep_config (boolean, optional): reuse processes whose config was
+                set (default = True)
+        """
+        self._launch = launch
+        self._reset_timeout = reset_timeout
+        self._keep_config = keep_config
+        self._cond = threading.Condition()
+        self._ready = collections.deque()
+        self._in_use = set()
+        self._launching = 0
+        self._error = None
+        self._closed = False
+        self.launched = 0
+        self.reused = 0
+
+        for _ in range(size):
+            self._replace()
+
+    def _replace(self):
+        """Launches a process in the background"""
+        with self._cond:
+            self._launching += 1
+        thread = threading.Thread(target=self._launch_process)
+        thread.daemon = True
+        thread.start()
+
+    def _launch_process(self):
+        try:
+            process, port = self._launch()
+        except Exception as e:
+            with self._cond:
+                self._launching -= 1
+                self._error = e
+                self._cond.notify_all()
+            return
+
+        with self._cond:
+            self._launching -= 1
+            self.launched += 1
+            if self._closed:
+                process.terminate()
+            else:
+                self._ready.append((process, port, False))
+            self._cond.notify_all()
+
+    def acquire(self, timeout=None, configured=True):
+        """Returns a ready process (waiting for one to be launched if needed)
+
+        Args:
+            timeout (float, optional): max seconds to wait (default = forever)
+            configured (boolean, optional): also hand out processes whose
+                config was set (default = True)
+
+        Returns:
+            (subprocess.Popen, int): returns tuple containing process and port number
+
+        Raises:
+            Exception: raised when pool is closed, a process could not be
+                launched or timeout expired
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("Server pool is closed")
+                for entry in list(self._ready):
+                    process, port, is_configured = entry
+                    if process.poll() is not None:
+                        # Crashed while idle
+                        self._ready.remove(entry)
+                        self._replace()
+                    elif configured or not is_configured:
+                        self._ready.remove(entry)
+                        self._in_use.add((process, port))
+                        return (process, port)
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise Exception("Could not launch server process: %s" % error)
+                if self._launching == 0:
+                    if len(self._ready) > 0:
+                        # Only configured processes are ready
+                        process, _, _ = self._ready.popleft()
+                        process.terminate()
+                        self._replace()
+                    elif len(self._in_use) == 0:
+                        self._replace()
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Exception("Timed out waiting for a server process")
+                self._cond.wait(remaining)
+
+    def release(self, process, port):
+        """Returns a process to the pool
+
+        The process is reset (open sessions are terminated and its config is
+        set again) and made ready again. If it exited or could not be reset it
+        is terminated and a replacement is launched in the background.
+
+        Args:
+            process (subprocess.Popen): process returned by acquire
+            port (int): port number returned by acquire
+        """
+        with self._cond:
+            self._in_use.discard((process, port))
+
+        configured = None
+        if not self._closed and process.poll() is None:
+            configured = self._reset(port)
+        if configured is not None:
+            with self._cond:
+                self.reused += 1
+                self._ready.append((process, port, configured))
+                self._cond.notify_all()
+            return
+
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+        if not self._closed:
+            self._replace()
+
+    def _reset(self, port):
+        """Terminates open sessions of a process and sets its config again
+
+        Returns:
+            bool: whether a config is set (None if process can not be reused)
+        """
+        server = None
+        try:
+            server = DebugServer(
+                port=port,
+                timeout=self._reset_timeout,
+                socket_options={"connect_timeout": self._reset_timeout},
+            )
+            # Sessions are terminated without stopping them first (tests may
+            # have stopped them already, so they can not be connected to)
+            for session in server._send_req("getListOfSessions"):
+                server._send_req("terminateSession", name=session["name"])
+
+            config = server.get_config()
+            if config is None:
+                return False
+            if not self._keep_config:
+                return None
+            server.set_config(config)
+            return True
+        except Exception:
+            return None
+        finally:
+            if server is not None:
+                server._close()
+
+    def close(self):
+        """Terminates all processes (including those still in use)"""
+        with self._cond:
+            self._closed = True
+            processes = [entry[0] for entry in self._ready]
+            processes += [process for process, _ in self._in_use]
+            self._ready.clear()
+            self._in_use.clear()
+            self._cond.notify_all()
+
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()